@@ -1,238 +1,455 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
-import json
-from datetime import datetime
-
-from database import get_db, init_db
-from services import EquipmentService, UserService
-from models import EquipmentCreate, EquipmentUpdate, SearchRequest
-from config import Config
-
-app = FastAPI(title="Equipment Bot Admin Panel")
-
-# Настройка шаблонов
-templates = Jinja2Templates(directory="templates")
-
-@app.on_event("startup")
-async def startup_event():
-    """Инициализация при запуске"""
-    await init_db()
-
-@app.get("/", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, db: AsyncSession = Depends(get_db)):
-    """Главная страница админ-панели"""
-    equipment_service = EquipmentService(db)
-    
-    # Получаем статистику
-    all_equipment = await equipment_service.get_all_equipment()
-    categories = await equipment_service.get_categories()
-    brands = await equipment_service.get_brands()
-    
-    stats = {
-        "total_equipment": len(all_equipment),
-        "available_equipment": len([e for e in all_equipment if e.availability]),
-        "categories_count": len(categories),
-        "brands_count": len(brands),
-        "categories": categories,
-        "brands": brands[:10]  # Показываем первые 10 брендов
-    }
-    
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
-        "stats": stats
-    })
-
-@app.get("/equipment", response_class=HTMLResponse)
-async def equipment_list(
-    request: Request, 
-    page: int = 1,
-    search: Optional[str] = None,
-    category: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
-):
-    """Список оборудования"""
-    equipment_service = EquipmentService(db)
-    skip = (page - 1) * 20
-    
-    if search or category:
-        search_request = SearchRequest(query=search, category=category)
-        equipment = await equipment_service.search_equipment(search_request, skip=skip, limit=20)
-    else:
-        equipment = await equipment_service.get_all_equipment(skip=skip, limit=20)
-    
-    categories = await equipment_service.get_categories()
-    
-    return templates.TemplateResponse("equipment_list.html", {
-        "request": request,
-        "equipment": equipment,
-        "categories": categories,
-        "current_page": page,
-        "search_query": search,
-        "selected_category": category
-    })
-
-@app.get("/equipment/add", response_class=HTMLResponse)
-async def add_equipment_form(request: Request):
-    """Форма добавления оборудования"""
-    return templates.TemplateResponse("equipment_form.html", {
-        "request": request,
-        "equipment": None,
-        "categories": Config.EQUIPMENT_CATEGORIES,
-        "action": "add"
-    })
-
-@app.post("/equipment/add")
-async def add_equipment(
-    name: str = Form(...),
-    category: str = Form(...),
-    description: Optional[str] = Form(None),
-    price: float = Form(...),
-    currency: str = Form("RUB"),
-    brand: Optional[str] = Form(None),
-    model: Optional[str] = Form(None),
-    specifications: Optional[str] = Form(None),
-    availability: bool = Form(True),
-    db: AsyncSession = Depends(get_db)
-):
-    """Добавление нового оборудования"""
-    equipment_service = EquipmentService(db)
-    
-    # Парсим спецификации если они есть
-    specs = None
-    if specifications:
-        try:
-            specs = json.loads(specifications)
-        except:
-            pass
-    
-    equipment_data = EquipmentCreate(
-        name=name,
-        category=category,
-        description=description,
-        price=price,
-        currency=currency,
-        brand=brand,
-        model=model,
-        specifications=specs,
-        availability=availability
-    )
-    
-    await equipment_service.create_equipment(equipment_data)
-    return RedirectResponse(url="/equipment", status_code=303)
-
-@app.get("/equipment/{equipment_id}/edit", response_class=HTMLResponse)
-async def edit_equipment_form(request: Request, equipment_id: int, db: AsyncSession = Depends(get_db)):
-    """Форма редактирования оборудования"""
-    equipment_service = EquipmentService(db)
-    equipment = await equipment_service.get_equipment(equipment_id)
-    
-    if not equipment:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-    
-    return templates.TemplateResponse("equipment_form.html", {
-        "request": request,
-        "equipment": equipment,
-        "categories": Config.EQUIPMENT_CATEGORIES,
-        "action": "edit"
-    })
-
-@app.post("/equipment/{equipment_id}/edit")
-async def edit_equipment(
-    equipment_id: int,
-    name: str = Form(...),
-    category: str = Form(...),
-    description: Optional[str] = Form(None),
-    price: float = Form(...),
-    currency: str = Form("RUB"),
-    brand: Optional[str] = Form(None),
-    model: Optional[str] = Form(None),
-    specifications: Optional[str] = Form(None),
-    availability: bool = Form(True),
-    db: AsyncSession = Depends(get_db)
-):
-    """Редактирование оборудования"""
-    equipment_service = EquipmentService(db)
-    
-    # Парсим спецификации если они есть
-    specs = None
-    if specifications:
-        try:
-            specs = json.loads(specifications)
-        except:
-            pass
-    
-    equipment_data = EquipmentUpdate(
-        name=name,
-        category=category,
-        description=description,
-        price=price,
-        currency=currency,
-        brand=brand,
-        model=model,
-        specifications=specs,
-        availability=availability
-    )
-    
-    updated_equipment = await equipment_service.update_equipment(equipment_id, equipment_data)
-    if not updated_equipment:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-    
-    return RedirectResponse(url="/equipment", status_code=303)
-
-@app.post("/equipment/{equipment_id}/delete")
-async def delete_equipment(equipment_id: int, db: AsyncSession = Depends(get_db)):
-    """Удаление оборудования"""
-    equipment_service = EquipmentService(db)
-    success = await equipment_service.delete_equipment(equipment_id)
-    
-    if not success:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-    
-    return RedirectResponse(url="/equipment", status_code=303)
-
-@app.get("/api/equipment", response_class=HTMLResponse)
-async def api_equipment_list(
-    search: Optional[str] = None,
-    category: Optional[str] = None,
-    limit: int = 50,
-    db: AsyncSession = Depends(get_db)
-):
-    """API для получения списка оборудования"""
-    equipment_service = EquipmentService(db)
-    
-    if search or category:
-        search_request = SearchRequest(query=search, category=category)
-        equipment = await equipment_service.search_equipment(search_request, limit=limit)
-    else:
-        equipment = await equipment_service.get_all_equipment(limit=limit)
-    
-    # Возвращаем JSON
-    from fastapi.responses import JSONResponse
-    return JSONResponse(content=[
-        {
-            "id": e.id,
-            "name": e.name,
-            "category": e.category,
-            "price": e.price,
-            "currency": e.currency,
-            "brand": e.brand,
-            "model": e.model,
-            "availability": e.availability,
-            "created_at": e.created_at.isoformat()
-        }
-        for e in equipment
-    ])
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "admin_panel:app",
-        host=Config.ADMIN_PANEL_HOST,
-        port=Config.ADMIN_PANEL_PORT,
-        reload=True
-    )
-
+from fastapi import FastAPI, Request, Depends, HTTPException, Form, File, UploadFile
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, Response, ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import csv
+import hashlib
+import io
+import json
+import uuid
+import orjson
+from datetime import datetime
+
+from database import Equipment, get_db, init_db, async_session
+from services import (
+    EquipmentService, UserService, StatsService, ExchangeRateService, load_catalog_indexes, get_catalog_version,
+    EQUIPMENT_FIELDS, LIST_FIELDS
+)
+from importer import detect_format, import_file
+from models import EquipmentCreate, EquipmentUpdate, SearchRequest, ExchangeRateUpdate
+from config import Config
+
+app = FastAPI(title="Equipment Bot Admin Panel")
+
+# Настройка шаблонов
+templates = Jinja2Templates(directory="templates")
+
+# Поля /api/equipment, если параметр fields не передан
+API_DEFAULT_FIELDS = ("id", "name", "category", "price", "currency", "brand", "model", "availability", "created_at")
+
+# Меняется при каждом запуске, чтобы новые шаблоны не отдавались из старого кэша
+ETAG_SALT = uuid.uuid4().hex
+
+async def catalog_etag(request: Request, db: AsyncSession) -> str:
+    """Строгий ETag страницы: версия каталога и параметры запроса"""
+    # max(id) по первичному ключу - один переход по индексу
+    version = await get_catalog_version(db)
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{ETAG_SALT}:{request.url.path}?{params}".encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Ответ 304, если у клиента уже есть актуальная версия"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+@app.exception_handler(PoolTimeoutError)
+async def database_busy(request: Request, error: PoolTimeoutError):
+    """Соединение с базой не освободилось за DB_WRITE_TIMEOUT, например во время долгого импорта"""
+    return ORJSONResponse(
+        {"detail": "База данных занята другой записью (например, импортом), повторите позже"},
+        status_code=503, headers={"Retry-After": str(int(Config.DB_WRITE_TIMEOUT) or 1)}
+    )
+
+@app.on_event("startup")
+async def startup_event():
+    """Инициализация при запуске"""
+    await init_db()
+    async with async_session() as db:
+        await load_catalog_indexes(db)
+
+@app.get("/", response_class=HTMLResponse)
+async def admin_dashboard(request: Request, db: AsyncSession = Depends(get_db)):
+    """Главная страница админ-панели"""
+    etag = await catalog_etag(request, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Получаем статистику одним запросом
+    catalog_stats = await StatsService(db).get_stats()
+    
+    stats = {
+        "total_equipment": catalog_stats["total_equipment"],
+        "available_equipment": catalog_stats["available_equipment"],
+        "categories_count": len(catalog_stats["categories"]),
+        "brands_count": len(catalog_stats["brands"]),
+        "categories": catalog_stats["categories"],
+        "brands": dict(list(catalog_stats["brands"].items())[:10])  # Показываем 10 самых популярных брендов
+    }
+    
+    return templates.TemplateResponse("dashboard.html", {
+        "request": request,
+        "stats": stats
+    }, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/equipment", response_class=HTMLResponse)
+async def equipment_list(
+    request: Request, 
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Список оборудования"""
+    etag = await catalog_etag(request, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    equipment_service = EquipmentService(db)
+    
+    try:
+        if search or category:
+            search_request = SearchRequest(query=search, category=category)
+            equipment = await equipment_service.search_equipment(
+                search_request, limit=20, cursor=cursor, fields=LIST_FIELDS
+            )
+        else:
+            equipment = await equipment_service.get_all_equipment(limit=20, cursor=cursor, fields=LIST_FIELDS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if search:
+        # Категории со счетчиками по текущему запросу, одним сгруппированным запросом
+        categories = (await equipment_service.get_facets(SearchRequest(query=search))).categories
+    else:
+        # Без поиска счетчики уже есть в catalog_stats
+        categories = (await StatsService(db).get_stats())["categories"]
+    if category and category not in categories:
+        categories[category] = 0
+    
+    return templates.TemplateResponse("equipment_list.html", {
+        "request": request,
+        "equipment": equipment,
+        "categories": categories,
+        "cursor": cursor,
+        "next_cursor": equipment_service.next_cursor,
+        "search_query": search,
+        "selected_category": category
+    }, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/equipment/add", response_class=HTMLResponse)
+async def add_equipment_form(request: Request):
+    """Форма добавления оборудования"""
+    return templates.TemplateResponse("equipment_form.html", {
+        "request": request,
+        "equipment": None,
+        "categories": Config.EQUIPMENT_CATEGORIES,
+        "action": "add"
+    })
+
+@app.post("/equipment/add")
+async def add_equipment(
+    name: str = Form(...),
+    category: str = Form(...),
+    description: Optional[str] = Form(None),
+    price: float = Form(...),
+    currency: str = Form("RUB"),
+    brand: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    specifications: Optional[str] = Form(None),
+    availability: bool = Form(True),
+    db: AsyncSession = Depends(get_db)
+):
+    """Добавление нового оборудования"""
+    equipment_service = EquipmentService(db)
+    
+    # Парсим спецификации если они есть
+    specs = None
+    if specifications:
+        try:
+            specs = json.loads(specifications)
+        except:
+            pass
+    
+    equipment_data = EquipmentCreate(
+        name=name,
+        category=category,
+        description=description,
+        price=price,
+        currency=currency,
+        brand=brand,
+        model=model,
+        specifications=specs,
+        availability=availability
+    )
+    
+    await equipment_service.create_equipment(equipment_data)
+    return RedirectResponse(url="/equipment", status_code=303)
+
+@app.get("/equipment/import", response_class=HTMLResponse)
+async def import_equipment_form(request: Request):
+    """Форма загрузки прайс-листа"""
+    return templates.TemplateResponse("equipment_import.html", {
+        "request": request,
+        "result": None
+    })
+
+@app.post("/equipment/import", response_class=HTMLResponse)
+async def import_equipment(
+    request: Request,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Импорт прайс-листа CSV, JSONL или XLSX"""
+    file_format = detect_format(file.filename)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+    
+    # Файл читается и проверяется пачками в потоке; в цикле событий выполняется только запись пачек
+    try:
+        result = await import_file(db, file.file, file_format)
+    except RuntimeError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    return templates.TemplateResponse("equipment_import.html", {
+        "request": request,
+        "filename": file.filename,
+        "result": result
+    })
+
+@app.get("/equipment/{equipment_id}/edit", response_class=HTMLResponse)
+async def edit_equipment_form(request: Request, equipment_id: int, db: AsyncSession = Depends(get_db)):
+    """Форма редактирования оборудования"""
+    equipment_service = EquipmentService(db)
+    equipment = await equipment_service.get_equipment(equipment_id)
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    return templates.TemplateResponse("equipment_form.html", {
+        "request": request,
+        "equipment": equipment,
+        "categories": Config.EQUIPMENT_CATEGORIES,
+        "action": "edit"
+    })
+
+@app.post("/equipment/{equipment_id}/edit")
+async def edit_equipment(
+    equipment_id: int,
+    name: str = Form(...),
+    category: str = Form(...),
+    description: Optional[str] = Form(None),
+    price: float = Form(...),
+    currency: str = Form("RUB"),
+    brand: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    specifications: Optional[str] = Form(None),
+    availability: bool = Form(True),
+    db: AsyncSession = Depends(get_db)
+):
+    """Редактирование оборудования"""
+    equipment_service = EquipmentService(db)
+    
+    # Парсим спецификации если они есть
+    specs = None
+    if specifications:
+        try:
+            specs = json.loads(specifications)
+        except:
+            pass
+    
+    equipment_data = EquipmentUpdate(
+        name=name,
+        category=category,
+        description=description,
+        price=price,
+        currency=currency,
+        brand=brand,
+        model=model,
+        specifications=specs,
+        availability=availability
+    )
+    
+    updated_equipment = await equipment_service.update_equipment(equipment_id, equipment_data)
+    if not updated_equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    return RedirectResponse(url="/equipment", status_code=303)
+
+@app.post("/equipment/{equipment_id}/delete")
+async def delete_equipment(equipment_id: int, db: AsyncSession = Depends(get_db)):
+    """Удаление оборудования"""
+    equipment_service = EquipmentService(db)
+    success = await equipment_service.delete_equipment(equipment_id)
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    return RedirectResponse(url="/equipment", status_code=303)
+
+@app.get("/api/equipment", response_class=HTMLResponse)
+async def api_equipment_list(
+    request: Request,
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """API для получения списка оборудования"""
+    # Опрос без изменений каталога стоит одного запроса версии
+    etag = await catalog_etag(request, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Из базы читаются только запрошенные колонки, например fields=id,name,price
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip()) if fields else API_DEFAULT_FIELDS
+    unknown = set(selected) - set(EQUIPMENT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    if sort not in (None, "price", "-price"):
+        raise HTTPException(status_code=400, detail="Invalid sort")
+    
+    equipment_service = EquipmentService(db)
+    
+    try:
+        if search or category or min_price is not None or max_price is not None or sort:
+            # Границы цены в рублях, сортировка sort=price или sort=-price
+            search_request = SearchRequest(
+                query=search, category=category, min_price=min_price, max_price=max_price, sort=sort
+            )
+            equipment = await equipment_service.search_equipment(
+                search_request, limit=limit, cursor=cursor, fields=selected
+            )
+        else:
+            equipment = await equipment_service.get_all_equipment(limit=limit, cursor=cursor, fields=selected)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Курсор следующей страницы передается в заголовке, чтобы не менять формат ответа
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if equipment_service.next_cursor:
+        headers["X-Next-Cursor"] = equipment_service.next_cursor
+    
+    # orjson сам сериализует даты; характеристики отдаются объектом
+    items = []
+    for e in equipment:
+        item = {field: getattr(e, field) for field in selected}
+        if item.get("specifications"):
+            item["specifications"] = orjson.loads(item["specifications"])
+        items.append(item)
+    return ORJSONResponse(headers=headers, content=items)
+
+@app.get("/api/equipment/{equipment_id}/price-history")
+async def api_price_history(
+    equipment_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """История цены для графиков: изменения, дневные или месячные сводки"""
+    # Без granularity источник выбирается по длине интервала
+    equipment_service = EquipmentService(db)
+    try:
+        points = await equipment_service.get_price_history(equipment_id, start, end, granularity)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Unknown granularity")
+    return ORJSONResponse(content=[point.model_dump() for point in points])
+
+@app.get("/api/exchange-rates")
+async def api_exchange_rates(db: AsyncSession = Depends(get_db)):
+    """Курсы валют: рублей за единицу"""
+    return ORJSONResponse(content=await ExchangeRateService(db).get_rates())
+
+@app.put("/api/exchange-rates/{currency}")
+async def api_set_exchange_rate(currency: str, rate_update: ExchangeRateUpdate, db: AsyncSession = Depends(get_db)):
+    """Изменение курса: цены в рублях пересчитываются только у оборудования в этой валюте"""
+    try:
+        updated = await ExchangeRateService(db).set_rate(currency, rate_update.rate)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return ORJSONResponse(content={"currency": currency.strip().upper(), "rate": rate_update.rate, "updated": updated})
+
+EXPORT_COLUMNS = [column.name for column in Equipment.__table__.columns]
+
+def _export_value(value):
+    """Значение ячейки экспорта: даты в ISO 8601"""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def _export_ndjson(search_request: SearchRequest):
+    """Строки экспорта в NDJSON, по пачке за раз"""
+    async with async_session() as db:
+        async for rows in EquipmentService(db).stream_equipment(search_request):
+            lines = []
+            for row in rows:
+                item = {column: _export_value(value) for column, value in zip(EXPORT_COLUMNS, row)}
+                if item["specifications"]:
+                    item["specifications"] = json.loads(item["specifications"])
+                lines.append(json.dumps(item, ensure_ascii=False))
+            yield ("\n".join(lines) + "\n").encode()
+
+async def _export_csv(search_request: SearchRequest):
+    """Строки экспорта в CSV, по пачке за раз"""
+    # BOM, чтобы Excel открыл UTF-8 без настройки
+    buffer = io.StringIO("\ufeff")
+    buffer.seek(0, io.SEEK_END)
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async with async_session() as db:
+        # Заголовок уходит клиенту до первого запроса к базе
+        yield buffer.getvalue().encode()
+        async for rows in EquipmentService(db).stream_equipment(search_request):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_export_value(value) for value in row] for row in rows)
+            yield buffer.getvalue().encode()
+
+@app.get("/api/equipment/export")
+async def api_equipment_export(
+    format: str = "ndjson",
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    brand: Optional[str] = None,
+    availability: Optional[bool] = None,
+    specs: Optional[str] = None
+):
+    """Потоковая выгрузка каталога в NDJSON или CSV с фильтрами поиска"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+    try:
+        # Фильтры характеристик передаются JSON-объектом, например {"RAM": ">=16"}
+        search_request = SearchRequest(
+            query=search, category=category, min_price=min_price, max_price=max_price,
+            brand=brand, availability=availability, specs=json.loads(specs) if specs else None
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid specs filter")
+    
+    # Сессия открывается внутри генератора и живет, пока отправляется ответ
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(search_request), media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="equipment.csv"'}
+        )
+    return StreamingResponse(
+        _export_ndjson(search_request), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="equipment.ndjson"'}
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "admin_panel:app",
+        host=Config.ADMIN_PANEL_HOST,
+        port=Config.ADMIN_PANEL_PORT,
+        reload=True
+    )
+
@@ -0,0 +1,3 @@
+"""
+Бенчмарки сервисов, админ-панели и обработчиков бота на синтетическом каталоге
+"""
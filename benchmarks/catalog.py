@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетического каталога оборудования.
+
+Позиции похожи на настоящие: русские названия, бренды и серии своей
+категории, характеристики с единицами измерения, логнормальные цены с
+медианой категории и часть цен в валюте. Позиция определяется номером и
+зерном, поэтому одинаковые параметры дают одинаковый каталог.
+
+Каталог пишется в базу из DATABASE_URL пачками вставок вместе с
+характеристиками, историей цен и журналом изменений, минуя
+EquipmentService, поэтому миллион позиций загружается за минуты. Номера
+новых позиций продолжают те, что уже есть в базе, так что повторный запуск
+дописывает каталог без повторяющихся моделей:
+
+    python -m benchmarks.catalog --items 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+
+from config import Config
+from database import (
+    CatalogChange, Equipment, EquipmentSpec, ExchangeRate, PriceDaily, PriceHistory, PriceMonthly,
+    engine, init_db, parse_exchange_rates, rebuild_catalog_stats
+)
+from specs import spec_rows
+
+DEFAULT_SEED = 42
+BATCH_SIZE = 2000
+
+# Доля позиций с ценой в валюте и в наличии
+CURRENCY_WEIGHTS = (("RUB", 0.85), ("USD", 0.1), ("EUR", 0.05))
+AVAILABILITY_SHARE = 0.75
+# Позиции добавлены в каталог за последние два года
+MAX_AGE = timedelta(days=730)
+
+# Цены в валюте получаются из рублевых по начальным курсам, а не по текущим курсам базы
+CONFIG_RATES = parse_exchange_rates(Config.EXCHANGE_RATES)
+
+# Запросы пользователей к такому каталогу: название, бренд с серией, характеристика
+SEARCH_QUERIES = [
+    "ноутбук lenovo", "коммутатор cisco", "монитор 27 дюймов", "видеокарта msi", "принтер hp",
+    "thinkpad", "сервер dell poweredge", "ибп apc", "мфу kyocera", "точка доступа mikrotik",
+]
+
+PURPOSES = ["офиса", "дома", "малого бизнеса", "дата-центра", "дизайнеров", "игр", "удаленной работы"]
+
+
+@dataclass
+class CategoryProfile:
+    """Словарь и цены позиций одной категории"""
+    weight: float
+    nouns: Sequence[str]
+    # Бренды в порядке популярности и их серии
+    brands: Sequence[Tuple[str, Sequence[str]]]
+    # Характеристики: ключ и возможные значения
+    specs: Sequence[Tuple[str, Sequence[str]]]
+    median_price: float
+    price_sigma: float = 0.6
+
+
+PROFILES: Dict[str, CategoryProfile] = {
+    "Компьютеры и ноутбуки": CategoryProfile(
+        weight=0.22,
+        nouns=["Ноутбук", "Ультрабук", "Моноблок", "Неттоп", "Рабочая станция"],
+        brands=[
+            ("Lenovo", ["ThinkPad", "IdeaPad", "Yoga", "Legion"]),
+            ("HP", ["ProBook", "EliteBook", "Pavilion", "Victus"]),
+            ("Dell", ["Latitude", "Vostro", "Inspiron", "XPS"]),
+            ("Asus", ["ZenBook", "VivoBook", "ExpertBook", "ROG"]),
+            ("Acer", ["Aspire", "Swift", "TravelMate", "Nitro"]),
+            ("Apple", ["MacBook Air", "MacBook Pro", "iMac"]),
+            ("Huawei", ["MateBook"]),
+        ],
+        specs=[
+            ("Процессор", ["Intel Core i5-1335U", "Intel Core i7-1365U", "AMD Ryzen 5 7530U", "AMD Ryzen 7 7840HS", "Apple M2"]),
+            ("RAM", ["8 GB", "16 GB", "32 GB", "64 GB"]),
+            ("SSD", ["256 GB", "512 GB", "1 TB", "2 TB"]),
+            ("Экран", ["13.3 дюйма", "14 дюймов", "15.6 дюйма", "16 дюймов", "23.8 дюйма"]),
+            ("Вес", ["1.2 кг", "1.4 кг", "1.8 кг", "2.3 кг"]),
+        ],
+        median_price=85_000,
+    ),
+    "Серверное оборудование": CategoryProfile(
+        weight=0.06,
+        nouns=["Сервер", "Система хранения данных", "Серверная платформа"],
+        brands=[
+            ("Dell", ["PowerEdge", "PowerVault"]),
+            ("HPE", ["ProLiant", "MSA", "Apollo"]),
+            ("Lenovo", ["ThinkSystem"]),
+            ("Supermicro", ["SuperServer", "Hyper"]),
+            ("Huawei", ["FusionServer", "OceanStor"]),
+            ("Yadro", ["Vegman", "Tatlin"]),
+        ],
+        specs=[
+            ("Процессор", ["2x Intel Xeon Silver 4314", "2x Intel Xeon Gold 6338", "AMD EPYC 7443", "2x AMD EPYC 9354"]),
+            ("RAM", ["32 GB", "64 GB", "128 GB", "256 GB", "512 GB"]),
+            ("Форм-фактор", ["1U", "2U", "4U", "Tower"]),
+            ("Диски", ["2x 480 GB SSD", "4x 960 GB SSD", "8x 2 TB HDD", "12x 8 TB HDD"]),
+            ("Блок питания", ["550 Вт", "800 Вт", "1100 Вт", "1600 Вт"]),
+        ],
+        median_price=450_000,
+        price_sigma=0.7,
+    ),
+    "Сетевое оборудование": CategoryProfile(
+        weight=0.12,
+        nouns=["Коммутатор", "Маршрутизатор", "Точка доступа", "Межсетевой экран"],
+        brands=[
+            ("Cisco", ["Catalyst", "ISR", "Meraki"]),
+            ("MikroTik", ["CRS", "hAP", "CCR"]),
+            ("Huawei", ["CloudEngine", "AR", "AirEngine"]),
+            ("TP-Link", ["JetStream", "Omada"]),
+            ("Eltex", ["MES", "ESR", "WEP"]),
+            ("Juniper", ["EX", "SRX"]),
+        ],
+        specs=[
+            ("Порты", ["8x 1GbE", "24x 1GbE + 4x SFP+", "48x 1GbE + 4x SFP+", "24x 10GbE SFP+"]),
+            ("PoE", ["нет", "PoE+", "PoE++"]),
+            ("Пропускная способность", ["16 Gbps", "56 Gbps", "176 Gbps", "480 Gbps"]),
+            ("Управление", ["Web", "CLI, Web, SNMP", "Облако"]),
+        ],
+        median_price=45_000,
+        price_sigma=0.9,
+    ),
+    "Принтеры и МФУ": CategoryProfile(
+        weight=0.1,
+        nouns=["Принтер", "МФУ", "Сканер", "Плоттер"],
+        brands=[
+            ("HP", ["LaserJet", "OfficeJet", "DesignJet"]),
+            ("Canon", ["i-SENSYS", "PIXMA", "imageRUNNER"]),
+            ("Kyocera", ["ECOSYS", "TASKalfa"]),
+            ("Epson", ["EcoTank", "WorkForce"]),
+            ("Brother", ["HL", "DCP", "MFC"]),
+            ("Xerox", ["VersaLink", "WorkCentre"]),
+        ],
+        specs=[
+            ("Тип печати", ["лазерная", "струйная"]),
+            ("Цветность", ["ч/б", "цветная"]),
+            ("Скорость", ["20 стр/мин", "33 стр/мин", "45 стр/мин"]),
+            ("Разрешение", ["600 dpi", "1200 dpi", "4800 dpi"]),
+            ("Формат", ["A4", "A3"]),
+        ],
+        median_price=30_000,
+    ),
+    "Мониторы и дисплеи": CategoryProfile(
+        weight=0.12,
+        nouns=["Монитор", "Интерактивная панель", "Проектор"],
+        brands=[
+            ("Samsung", ["Odyssey", "ViewFinity", "Smart Monitor"]),
+            ("LG", ["UltraGear", "UltraFine", "UltraWide"]),
+            ("Dell", ["UltraSharp", "P"]),
+            ("AOC", ["Q27", "24G2"]),
+            ("Philips", ["Brilliance", "Evnia"]),
+            ("BenQ", ["GW", "PD", "MOBIUZ"]),
+        ],
+        specs=[
+            ("Диагональ", ["23.8 дюйма", "27 дюймов", "31.5 дюйма", "34 дюйма", "55 дюймов"]),
+            ("Разрешение", ["1920x1080", "2560x1440", "3840x2160"]),
+            ("Частота", ["60 Гц", "75 Гц", "144 Гц", "165 Гц", "240 Гц"]),
+            ("Матрица", ["IPS", "VA", "OLED", "TN"]),
+        ],
+        median_price=25_000,
+    ),
+    "Комплектующие": CategoryProfile(
+        weight=0.2,
+        nouns=["Видеокарта", "Процессор", "Оперативная память", "SSD накопитель", "Жесткий диск", "Блок питания"],
+        brands=[
+            ("Intel", ["Core i5", "Core i7", "Xeon"]),
+            ("AMD", ["Ryzen 5", "Ryzen 7", "Radeon RX"]),
+            ("Kingston", ["Fury", "KC3000", "A400"]),
+            ("Samsung", ["990 PRO", "870 EVO"]),
+            ("Seagate", ["IronWolf", "Exos", "BarraCuda"]),
+            ("MSI", ["GeForce RTX", "MAG", "MPG"]),
+            ("Gigabyte", ["AORUS", "Eagle"]),
+        ],
+        specs=[
+            ("Объем", ["8 GB", "16 GB", "32 GB", "512 GB", "1 TB", "2 TB", "4 TB"]),
+            ("Интерфейс", ["PCIe 4.0", "PCIe 5.0", "SATA III", "DDR5"]),
+            ("Мощность", ["65 Вт", "125 Вт", "650 Вт", "850 Вт"]),
+            ("Гарантия", ["1 год", "3 года", "5 лет"]),
+        ],
+        median_price=12_000,
+        price_sigma=0.9,
+    ),
+    "Периферия": CategoryProfile(
+        weight=0.13,
+        nouns=["Клавиатура", "Мышь", "Гарнитура", "Веб-камера", "ИБП", "Док-станция"],
+        brands=[
+            ("Logitech", ["MX", "G", "Signature"]),
+            ("Razer", ["DeathAdder", "BlackWidow", "Kraken"]),
+            ("A4Tech", ["Bloody", "Fstyler"]),
+            ("Jabra", ["Evolve", "Speak"]),
+            ("APC", ["Back-UPS", "Smart-UPS"]),
+            ("Ippon", ["Back Basic", "Smart Winner"]),
+        ],
+        specs=[
+            ("Подключение", ["USB", "Bluetooth", "Радио 2.4 ГГц"]),
+            ("Цвет", ["черный", "белый", "серый"]),
+            ("Вес", ["0.1 кг", "0.8 кг", "1.2 кг", "9 кг"]),
+        ],
+        median_price=4_000,
+        price_sigma=0.8,
+    ),
+    "Другое": CategoryProfile(
+        weight=0.05,
+        nouns=["Серверный шкаф", "Патч-корд", "Сетевой фильтр", "Кронштейн", "Патч-панель"],
+        brands=[
+            ("ЦМО", ["ШТК", "ШРН"]),
+            ("Hyperline", ["TTB", "PP3"]),
+            ("Cabeus", ["SH", "PC-UTP"]),
+            ("Pilot", ["GL", "XPro"]),
+        ],
+        specs=[
+            ("Длина", ["1 м", "3 м", "5 м"]),
+            ("Высота", ["6U", "12U", "42U"]),
+            ("Материал", ["сталь", "пластик"]),
+        ],
+        median_price=3_000,
+    ),
+}
+
+_categories = list(PROFILES)
+_category_weights = [PROFILES[category].weight for category in _categories]
+# Популярность брендов убывает как 1/место
+_brand_weights = {
+    category: [1 / rank for rank in range(1, len(profile.brands) + 1)] for category, profile in PROFILES.items()
+}
+_currencies = [code for code, _ in CURRENCY_WEIGHTS]
+_currency_weights = [weight for _, weight in CURRENCY_WEIGHTS]
+
+
+def catalog_item(number: int, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """Поля EquipmentCreate позиции с номером number и ее возраст в каталоге"""
+    rng = random.Random(seed * 1_000_003 + number)
+    category = rng.choices(_categories, _category_weights)[0]
+    profile = PROFILES[category]
+    brand, series_list = rng.choices(profile.brands, _brand_weights[category])[0]
+    series = rng.choice(series_list)
+    noun = rng.choice(profile.nouns)
+    model = f"{series.split()[0][:3].upper()}-{number:06d}"
+
+    currency = rng.choices(_currencies, _currency_weights)[0]
+    price_rub = rng.lognormvariate(0, profile.price_sigma) * profile.median_price
+    # Рублевые цены круглые, до десяти рублей
+    price = round(price_rub / CONFIG_RATES.get(currency, 1.0), 2) if currency != "RUB" else max(10.0, round(price_rub, -1))
+
+    spec_count = rng.randint(min(3, len(profile.specs)), len(profile.specs))
+    specifications = {key: rng.choice(values) for key, values in rng.sample(list(profile.specs), spec_count)}
+    return {
+        "name": f"{noun} {brand} {series} {model}",
+        "category": category,
+        "description": f"{noun} {brand} {series} для {rng.choice(PURPOSES)}",
+        "price": price,
+        "currency": currency,
+        "brand": brand,
+        "model": model,
+        "specifications": specifications,
+        "availability": rng.random() < AVAILABILITY_SHARE,
+        "age": timedelta(seconds=rng.uniform(0, MAX_AGE.total_seconds())),
+    }
+
+
+# Форматы, в которых SQLAlchemy хранит DateTime и Date в SQLite
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def insert_rows(connection, table, rows: List[Dict[str, Any]]):
+    """executemany готовых значений без построчной обработки параметров SQLAlchemy.
+
+    Значения должны быть уже в формате хранения SQLite, а значения по
+    умолчанию на стороне Python не подставляются: строки содержат все
+    колонки, кроме автоинкрементного ключа.
+    """
+    if not rows:
+        return
+    statement = insert(table).compile(dialect=connection.dialect, column_keys=list(rows[0]))
+    # Параметры идут в порядке колонок таблицы, а не ключей строки
+    columns = statement.positiontup
+    connection.exec_driver_sql(str(statement), [tuple(row[column] for column in columns) for row in rows])
+
+
+def write_batch(connection, items: List[Dict[str, Any]], first_id: int, now: datetime):
+    """Вставить пачку позиций с характеристиками, историей цен и журналом изменений"""
+    rates = dict(connection.execute(select(ExchangeRate.currency, ExchangeRate.rate)).all())
+    equipment, specs, history, daily, monthly = [], [], [], [], []
+    for offset, item in enumerate(items):
+        equipment_id = first_id + offset
+        created_at = now - item["age"]
+        timestamp = created_at.strftime(DATETIME_FORMAT)
+        rate = rates.get(item["currency"])
+        price, currency, availability = item["price"], item["currency"], int(item["availability"])
+        equipment.append({
+            "id": equipment_id,
+            "name": item["name"],
+            "category": item["category"],
+            "description": item["description"],
+            "price": price,
+            "currency": currency,
+            "brand": item["brand"],
+            "model": item["model"],
+            "specifications": json.dumps(item["specifications"], ensure_ascii=False),
+            "availability": availability,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "price_rub": price * rate if rate is not None else None,
+        })
+        specs.extend(dict(row, equipment_id=equipment_id) for row in spec_rows(item["specifications"]))
+        history.append({
+            "equipment_id": equipment_id, "price": price, "currency": currency,
+            "availability": availability, "changed_at": timestamp,
+        })
+        # У новой позиции одна цена: сводки дня и месяца складывать не с чем
+        rollup = {
+            "equipment_id": equipment_id, "currency": currency, "changes": 1,
+            "open_price": price, "close_price": price, "min_price": price, "max_price": price,
+        }
+        daily.append(dict(rollup, period=created_at.strftime(DATE_FORMAT)))
+        monthly.append(dict(rollup, period=created_at.strftime(DATE_FORMAT[:-2] + "01")))
+
+    insert_rows(connection, Equipment.__table__, equipment)
+    insert_rows(connection, EquipmentSpec.__table__, specs)
+    insert_rows(connection, PriceHistory.__table__, history)
+    insert_rows(connection, PriceDaily.__table__, daily)
+    insert_rows(connection, PriceMonthly.__table__, monthly)
+    # Запущенные бот и админ-панель перестроят индексы по журналу
+    changed_at = now.strftime(DATETIME_FORMAT)
+    insert_rows(connection, CatalogChange.__table__, [
+        {"equipment_id": row["id"], "changed_at": changed_at} for row in equipment
+    ])
+
+
+async def generate_catalog(items: int, seed: int = DEFAULT_SEED, batch_size: int = BATCH_SIZE) -> int:
+    """Добавить items синтетических позиций в базу, одна пачка - одна транзакция"""
+    await init_db()
+    async with engine.connect() as connection:
+        first_id = (await connection.scalar(select(func.max(Equipment.id))) or 0) + 1
+    # Номера продолжают каталог: модели, а с ними и пары (brand, model), не повторяют уже добавленные
+    first_number = first_id - 1
+    now = datetime.utcnow()
+    for start in range(0, items, batch_size):
+        numbers = range(first_number + start, first_number + min(items, start + batch_size))
+        batch = [catalog_item(number, seed) for number in numbers]
+        async with engine.begin() as connection:
+            await connection.run_sync(write_batch, batch, first_id + start, now)
+    if Config.STATS_MATERIALIZED:
+        async with engine.begin() as connection:
+            await connection.run_sync(rebuild_catalog_stats)
+    return items
+
+
+async def main():
+    """Заполнение базы из командной строки"""
+    parser = argparse.ArgumentParser(description="Синтетический каталог оборудования")
+    parser.add_argument("--items", type=int, default=10000, help="Число позиций")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Зерно генератора")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Позиций в одной транзакции")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        await generate_catalog(args.items, args.seed, args.batch_size)
+    finally:
+        await engine.dispose()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Добавлено {args.items} позиций за {elapsed:.1f} с ({args.items / elapsed:.0f} позиций/с)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Заглушка Telegram Bot API: ответы методов и обновления пользователей.
+
+FakeBotApi формирует ответы так, как их вернул бы Telegram, и считает
+вызовы методов. FakeRequest отдает эти ответы боту без сети, поэтому
+обработчики EquipmentBot можно вызывать с поддельными Update в бенчмарках.
+"""
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_ID = 1000000
+BOT_TOKEN = f"{BOT_ID}:benchmark"
+BOT_USER = {"id": BOT_ID, "is_bot": True, "first_name": "Equipment Bot", "username": "equipment_benchmark_bot"}
+
+
+def user_payload(user_id: int) -> Dict[str, Any]:
+    """Пользователь Telegram"""
+    return {
+        "id": user_id, "is_bot": False, "first_name": f"Пользователь {user_id}",
+        "username": f"user{user_id}", "language_code": "ru",
+    }
+
+
+def chat_payload(user_id: int) -> Dict[str, Any]:
+    """Личный чат с пользователем"""
+    return {"id": user_id, "type": "private", "first_name": f"Пользователь {user_id}", "username": f"user{user_id}"}
+
+
+class FakeBotApi:
+    """Состояние заглушки: номера сообщений, обновлений и счетчики вызванных методов"""
+
+    def __init__(self):
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self.calls: Counter = Counter()
+
+    def message(self, chat_id: int, text: str, sender: Optional[Dict[str, Any]] = None,
+                message_id: Optional[int] = None) -> Dict[str, Any]:
+        """Сообщение в личном чате, по умолчанию от бота"""
+        message = {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": chat_payload(chat_id),
+            "from": sender or BOT_USER,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return message
+
+    def message_update(self, user_id: int, text: str) -> Dict[str, Any]:
+        """Обновление с сообщением пользователя"""
+        return {
+            "update_id": next(self._update_ids),
+            "message": self.message(user_id, text, sender=user_payload(user_id)),
+        }
+
+    def callback_update(self, user_id: int, data: str, message_id: Optional[int] = None) -> Dict[str, Any]:
+        """Обновление с нажатием кнопки под сообщением бота"""
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._callback_ids)),
+                "from": user_payload(user_id),
+                "chat_instance": str(user_id),
+                "message": self.message(user_id, "📂 Выберите категорию оборудования:", message_id=message_id),
+                "data": data,
+            },
+        }
+
+    def result(self, method: str, params: Dict[str, Any]) -> Any:
+        """Результат вызова метода Bot API"""
+        self.calls[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "sendMessage":
+            return self.message(int(params["chat_id"]), params.get("text", ""))
+        if method == "editMessageText":
+            if "inline_message_id" in params:
+                return True
+            return self.message(int(params["chat_id"]), params.get("text", ""), message_id=int(params["message_id"]))
+        if method == "getUpdates":
+            return []
+        # answerCallbackQuery, answerInlineQuery, setWebhook и прочие возвращают True
+        return True
+
+
+class FakeRequest(BaseRequest):
+    """Транспорт python-telegram-bot, отвечающий из FakeBotApi без обращения к сети"""
+
+    def __init__(self, api: FakeBotApi):
+        self.api = api
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        body = {"ok": True, "result": self.api.result(endpoint, params)}
+        return 200, json.dumps(body, ensure_ascii=False).encode()
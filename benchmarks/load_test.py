@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бота с локальной заглушкой Telegram Bot API.
+
+Скрипт поднимает на 127.0.0.1 сервер Bot API (getUpdates, sendMessage,
+editMessageText, answerCallbackQuery и остальные методы отвечают как
+Telegram) и запускает EquipmentBot с BOT_API_BASE_URL, указывающим на
+него. Бот получает обновления через long polling, как в работе. Каждый
+из N пользователей отправляет /start, а затем поисковые запросы, нажатия
+категорий и позиций из кнопок последнего ответа бота, дожидаясь ответа
+перед следующим действием.
+
+В отчете пропускная способность, p50/p95/p99 времени ответа
+пользователю и времени обработчиков по видам действий, время запросов к
+базе. Лимиты исходящих сообщений Telegram сняты, чтобы замерялись
+обработчики, а не ожидание лимитов; заданные в окружении OUTBOX_* имеют
+приоритет:
+
+    python -m benchmarks.load_test --items 100000 --users 50 --actions 40
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_telegram import BOT_TOKEN, FakeBotApi
+
+
+def _free_port() -> int:
+    """Свободный локальный порт для заглушки Bot API"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Окружение задается до импорта config и database
+PORT = _free_port()
+_workdir = tempfile.mkdtemp(prefix="load_test_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'load_test.db')}"
+os.environ["BOT_TOKEN"] = BOT_TOKEN
+os.environ["BOT_API_BASE_URL"] = f"http://127.0.0.1:{PORT}/bot"
+os.environ["BOT_MODE"] = "polling"
+for name in ("OUTBOX_GLOBAL_RATE", "OUTBOX_CHAT_RATE", "OUTBOX_GROUP_RATE"):
+    os.environ.setdefault(name, "1000000")
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+
+from benchmarks.catalog import DEFAULT_SEED, PROFILES, SEARCH_QUERIES, generate_catalog
+from benchmarks.timings import summarize
+from config import Config
+from database import engine, read_engine
+import bot
+
+# Ответы бота, которых ждет пользователь
+REPLY_METHODS = ("sendMessage", "editMessageText")
+# Сервер может вернуть пустой getUpdates раньше timeout бота; короткое ожидание ускоряет остановку
+LONG_POLL_LIMIT = 1.0
+
+# Доли действий пользователя после /start
+ACTION_WEIGHTS = (("search", 0.4), ("category", 0.25), ("equipment", 0.35))
+
+# Время запросов к базе текущего обновления
+_update_db_time: contextvars.ContextVar = contextvars.ContextVar("update_db_time", default=None)
+
+
+def action_kind(update: Update) -> str:
+    """Вид действия пользователя: команда, поиск или кнопка"""
+    if update.callback_query:
+        return update.callback_query.data.split("_", 1)[0]
+    text = update.message.text if update.message else ""
+    if text.startswith("/"):
+        return text.split()[0][1:]
+    return "search"
+
+
+class LoadMetrics:
+    """Времена ответов пользователям, обработчиков и запросов к базе"""
+
+    def __init__(self):
+        self.responses: Dict[str, List[float]] = defaultdict(list)
+        self.handlers: Dict[str, List[float]] = defaultdict(list)
+        self.handler_db: Dict[str, List[float]] = defaultdict(list)
+        self.queries: List[float] = []
+        self.timeouts: Counter = Counter()
+        self._handler_started: Dict[int, float] = {}
+
+    def attach(self, application):
+        """Замер обработчиков бота: группы до и после обработчиков EquipmentBot"""
+        application.add_handler(TypeHandler(Update, self.update_started), group=-1)
+        application.add_handler(TypeHandler(Update, self.update_finished), group=1)
+        for sync_engine in {engine.sync_engine, read_engine.sync_engine}:
+            event.listen(sync_engine, "before_cursor_execute", self.query_started)
+            event.listen(sync_engine, "after_cursor_execute", self.query_finished)
+
+    async def update_started(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Все группы обработчиков одного обновления выполняются в одной задаче
+        _update_db_time.set([0.0])
+        self._handler_started[update.update_id] = time.perf_counter()
+
+    async def update_finished(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        started = self._handler_started.pop(update.update_id, None)
+        if started is None:
+            return
+        kind = action_kind(update)
+        self.handlers[kind].append(time.perf_counter() - started)
+        self.handler_db[kind].append(_update_db_time.get()[0])
+
+    def query_started(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        self.queries.append(elapsed)
+        db_time = _update_db_time.get()
+        if db_time is not None:
+            db_time[0] += elapsed
+
+
+class FakeTelegramServer:
+    """Bot API на 127.0.0.1: getUpdates отдает действия пользователей, ответы бота будят их"""
+
+    def __init__(self, api: FakeBotApi, port: int):
+        self.api = api
+        self.updates: asyncio.Queue = asyncio.Queue()
+        # Пользователь, ожидающий ответа бота, по чату
+        self.waiting: Dict[int, asyncio.Future] = {}
+        app = FastAPI(title="Fake Telegram Bot API", docs_url=None, redoc_url=None, openapi_url=None)
+        app.add_api_route("/bot{token}/{method}", self.handle, methods=["GET", "POST"])
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        # Сигналы завершения обрабатывает сам скрипт
+        self.server.install_signal_handlers = lambda: None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        self.server.should_exit = True
+        await self._task
+
+    async def handle(self, token: str, method: str, request: Request):
+        """Вызов метода Bot API; параметры python-telegram-bot передает формой"""
+        if token != BOT_TOKEN:
+            return JSONResponse({"ok": False, "error_code": 401, "description": "Unauthorized"}, status_code=401)
+        params = dict(await request.form())
+        if method == "getUpdates":
+            self.api.calls[method] += 1
+            result = await self.get_updates(params)
+        else:
+            result = self.api.result(method, params)
+            if method in REPLY_METHODS:
+                self.reply(params)
+        return JSONResponse({"ok": True, "result": result})
+
+    async def get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Накопившиеся обновления или ожидание первого из них"""
+        limit = int(params.get("limit", 100))
+        if self.updates.empty():
+            timeout = min(float(params.get("timeout", 0)), LONG_POLL_LIMIT)
+            try:
+                first = await asyncio.wait_for(self.updates.get(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        else:
+            first = self.updates.get_nowait()
+        updates = [first]
+        while len(updates) < limit and not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    def reply(self, params: Dict[str, Any]):
+        """Передать пользователю ответ бота с callback_data его кнопок"""
+        waiter = self.waiting.pop(int(params["chat_id"]), None)
+        if waiter is None or waiter.done():
+            return
+        markup = json.loads(params["reply_markup"]) if params.get("reply_markup") else {}
+        waiter.set_result([
+            button["callback_data"]
+            for row in markup.get("inline_keyboard", [])
+            for button in row
+            if "callback_data" in button
+        ])
+
+
+async def simulate_user(user_id: int, server: FakeTelegramServer, metrics: LoadMetrics, args):
+    """Пользователь: /start, затем действия с ожиданием ответа на каждое"""
+    rng = random.Random(args.seed * 1_000_003 + user_id)
+    categories = list(PROFILES)
+    kinds = [kind for kind, _ in ACTION_WEIGHTS]
+    weights = [weight for _, weight in ACTION_WEIGHTS]
+    details: List[str] = []
+    for step in range(args.actions):
+        kind = "start" if step == 0 else rng.choices(kinds, weights)[0]
+        if kind == "start":
+            payload = server.api.message_update(user_id, "/start")
+        elif kind == "search":
+            payload = server.api.message_update(user_id, rng.choice(SEARCH_QUERIES))
+        elif kind == "category":
+            payload = server.api.callback_update(user_id, f"category_{rng.choice(categories)}")
+        else:
+            # Позиция из последнего списка, который показал бот
+            data = rng.choice(details) if details else f"equipment_{rng.randint(1, args.items)}"
+            payload = server.api.callback_update(user_id, data)
+
+        reply = server.waiting[user_id] = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await server.updates.put(payload)
+        try:
+            buttons = await asyncio.wait_for(reply, args.reply_timeout)
+        except asyncio.TimeoutError:
+            metrics.timeouts[kind] += 1
+            server.waiting.pop(user_id, None)
+        else:
+            metrics.responses[kind].append(time.perf_counter() - started)
+            listed = [data for data in buttons if data.startswith("equipment_")]
+            if listed:
+                details = listed
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+def report(metrics: LoadMetrics, api: FakeBotApi, elapsed: float, args) -> Dict[str, Any]:
+    """Вывести отчет и вернуть его для JSON"""
+    actions = sum(len(timings) for timings in metrics.responses.values())
+    handler_time = sum(sum(timings) for timings in metrics.handlers.values())
+    db_time = sum(sum(timings) for timings in metrics.handler_db.values())
+    results = {
+        "meta": {
+            "items": args.items,
+            "users": args.users,
+            "actions_per_user": args.actions,
+            "think_time": args.think_time,
+            "update_workers": Config.UPDATE_WORKERS,
+            "search_backend": Config.SEARCH_BACKEND,
+        },
+        "elapsed_s": elapsed,
+        "actions": actions,
+        "actions_per_s": actions / elapsed if elapsed else 0.0,
+        "timeouts": dict(metrics.timeouts),
+        "responses": {kind: summarize(timings) for kind, timings in metrics.responses.items()},
+        "handlers": {kind: summarize(timings) for kind, timings in metrics.handlers.items()},
+        "handler_db": {kind: summarize(timings) for kind, timings in metrics.handler_db.items()},
+        "db_queries": summarize(metrics.queries),
+        "db_share": db_time / handler_time if handler_time else 0.0,
+        "bot_api_calls": dict(api.calls),
+    }
+
+    print(f"\nДействий: {actions} за {elapsed:.1f} с, {results['actions_per_s']:.0f} действий/с; "
+          f"пользователей {args.users}, обработчиков {Config.UPDATE_WORKERS}")
+    if metrics.timeouts:
+        print(f"❌ Без ответа за {args.reply_timeout:.0f} с: {dict(metrics.timeouts)}")
+    print(f"\n{'Действие':<12} {'кол-во':>7}  {'ответ p50/p95/p99, мс':>24}  {'обработчик p50/p95/p99, мс':>28}  "
+          f"{'база, мс':>9}")
+    for kind in sorted(metrics.responses):
+        response = results["responses"][kind]
+        handler = results["handlers"].get(kind, {})
+        handler_db = results["handler_db"].get(kind, {})
+        print(f"{kind:<12} {response['iterations']:>7}  "
+              f"{response['p50_ms']:>7.1f} {response['p95_ms']:>7.1f} {response['p99_ms']:>8.1f}  "
+              f"{handler.get('p50_ms', 0):>8.1f} {handler.get('p95_ms', 0):>8.1f} {handler.get('p99_ms', 0):>10.1f}  "
+              f"{handler_db.get('mean_ms', 0):>9.2f}")
+    queries = results["db_queries"]
+    if queries["iterations"]:
+        print(f"\nЗапросов к базе: {queries['iterations']}, p50 {queries['p50_ms']:.2f} мс, "
+              f"p95 {queries['p95_ms']:.2f} мс, p99 {queries['p99_ms']:.2f} мс; "
+              f"база - {results['db_share']:.0%} времени обработчиков")
+    print(f"Вызовы Bot API: {dict(api.calls)}")
+    return results
+
+
+async def run(args) -> Dict[str, Any]:
+    """Каталог, заглушка Bot API, бот и пользователи"""
+    started = time.perf_counter()
+    await generate_catalog(args.items, args.seed)
+    print(f"Каталог из {args.items} позиций готов за {time.perf_counter() - started:.1f} с")
+
+    api = FakeBotApi()
+    server = FakeTelegramServer(api, PORT)
+    await server.start()
+    metrics = LoadMetrics()
+    equipment_bot = bot.EquipmentBot()
+    metrics.attach(equipment_bot.application)
+    await equipment_bot.start()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(user_id, server, metrics, args)
+            for user_id in range(args.first_user_id, args.first_user_id + args.users)
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        await equipment_bot.stop()
+        await server.stop()
+    return report(metrics, api, elapsed, args)
+
+
+async def main():
+    """Нагрузочный тест из командной строки"""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с заглушкой Telegram Bot API")
+    parser.add_argument("--items", type=int, default=10000, help="Размер синтетического каталога")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Зерно генератора каталога и действий")
+    parser.add_argument("--users", type=int, default=50, help="Одновременных пользователей")
+    parser.add_argument("--actions", type=int, default=40, help="Действий каждого пользователя, включая /start")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Средняя пауза пользователя между ответом и следующим действием, с")
+    parser.add_argument("--reply-timeout", type=float, default=30.0, help="Сколько ждать ответа бота, с")
+    parser.add_argument("--first-user-id", type=int, default=700000, help="Telegram ID первого пользователя")
+    parser.add_argument("--output", help="Файл для отчета в JSON")
+    args = parser.parse_args()
+
+    # Каждый getUpdates и ответ бота иначе попадает в лог
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    try:
+        results = await run(args)
+    finally:
+        await engine.dispose()
+        await read_engine.dispose()
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
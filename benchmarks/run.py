@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки горячих путей бота и админ-панели.
+
+Скрипт создает временную базу с синтетическим каталогом заданного размера,
+загружает индексы каталога, как при запуске бота, и замеряет сервисы,
+страницу dashboard админ-панели и обработчики бота, вызванные с
+поддельными Update. Сообщения бота уходят в заглушку Bot API, а не в
+Telegram. Результаты выводятся таблицей и сохраняются в JSON; при
+сравнении с сохраненной базовой линией рост медианы больше допуска
+считается регрессией, и скрипт завершается с кодом 1:
+
+    python -m benchmarks.run --items 100000 --save-baseline
+    python -m benchmarks.run --items 100000 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.fake_telegram import BOT_TOKEN, FakeBotApi, FakeRequest
+
+# База задается до импорта database: движки создаются при импорте
+_workdir = tempfile.mkdtemp(prefix="benchmarks_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'benchmark.db')}"
+# Обработчики бота не должны обращаться к настоящему Telegram
+os.environ["BOT_TOKEN"] = BOT_TOKEN
+
+import httpx
+from telegram import Update
+from telegram.ext import CallbackContext, ExtBot
+
+from benchmarks.catalog import DEFAULT_SEED, PROFILES, SEARCH_QUERIES, generate_catalog
+from benchmarks.timings import summarize
+from config import Config
+from database import async_session, engine, read_engine
+from models import SearchRequest
+from services import EquipmentService, LIST_FIELDS, load_catalog_indexes, search_cache
+import admin_panel
+import bot
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPOSITORY, "benchmarks", "baseline.json")
+
+USER_ID = 500001
+
+
+@dataclass
+class Benchmark:
+    """Замеряемая операция; номер итерации выбирает входные данные"""
+    name: str
+    run: Callable[[int], Awaitable[Any]]
+    # Выполняется перед каждой итерацией и в замер не входит
+    setup: Optional[Callable[[], None]] = None
+
+
+async def measure(benchmark: Benchmark, iterations: int, warmup: int) -> Dict[str, float]:
+    """Прогреть операцию и замерить iterations ее выполнений"""
+    timings = []
+    for iteration in range(warmup + iterations):
+        if benchmark.setup:
+            benchmark.setup()
+        started = time.perf_counter()
+        await benchmark.run(iteration)
+        if iteration >= warmup:
+            timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def benchmarks(items: int, telegram_bot: ExtBot, api: FakeBotApi) -> List[Benchmark]:
+    """Замеряемые операции сервисов, админ-панели и обработчиков бота"""
+    categories = list(PROFILES)
+    equipment_bot = bot.EquipmentBot()
+    application = equipment_bot.application
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=admin_panel.app), base_url="http://admin")
+
+    def query(iteration: int) -> str:
+        return SEARCH_QUERIES[iteration % len(SEARCH_QUERIES)]
+
+    def equipment_id(iteration: int) -> int:
+        # Разбросанные по каталогу позиции, чтобы не читать одни и те же страницы
+        return 1 + (iteration * 7919) % items
+
+    async def search(search_request: SearchRequest, **kwargs):
+        async with async_session() as db:
+            return await EquipmentService(db).search_equipment(search_request, limit=10, fields=LIST_FIELDS, **kwargs)
+
+    async def first_page(iteration: int):
+        async with async_session() as db:
+            return await EquipmentService(db).get_all_equipment(limit=20, fields=LIST_FIELDS)
+
+    cursors: List[str] = []
+
+    async def next_page(iteration: int):
+        async with async_session() as db:
+            equipment_service = EquipmentService(db)
+            if not cursors:
+                await equipment_service.get_all_equipment(limit=20, fields=LIST_FIELDS)
+                cursors.append(equipment_service.next_cursor)
+            return await equipment_service.get_all_equipment(limit=20, cursor=cursors[0], fields=LIST_FIELDS)
+
+    async def get_categories(iteration: int):
+        async with async_session() as db:
+            return await EquipmentService(db).get_categories()
+
+    async def dashboard(iteration: int):
+        response = await client.get("/")
+        response.raise_for_status()
+
+    async def handle(handler, payload: Dict[str, Any]):
+        update = Update.de_json(payload, telegram_bot)
+        await handler(update, CallbackContext.from_update(update, application))
+
+    def callback(data: Callable[[int], str]):
+        return lambda iteration: handle(equipment_bot.handle_callback, api.callback_update(USER_ID, data(iteration)))
+
+    return [
+        Benchmark("search_equipment: text",
+                  lambda i: search(SearchRequest(query=query(i))), setup=search_cache.clear),
+        Benchmark("search_equipment: text, cached",
+                  lambda i: search(SearchRequest(query=SEARCH_QUERIES[0]))),
+        Benchmark("search_equipment: text + facets",
+                  lambda i: search(SearchRequest(query=query(i)), facets=True),
+                  setup=search_cache.clear),
+        Benchmark("search_equipment: category",
+                  lambda i: search(SearchRequest(category=categories[i % len(categories)])), setup=search_cache.clear),
+        Benchmark("search_equipment: category + price, by price",
+                  lambda i: search(SearchRequest(
+                      category=categories[i % len(categories)], availability=True,
+                      min_price=10_000, max_price=200_000, sort="price"
+                  )), setup=search_cache.clear),
+        Benchmark("get_all_equipment: first page", first_page),
+        Benchmark("get_all_equipment: next page", next_page),
+        Benchmark("get_categories", get_categories),
+        Benchmark("admin: dashboard", dashboard),
+        Benchmark("bot: search message",
+                  lambda i: handle(equipment_bot.handle_message, api.message_update(USER_ID, query(i))),
+                  setup=search_cache.clear),
+        Benchmark("bot: category click",
+                  callback(lambda i: f"category_{categories[i % len(categories)]}"), setup=search_cache.clear),
+        Benchmark("bot: equipment card", callback(lambda i: f"equipment_{equipment_id(i)}"),
+                  setup=bot.card_cache.clear),
+        Benchmark("bot: similar items", callback(lambda i: f"similar_{equipment_id(i)}")),
+        Benchmark("bot: price history", callback(lambda i: f"history_{equipment_id(i)}")),
+    ]
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Вывести изменение медиан относительно базовой линии; имена замедлившихся операций"""
+    if baseline["meta"].get("items") != results["meta"]["items"]:
+        print(f"⚠️ Базовая линия снята на {baseline['meta'].get('items')} позициях, "
+              f"текущий запуск - на {results['meta']['items']}")
+    regressions = []
+    print(f"\n{'Операция':<48} {'база p50':>10} {'p50':>10} {'изменение':>10}")
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if not previous:
+            print(f"{name:<48} {'-':>10} {current['p50_ms']:>10.2f} {'новая':>10}")
+            continue
+        change = current["p50_ms"] / previous["p50_ms"] - 1 if previous["p50_ms"] else 0.0
+        marker = ""
+        if change > tolerance:
+            regressions.append(name)
+            marker = " ❌"
+        print(f"{name:<48} {previous['p50_ms']:>10.2f} {current['p50_ms']:>10.2f} {change:>+10.0%}{marker}")
+    return regressions
+
+
+async def run(args) -> Dict[str, Any]:
+    """Подготовить каталог и выполнить все замеры"""
+    started = time.perf_counter()
+    await generate_catalog(args.items, args.seed)
+    async with async_session() as db:
+        await load_catalog_indexes(db)
+    print(f"Каталог из {args.items} позиций готов за {time.perf_counter() - started:.1f} с")
+
+    api = FakeBotApi()
+    telegram_bot = ExtBot(BOT_TOKEN, request=FakeRequest(api), get_updates_request=FakeRequest(api))
+    await telegram_bot.initialize()
+
+    results = {
+        "meta": {
+            "items": args.items,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "search_backend": Config.SEARCH_BACKEND,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "benchmarks": {},
+    }
+    print(f"\n{'Операция':<48} {'p50, мс':>10} {'p95, мс':>10} {'p99, мс':>10} {'оп/с':>10}")
+    for benchmark in benchmarks(args.items, telegram_bot, api):
+        if args.only and args.only not in benchmark.name:
+            continue
+        summary = await measure(benchmark, args.iterations, args.warmup)
+        results["benchmarks"][benchmark.name] = summary
+        print(f"{benchmark.name:<48} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+              f"{summary['p99_ms']:>10.2f} {summary['ops_per_s']:>10.0f}")
+    await telegram_bot.shutdown()
+    # Сколько раз обработчики обратились к Bot API: ответы действительно отправлялись
+    results["meta"]["bot_api_calls"] = dict(api.calls)
+    return results
+
+
+async def main():
+    """Бенчмарки из командной строки"""
+    parser = argparse.ArgumentParser(description="Бенчмарки бота и админ-панели на синтетическом каталоге")
+    parser.add_argument("--items", type=int, default=10000, help="Размер синтетического каталога")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Зерно генератора каталога")
+    parser.add_argument("--iterations", type=int, default=200, help="Замеров каждой операции")
+    parser.add_argument("--warmup", type=int, default=20, help="Незамеряемых прогонов перед замерами")
+    parser.add_argument("--only", help="Выполнить только операции, в имени которых есть эта строка")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Файл базовой линии")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как базовую линию")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Допустимый рост медианы относительно базовой линии, доля")
+    args = parser.parse_args()
+
+    # Шаблоны админ-панели ищутся относительно рабочего каталога
+    os.chdir(REPOSITORY)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    try:
+        results = await run(args)
+    finally:
+        await engine.dispose()
+        await read_engine.dispose()
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        print(f"\n✅ Базовая линия сохранена в {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nБазовой линии {args.baseline} нет, сравнение пропущено")
+        return
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ Медиана выросла больше чем на {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ Регрессий относительно базовой линии нет")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+"""
+Сводка замеренных времен
+"""
+from typing import Dict, List
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """Сводка времен одной операции в миллисекундах"""
+    timings = sorted(timings)
+    if not timings:
+        return {"iterations": 0}
+
+    def percentile(p: float) -> float:
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+    mean = sum(timings) / len(timings)
+    return {
+        "iterations": len(timings),
+        "mean_ms": mean * 1000,
+        "min_ms": timings[0] * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": timings[-1] * 1000,
+        "ops_per_s": 1 / mean if mean else 0.0,
+    }
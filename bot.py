@@ -1,378 +1,659 @@
-import asyncio
-import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
-from telegram.constants import ParseMode
-from database import init_db, async_session
-from services import EquipmentService, UserService
-from models import SearchRequest
-from config import Config
-import json
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-class EquipmentBot:
-    def __init__(self):
-        self.application = Application.builder().token(Config.BOT_TOKEN).build()
-        self.setup_handlers()
-    
-    def setup_handlers(self):
-        """Настройка обработчиков команд"""
-        # Команды
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(CommandHandler("search", self.search_command))
-        self.application.add_handler(CommandHandler("categories", self.categories_command))
-        self.application.add_handler(CommandHandler("admin", self.admin_command))
-        
-        # Обработчики сообщений
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
-        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
-    
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /start"""
-        user = update.effective_user
-        
-        # Регистрируем пользователя в базе данных
-        async with async_session() as db:
-            user_service = UserService(db)
-            await user_service.get_or_create_user(
-                telegram_id=user.id,
-                username=user.username,
-                first_name=user.first_name,
-                last_name=user.last_name
-            )
-        
-        welcome_text = f"""
-🔧 Добро пожаловать в бот-консультант по оборудованию!
-
-Привет, {user.first_name}! Я помогу вам найти информацию о стоимости и характеристиках оборудования.
-
-📋 Доступные команды:
-/search - Поиск оборудования
-/categories - Просмотр категорий
-/help - Справка по командам
-
-💡 Просто напишите название оборудования или его характеристики, и я найду подходящие варианты!
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Поиск оборудования", callback_data="search")],
-            [InlineKeyboardButton("📂 Категории", callback_data="categories")],
-            [InlineKeyboardButton("❓ Помощь", callback_data="help")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(welcome_text, reply_markup=reply_markup)
-    
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /help"""
-        help_text = """
-📖 Справка по использованию бота:
-
-🔍 **Поиск оборудования:**
-• Используйте команду /search для поиска
-• Или просто напишите название оборудования
-• Можно указать бренд, модель, характеристики
-
-📂 **Категории оборудования:**
-• Компьютеры и ноутбуки
-• Серверное оборудование
-• Сетевое оборудование
-• Принтеры и МФУ
-• Мониторы и дисплеи
-• Комплектующие
-• Периферия
-• Другое
-
-💡 **Примеры запросов:**
-• "iPhone 15"
-• "ноутбук Dell"
-• "принтер HP"
-• "монитор 24 дюйма"
-• "сервер Dell PowerEdge"
-
-⚙️ **Админ-команды** (только для администраторов):
-• /admin - Панель администратора
-        """
-        
-        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
-    
-    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /search"""
-        query = " ".join(context.args) if context.args else ""
-        
-        if not query:
-            await update.message.reply_text(
-                "🔍 Введите запрос для поиска оборудования.\n\nПример: /search iPhone 15"
-            )
-            return
-        
-        await self.perform_search(update, context, query)
-    
-    async def categories_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /categories"""
-        keyboard = []
-        for category in Config.EQUIPMENT_CATEGORIES:
-            keyboard.append([InlineKeyboardButton(
-                f"📂 {category}", 
-                callback_data=f"category_{category}"
-            )])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
-            "📂 Выберите категорию оборудования:",
-            reply_markup=reply_markup
-        )
-    
-    async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /admin"""
-        user_id = update.effective_user.id
-        
-        # Проверяем права администратора
-        async with async_session() as db:
-            user_service = UserService(db)
-            is_admin = await user_service.is_admin(user_id)
-        
-        if not is_admin and user_id != Config.ADMIN_USER_ID:
-            await update.message.reply_text("❌ У вас нет прав администратора.")
-            return
-        
-        keyboard = [
-            [InlineKeyboardButton("➕ Добавить оборудование", callback_data="admin_add")],
-            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
-            [InlineKeyboardButton("🌐 Веб-панель", callback_data="admin_web")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            "⚙️ Панель администратора:",
-            reply_markup=reply_markup
-        )
-    
-    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик текстовых сообщений"""
-        query = update.message.text.strip()
-        await self.perform_search(update, context, query)
-    
-    async def perform_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE, query: str):
-        """Выполнение поиска оборудования"""
-        async with async_session() as db:
-            equipment_service = EquipmentService(db)
-            search_request = SearchRequest(query=query)
-            results = await equipment_service.search_equipment(search_request, limit=10)
-        
-        if not results:
-            await update.message.reply_text(
-                f"😔 По запросу '{query}' ничего не найдено.\n\n"
-                "Попробуйте:\n"
-                "• Изменить поисковый запрос\n"
-                "• Использовать более общие термины\n"
-                "• Проверить правильность написания"
-            )
-            return
-        
-        # Отправляем результаты
-        if len(results) == 1:
-            await self.send_equipment_details(update, results[0])
-        else:
-            await self.send_search_results(update, results, query)
-    
-    async def send_search_results(self, update: Update, results, query: str):
-        """Отправка результатов поиска"""
-        text = f"🔍 Найдено {len(results)} результатов по запросу '{query}':\n\n"
-        
-        keyboard = []
-        for i, equipment in enumerate(results[:10]):  # Показываем максимум 10 результатов
-            price_text = f"{equipment.price:,.0f} {equipment.currency}"
-            text += f"{i+1}. **{equipment.name}**\n"
-            text += f"   💰 {price_text}\n"
-            if equipment.brand:
-                text += f"   🏷️ {equipment.brand}"
-                if equipment.model:
-                    text += f" {equipment.model}"
-                text += "\n"
-            text += f"   📂 {equipment.category}\n\n"
-            
-            keyboard.append([InlineKeyboardButton(
-                f"{i+1}. {equipment.name[:30]}...",
-                callback_data=f"equipment_{equipment.id}"
-            )])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    
-    async def send_equipment_details(self, update: Update, equipment):
-        """Отправка детальной информации об оборудовании"""
-        text = f"🔧 **{equipment.name}**\n\n"
-        
-        price_text = f"{equipment.price:,.0f} {equipment.currency}"
-        text += f"💰 **Цена:** {price_text}\n"
-        text += f"📂 **Категория:** {equipment.category}\n"
-        
-        if equipment.brand:
-            text += f"🏷️ **Бренд:** {equipment.brand}\n"
-        if equipment.model:
-            text += f"📱 **Модель:** {equipment.model}\n"
-        
-        if equipment.description:
-            text += f"\n📝 **Описание:**\n{equipment.description}\n"
-        
-        if equipment.specifications:
-            try:
-                specs = json.loads(equipment.specifications)
-                if specs:
-                    text += "\n⚙️ **Характеристики:**\n"
-                    for key, value in specs.items():
-                        text += f"• {key}: {value}\n"
-            except:
-                pass
-        
-        availability = "✅ В наличии" if equipment.availability else "❌ Нет в наличии"
-        text += f"\n📦 **Наличие:** {availability}"
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Поиск похожих", callback_data=f"similar_{equipment.id}")],
-            [InlineKeyboardButton("📂 Категория", callback_data=f"category_{equipment.category}")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    
-    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик callback запросов"""
-        query = update.callback_query
-        await query.answer()
-        
-        data = query.data
-        
-        if data == "search":
-            await query.edit_message_text(
-                "🔍 Введите название оборудования для поиска:"
-            )
-        elif data == "categories":
-            await self.categories_command(update, context)
-        elif data == "help":
-            await self.help_command(update, context)
-        elif data.startswith("equipment_"):
-            equipment_id = int(data.split("_")[1])
-            await self.show_equipment_details(query, equipment_id)
-        elif data.startswith("category_"):
-            category = data.split("_", 1)[1]
-            await self.show_category_equipment(query, category)
-        elif data.startswith("admin_"):
-            await self.handle_admin_callback(query, data)
-    
-    async def show_equipment_details(self, query, equipment_id: int):
-        """Показать детали оборудования"""
-        async with async_session() as db:
-            equipment_service = EquipmentService(db)
-            equipment = await equipment_service.get_equipment(equipment_id)
-        
-        if not equipment:
-            await query.edit_message_text("❌ Оборудование не найдено.")
-            return
-        
-        # Создаем новый update объект для отправки сообщения
-        update = Update(update_id=0, message=query.message)
-        await self.send_equipment_details(update, equipment)
-    
-    async def show_category_equipment(self, query, category: str):
-        """Показать оборудование категории"""
-        async with async_session() as db:
-            equipment_service = EquipmentService(db)
-            search_request = SearchRequest(category=category)
-            results = await equipment_service.search_equipment(search_request, limit=10)
-        
-        if not results:
-            await query.edit_message_text(f"😔 В категории '{category}' пока нет оборудования.")
-            return
-        
-        text = f"📂 Оборудование в категории '{category}':\n\n"
-        
-        keyboard = []
-        for i, equipment in enumerate(results[:10]):
-            price_text = f"{equipment.price:,.0f} {equipment.currency}"
-            text += f"{i+1}. **{equipment.name}** - {price_text}\n"
-            
-            keyboard.append([InlineKeyboardButton(
-                f"{i+1}. {equipment.name[:30]}...",
-                callback_data=f"equipment_{equipment.id}"
-            )])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    
-    async def handle_admin_callback(self, query, data: str):
-        """Обработка админских callback'ов"""
-        if data == "admin_add":
-            await query.edit_message_text(
-                "➕ Для добавления оборудования используйте веб-панель администратора:\n"
-                f"http://{Config.ADMIN_PANEL_HOST}:{Config.ADMIN_PANEL_PORT}/admin"
-            )
-        elif data == "admin_stats":
-            await self.show_admin_stats(query)
-        elif data == "admin_web":
-            await query.edit_message_text(
-                f"🌐 Веб-панель администратора:\n"
-                f"http://{Config.ADMIN_PANEL_HOST}:{Config.ADMIN_PANEL_PORT}/admin"
-            )
-    
-    async def show_admin_stats(self, query):
-        """Показать статистику"""
-        async with async_session() as db:
-            equipment_service = EquipmentService(db)
-            all_equipment = await equipment_service.get_all_equipment()
-            categories = await equipment_service.get_categories()
-            brands = await equipment_service.get_brands()
-        
-        total_equipment = len(all_equipment)
-        available_equipment = len([e for e in all_equipment if e.availability])
-        
-        text = f"📊 **Статистика базы данных:**\n\n"
-        text += f"🔧 Всего оборудования: {total_equipment}\n"
-        text += f"✅ В наличии: {available_equipment}\n"
-        text += f"❌ Нет в наличии: {total_equipment - available_equipment}\n"
-        text += f"📂 Категорий: {len(categories)}\n"
-        text += f"🏷️ Брендов: {len(brands)}\n\n"
-        
-        if categories:
-            text += "📂 **Категории:**\n"
-            for category in categories[:5]:  # Показываем первые 5
-                count = len([e for e in all_equipment if e.category == category])
-                text += f"• {category}: {count}\n"
-        
-        await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN)
-    
-    async def run(self):
-        """Запуск бота"""
-        # Инициализация базы данных
-        await init_db()
-        
-        # Запуск бота
-        logger.info("Запуск Telegram бота...")
-        await self.application.initialize()
-        await self.application.start()
-        await self.application.updater.start_polling()
-        
-        logger.info("Бот запущен и готов к работе!")
-        
-        # Ожидание завершения
-        try:
-            await asyncio.Event().wait()
-        except KeyboardInterrupt:
-            logger.info("Получен сигнал завершения...")
-        finally:
-            await self.application.updater.stop()
-            await self.application.stop()
-            await self.application.shutdown()
-
-if __name__ == "__main__":
-    bot = EquipmentBot()
-    asyncio.run(bot.run())
-
+import asyncio
+import logging
+import uvicorn
+from datetime import datetime, timedelta
+from typing import Dict
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQuery
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler, filters, ContextTypes
+)
+from telegram.constants import ParseMode
+from database import init_db, async_session
+from services import (
+    EquipmentService, UserService, StatsService, catalog_indexes, load_catalog_indexes,
+    sync_catalog, user_profile_queue, LIST_FIELDS
+)
+from models import SearchRequest, SearchFacets
+from config import Config
+from cards import Card, CardCache, render_price_history
+from search_index import PrefixIndex
+from similarity import SimilarityIndex
+from webhook import create_webhook_app
+from update_processing import BoundedUpdateQueue, ChatOrderedUpdateProcessor
+from outbox import LANE_BULK, OutboxRateLimiter
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Готовые карточки оборудования, сбрасываются при изменениях каталога
+card_cache = CardCache(Config.CARD_CACHE_SIZE)
+catalog_indexes.append(card_cache)
+
+# Автодополнение inline-режима: ID найденного оборудования без обращения к базе данных
+inline_index = PrefixIndex()
+catalog_indexes.append(inline_index)
+
+# Векторы оборудования для кнопки «Поиск похожих»
+similar_index = SimilarityIndex(dim=Config.SIMILARITY_DIM, price_weight=Config.SIMILAR_PRICE_WEIGHT)
+catalog_indexes.append(similar_index)
+
+# Сколько самых частых категорий и брендов предлагать для уточнения поиска
+REFINE_OPTIONS = 3
+
+class EquipmentBot:
+    def __init__(self):
+        # Обновления разных чатов обрабатываются параллельно, одного чата - по порядку
+        self.update_queue = BoundedUpdateQueue(Config.UPDATE_QUEUE_LIMIT)
+        # Все исходящие запросы проходят через очередь с лимитами Telegram
+        self.rate_limiter = OutboxRateLimiter(
+            global_rate=Config.OUTBOX_GLOBAL_RATE,
+            chat_rate=Config.OUTBOX_CHAT_RATE,
+            group_rate=Config.OUTBOX_GROUP_RATE,
+            max_retries=Config.OUTBOX_MAX_RETRIES
+        )
+        self.application = (
+            Application.builder()
+            .token(Config.BOT_TOKEN)
+            .base_url(Config.BOT_API_BASE_URL)
+            .update_queue(self.update_queue)
+            .rate_limiter(self.rate_limiter)
+            .concurrent_updates(ChatOrderedUpdateProcessor(
+                workers=Config.UPDATE_WORKERS,
+                max_pending=Config.UPDATE_QUEUE_LIMIT
+            ))
+            .build()
+        )
+        # Незавершенный ответ на inline-запрос каждого пользователя
+        self.inline_tasks: Dict[int, asyncio.Task] = {}
+        self.setup_handlers()
+    
+    def setup_handlers(self):
+        """Настройка обработчиков команд"""
+        # Команды
+        self.application.add_handler(CommandHandler("start", self.start_command))
+        self.application.add_handler(CommandHandler("help", self.help_command))
+        self.application.add_handler(CommandHandler("search", self.search_command))
+        self.application.add_handler(CommandHandler("categories", self.categories_command))
+        self.application.add_handler(CommandHandler("admin", self.admin_command))
+        
+        # Обработчики сообщений
+        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
+        self.application.add_handler(InlineQueryHandler(self.inline_query))
+    
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /start"""
+        user = update.effective_user
+        
+        # Регистрируем пользователя в базе данных
+        async with async_session() as db:
+            user_service = UserService(db)
+            await user_service.get_or_create_user(
+                telegram_id=user.id,
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name
+            )
+        
+        welcome_text = f"""
+🔧 Добро пожаловать в бот-консультант по оборудованию!
+
+Привет, {user.first_name}! Я помогу вам найти информацию о стоимости и характеристиках оборудования.
+
+📋 Доступные команды:
+/search - Поиск оборудования
+/categories - Просмотр категорий
+/help - Справка по командам
+
+💡 Просто напишите название оборудования или его характеристики, и я найду подходящие варианты!
+        """
+        
+        keyboard = [
+            [InlineKeyboardButton("🔍 Поиск оборудования", callback_data="search")],
+            [InlineKeyboardButton("📂 Категории", callback_data="categories")],
+            [InlineKeyboardButton("❓ Помощь", callback_data="help")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(welcome_text, reply_markup=reply_markup)
+    
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /help"""
+        help_text = """
+📖 Справка по использованию бота:
+
+🔍 **Поиск оборудования:**
+• Используйте команду /search для поиска
+• Или просто напишите название оборудования
+• Можно указать бренд, модель, характеристики
+
+📂 **Категории оборудования:**
+• Компьютеры и ноутбуки
+• Серверное оборудование
+• Сетевое оборудование
+• Принтеры и МФУ
+• Мониторы и дисплеи
+• Комплектующие
+• Периферия
+• Другое
+
+💡 **Примеры запросов:**
+• "iPhone 15"
+• "ноутбук Dell"
+• "принтер HP"
+• "монитор 24 дюйма"
+• "сервер Dell PowerEdge"
+
+⚙️ **Админ-команды** (только для администраторов):
+• /admin - Панель администратора
+        """
+        
+        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+    
+    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /search"""
+        query = " ".join(context.args) if context.args else ""
+        
+        if not query:
+            await update.message.reply_text(
+                "🔍 Введите запрос для поиска оборудования.\n\nПример: /search iPhone 15"
+            )
+            return
+        
+        await self.perform_search(update, context, query)
+    
+    async def categories_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /categories"""
+        keyboard = []
+        for category in Config.EQUIPMENT_CATEGORIES:
+            keyboard.append([InlineKeyboardButton(
+                f"📂 {category}", 
+                callback_data=f"category_{category}"
+            )])
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await update.message.reply_text(
+            "📂 Выберите категорию оборудования:",
+            reply_markup=reply_markup
+        )
+    
+    async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /admin"""
+        user_id = update.effective_user.id
+        
+        # Проверяем права администратора
+        async with async_session() as db:
+            user_service = UserService(db)
+            is_admin = await user_service.is_admin(user_id)
+        
+        if not is_admin and user_id != Config.ADMIN_USER_ID:
+            await update.message.reply_text("❌ У вас нет прав администратора.")
+            return
+        
+        keyboard = [
+            [InlineKeyboardButton("➕ Добавить оборудование", callback_data="admin_add")],
+            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
+            [InlineKeyboardButton("🌐 Веб-панель", callback_data="admin_web")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            "⚙️ Панель администратора:",
+            reply_markup=reply_markup
+        )
+    
+    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик текстовых сообщений"""
+        query = update.message.text.strip()
+        await self.perform_search(update, context, query)
+    
+    async def perform_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE, query: str):
+        """Выполнение поиска оборудования"""
+        async with async_session() as db:
+            equipment_service = EquipmentService(db)
+            search_request = await equipment_service.parse_search_query(query)
+            # Описание и характеристики нужны только карточке единственного результата
+            results = await equipment_service.search_equipment(
+                search_request, limit=10, fields=LIST_FIELDS, facets=True
+            )
+            if not results and search_request.specs:
+                # Размер или объем бывает указан только в названии или описании: ищем исходный текст
+                search_request = SearchRequest(query=query)
+                results = await equipment_service.search_equipment(
+                    search_request, limit=10, fields=LIST_FIELDS, facets=True
+                )
+            corrected_query = equipment_service.corrected_query
+            facets = equipment_service.facets
+            card = None
+            if len(results) == 1:
+                # Карточка берется из кэша один раз: между проверкой и отрисовкой ее могут сбросить,
+                # а объект из списка загружен без описания и характеристик
+                card = card_cache.get(results[0].id)
+                if card is None:
+                    equipment = await equipment_service.get_equipment(results[0].id)
+                    results = [equipment] if equipment else []
+                    card = card_cache.card(equipment) if equipment else None
+        
+        if not results:
+            await update.message.reply_text(
+                f"😔 По запросу '{query}' ничего не найдено.\n\n"
+                "Попробуйте:\n"
+                "• Изменить поисковый запрос\n"
+                "• Использовать более общие термины\n"
+                "• Проверить правильность написания"
+            )
+            return
+        
+        # Отправляем результаты
+        if len(results) == 1:
+            if corrected_query:
+                await update.message.reply_text(f"✏️ Показаны результаты по запросу '{corrected_query}'")
+            await self.send_equipment_details(update, card)
+        else:
+            if corrected_query:
+                search_request = search_request.model_copy(update={"query": corrected_query})
+            await self.send_search_results(update, context, results, query, corrected_query, search_request, facets)
+    
+    async def send_search_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE, results, query: str,
+                                  corrected_query: str = None, search_request: SearchRequest = None,
+                                  facets: SearchFacets = None):
+        """Отправка результатов поиска"""
+        text, reply_markup = self.render_search_results(
+            context, results, query, corrected_query, search_request, facets
+        )
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    def render_search_results(self, context: ContextTypes.DEFAULT_TYPE, results, query: str,
+                              corrected_query: str = None, search_request: SearchRequest = None,
+                              facets: SearchFacets = None):
+        """Текст и клавиатура результатов поиска с кнопками уточнения"""
+        found = facets.total if facets else len(results)
+        if corrected_query:
+            text = f"✏️ По запросу '{query}' ничего не найдено, показаны результаты для '{corrected_query}'.\n\n"
+            text += f"🔍 Найдено {found} результатов:\n\n"
+        else:
+            text = f"🔍 Найдено {found} результатов по запросу '{query}':\n\n"
+        
+        keyboard = []
+        for i, equipment in enumerate(results[:10]):  # Показываем максимум 10 результатов
+            text += f"{i+1}. {card_cache.search_line(equipment)}"
+            
+            keyboard.append([InlineKeyboardButton(
+                f"{i+1}. {equipment.name[:30]}...",
+                callback_data=f"equipment_{equipment.id}"
+            )])
+        
+        if search_request is not None and facets is not None and facets.total > len(results):
+            keyboard += self.refine_buttons(context, query, search_request, facets)
+        return text, InlineKeyboardMarkup(keyboard)
+    
+    def refine_buttons(self, context: ContextTypes.DEFAULT_TYPE, query: str, search_request: SearchRequest,
+                       facets: SearchFacets):
+        """Кнопки уточнения поиска по фасетам.
+        
+        Фильтры кнопок сохраняются в user_data, а в callback_data передается
+        только номер кнопки, поэтому нажатие не требует повторного подсчета.
+        """
+        options = []
+        if not search_request.category and len(facets.categories) > 1:
+            for category, count in list(facets.categories.items())[:REFINE_OPTIONS]:
+                options.append(({"category": category}, f"📂 {category} ({count})"))
+        if not search_request.brand and len(facets.brands) > 1:
+            for brand, count in list(facets.brands.items())[:REFINE_OPTIONS]:
+                options.append(({"brand": brand}, f"🏷️ {brand} ({count})"))
+        if search_request.min_price is None and search_request.max_price is None and len(facets.price_buckets) > 1:
+            for bucket in facets.price_buckets:
+                if bucket.min_price is None:
+                    label = f"до {bucket.max_price:,.0f}"
+                elif bucket.max_price is None:
+                    label = f"от {bucket.min_price:,.0f}"
+                else:
+                    label = f"{bucket.min_price:,.0f}–{bucket.max_price:,.0f}"
+                options.append((
+                    {"min_price": bucket.min_price, "max_price": bucket.max_price},
+                    f"💰 {label} ₽ ({bucket.count})"
+                ))
+        if search_request.availability is None and facets.available and facets.unavailable:
+            options.append(({"availability": True}, f"✅ В наличии ({facets.available})"))
+        
+        # Номер набора отличает кнопки старых сообщений от кнопок последнего поиска
+        token = context.user_data.get("refine", {}).get("token", 0) + 1
+        context.user_data["refine"] = {
+            "token": token,
+            "query": query,
+            "request": search_request.model_dump(),
+            "options": [refinement for refinement, _ in options],
+        }
+        buttons = [
+            InlineKeyboardButton(label, callback_data=f"refine_{token}_{number}")
+            for number, (_, label) in enumerate(options)
+        ]
+        # По две кнопки в ряд
+        return [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    
+    async def refine_search(self, query, context: ContextTypes.DEFAULT_TYPE, token: int, number: int):
+        """Уточнение последнего поиска пользователя выбранным фасетом"""
+        state = context.user_data.get("refine")
+        if not state or state["token"] != token or number >= len(state["options"]):
+            await query.edit_message_text("⌛ Результаты поиска устарели, повторите поиск.")
+            return
+        
+        search_request = SearchRequest(**state["request"]).model_copy(update=state["options"][number])
+        async with async_session() as db:
+            equipment_service = EquipmentService(db)
+            results = await equipment_service.search_equipment(
+                search_request, limit=10, fields=LIST_FIELDS, facets=True
+            )
+            facets = equipment_service.facets
+        
+        if not results:
+            await query.edit_message_text("😔 После уточнения ничего не найдено.")
+            return
+        text, reply_markup = self.render_search_results(
+            context, results, state["query"], search_request=search_request, facets=facets
+        )
+        await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def send_equipment_details(self, update: Update, card: Card):
+        """Отправка детальной информации об оборудовании"""
+        text, reply_markup = card
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик callback запросов"""
+        query = update.callback_query
+        await query.answer()
+        
+        data = query.data
+        
+        if data == "search":
+            await query.edit_message_text(
+                "🔍 Введите название оборудования для поиска:"
+            )
+        elif data == "categories":
+            await self.categories_command(update, context)
+        elif data == "help":
+            await self.help_command(update, context)
+        elif data.startswith("equipment_"):
+            equipment_id = int(data.split("_")[1])
+            await self.show_equipment_details(query, equipment_id)
+        elif data.startswith("similar_"):
+            equipment_id = int(data.split("_")[1])
+            await self.show_similar_equipment(query, equipment_id)
+        elif data.startswith("refine_"):
+            _, token, number = data.split("_")
+            await self.refine_search(query, context, int(token), int(number))
+        elif data.startswith("history_"):
+            equipment_id = int(data.split("_")[1])
+            await self.show_price_history(query, equipment_id)
+        elif data.startswith("category_"):
+            category = data.split("_", 1)[1]
+            await self.show_category_equipment(query, category)
+        elif data.startswith("admin_"):
+            await self.handle_admin_callback(query, data)
+    
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик inline-запросов: ответ на последнее нажатие клавиши пользователя"""
+        inline_query = update.inline_query
+        user_id = inline_query.from_user.id
+        
+        # Ответ на предыдущую клавишу уже не нужен
+        previous = self.inline_tasks.pop(user_id, None)
+        if previous is not None:
+            previous.cancel()
+        
+        task = context.application.create_task(self.answer_inline_query(inline_query), update=update)
+        self.inline_tasks[user_id] = task
+        task.add_done_callback(
+            lambda done: self.inline_tasks.pop(user_id) if self.inline_tasks.get(user_id) is done else None
+        )
+    
+    async def answer_inline_query(self, inline_query: InlineQuery):
+        """Ответ на inline-запрос из префиксного индекса"""
+        if Config.INLINE_DEBOUNCE:
+            await asyncio.sleep(Config.INLINE_DEBOUNCE)
+        equipment_ids = inline_index.search(inline_query.query) if inline_index.ready else []
+        # Результаты отрисовываются только для найденного; из базы читается то, чего нет в кэше
+        results = {equipment_id: card_cache.get_inline_result(equipment_id) for equipment_id in equipment_ids}
+        missing = [equipment_id for equipment_id, result in results.items() if result is None]
+        if missing:
+            async with async_session() as db:
+                for equipment in await EquipmentService(db).get_equipment_list(missing):
+                    results[equipment.id] = card_cache.inline_result(equipment)
+        await inline_query.answer(
+            [result for result in results.values() if result is not None], cache_time=Config.INLINE_CACHE_TIME
+        )
+    
+    async def show_equipment_details(self, query, equipment_id: int):
+        """Показать детали оборудования"""
+        async with async_session() as db:
+            # Сбрасывает карточки оборудования, измененного в админ-панели
+            await sync_catalog(db)
+            card = card_cache.get(equipment_id)
+            if card is None:
+                equipment_service = EquipmentService(db)
+                equipment = await equipment_service.get_equipment(equipment_id)
+                if not equipment:
+                    await query.edit_message_text("❌ Оборудование не найдено.")
+                    return
+                card = card_cache.card(equipment)
+        
+        text, reply_markup = card
+        await query.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def show_similar_equipment(self, query, equipment_id: int):
+        """Показать похожее оборудование"""
+        async with async_session() as db:
+            await sync_catalog(db)
+            similar_ids = similar_index.similar(equipment_id, Config.SIMILAR_RESULTS) if similar_index.ready else []
+            results = await EquipmentService(db).get_equipment_list(similar_ids, fields=LIST_FIELDS)
+        
+        if not results:
+            await query.message.reply_text("😔 Похожее оборудование не найдено.")
+            return
+        
+        text = "🔍 Похожее оборудование:\n\n"
+        keyboard = []
+        for i, equipment in enumerate(results):
+            text += f"{i+1}. {card_cache.search_line(equipment)}"
+            keyboard.append([InlineKeyboardButton(
+                f"{i+1}. {equipment.name[:30]}...",
+                callback_data=f"equipment_{equipment.id}"
+            )])
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await query.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def show_price_history(self, query, equipment_id: int):
+        """Показать историю цены за последний год"""
+        async with async_session() as db:
+            equipment_service = EquipmentService(db)
+            equipment = await equipment_service.get_equipment(equipment_id)
+            if not equipment:
+                await query.edit_message_text("❌ Оборудование не найдено.")
+                return
+            # Помесячные сводки: не больше 13 строк, сколько бы ни было изменений
+            points = await equipment_service.get_price_history(
+                equipment_id, start=datetime.utcnow() - timedelta(days=365), granularity="month"
+            )
+        
+        text = render_price_history(equipment, points)
+        await query.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+    
+    async def show_category_equipment(self, query, category: str):
+        """Показать оборудование категории"""
+        async with async_session() as db:
+            equipment_service = EquipmentService(db)
+            search_request = SearchRequest(category=category)
+            results = await equipment_service.search_equipment(search_request, limit=10, fields=LIST_FIELDS)
+        
+        if not results:
+            await query.edit_message_text(f"😔 В категории '{category}' пока нет оборудования.")
+            return
+        
+        text = f"📂 Оборудование в категории '{category}':\n\n"
+        
+        keyboard = []
+        for i, equipment in enumerate(results[:10]):
+            price_text = f"{equipment.price:,.0f} {equipment.currency}"
+            text += f"{i+1}. **{equipment.name}** - {price_text}\n"
+            
+            keyboard.append([InlineKeyboardButton(
+                f"{i+1}. {equipment.name[:30]}...",
+                callback_data=f"equipment_{equipment.id}"
+            )])
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def handle_admin_callback(self, query, data: str):
+        """Обработка админских callback'ов"""
+        if data == "admin_add":
+            await query.edit_message_text(
+                "➕ Для добавления оборудования используйте веб-панель администратора:\n"
+                f"http://{Config.ADMIN_PANEL_HOST}:{Config.ADMIN_PANEL_PORT}/admin"
+            )
+        elif data == "admin_stats":
+            await self.show_admin_stats(query)
+        elif data == "admin_web":
+            await query.edit_message_text(
+                f"🌐 Веб-панель администратора:\n"
+                f"http://{Config.ADMIN_PANEL_HOST}:{Config.ADMIN_PANEL_PORT}/admin"
+            )
+    
+    async def show_admin_stats(self, query):
+        """Показать статистику"""
+        async with async_session() as db:
+            stats = await StatsService(db).get_stats()
+        
+        total_equipment = stats["total_equipment"]
+        available_equipment = stats["available_equipment"]
+        categories = stats["categories"]
+        brands = stats["brands"]
+        
+        text = f"📊 **Статистика базы данных:**\n\n"
+        text += f"🔧 Всего оборудования: {total_equipment}\n"
+        text += f"✅ В наличии: {available_equipment}\n"
+        text += f"❌ Нет в наличии: {total_equipment - available_equipment}\n"
+        text += f"📂 Категорий: {len(categories)}\n"
+        text += f"🏷️ Брендов: {len(brands)}\n\n"
+        
+        if categories:
+            text += "📂 **Категории:**\n"
+            for category, count in list(categories.items())[:5]:  # Показываем первые 5
+                text += f"• {category}: {count}\n"
+        
+        outbox = self.rate_limiter.metrics.snapshot()
+        text += f"\n📤 **Исходящие:** отправлено {outbox['sent']}, повторов после 429: {outbox['retries']}, "
+        text += f"склеено правок: {outbox['coalesced']}\n"
+        text += f"⏱️ Ожидание в очереди: p50 {outbox['wait_p50'] * 1000:.0f} мс, p95 {outbox['wait_p95'] * 1000:.0f} мс\n"
+        
+        # Служебный отчет не задерживает ответы пользователям; rate_limit_args принимают только методы бота
+        await query.get_bot().edit_message_text(
+            text, chat_id=query.message.chat_id, message_id=query.message.message_id,
+            parse_mode=ParseMode.MARKDOWN, rate_limit_args=LANE_BULK
+        )
+    
+    async def sync_catalog_periodically(self):
+        """Фоновая синхронизация индексов бота с изменениями из админ-панели"""
+        while True:
+            await asyncio.sleep(Config.CATALOG_SYNC_INTERVAL)
+            try:
+                async with async_session() as db:
+                    await sync_catalog(db)
+            except Exception:
+                logger.exception("Не удалось синхронизировать каталог")
+    
+    async def flush_user_profiles(self):
+        """Периодическая запись обновленных профилей пользователей"""
+        while True:
+            await asyncio.sleep(Config.USER_FLUSH_INTERVAL)
+            try:
+                async with async_session() as db:
+                    await user_profile_queue.flush(db)
+            except Exception:
+                logger.exception("Не удалось записать профили пользователей")
+    
+    async def start_webhook(self):
+        """Запуск приема обновлений через webhook"""
+        if not Config.WEBHOOK_SECRET:
+            raise RuntimeError("Для режима webhook необходимо задать WEBHOOK_SECRET")
+        
+        if Config.WEBHOOK_URL:
+            await self.application.bot.set_webhook(
+                url=Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+                secret_token=Config.WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            logger.info("WEBHOOK_URL не задан, webhook не регистрируется в Telegram")
+        
+        server = uvicorn.Server(uvicorn.Config(
+            create_webhook_app(self.application),
+            host=Config.WEBHOOK_LISTEN,
+            port=Config.WEBHOOK_PORT,
+            log_level="warning"
+        ))
+        # Сигналы завершения обрабатывает сам бот
+        server.install_signal_handlers = lambda: None
+        task = asyncio.create_task(server.serve())
+        logger.info(f"Webhook слушает http://{Config.WEBHOOK_LISTEN}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+        return server, task
+    
+    async def start(self):
+        """Подготовка базы и индексов, запуск приема обновлений и фоновых задач"""
+        # Инициализация базы данных
+        await init_db()
+        async with async_session() as db:
+            await load_catalog_indexes(db)
+        
+        # Запуск бота
+        logger.info("Запуск Telegram бота...")
+        await self.application.initialize()
+        await self.application.start()
+        self.webhook_server = self.webhook_task = None
+        if Config.BOT_MODE == "webhook":
+            self.webhook_server, self.webhook_task = await self.start_webhook()
+        else:
+            await self.application.updater.start_polling()
+        
+        logger.info("Бот запущен и готов к работе!")
+        self.background_tasks = [
+            asyncio.create_task(self.flush_user_profiles()),
+            asyncio.create_task(self.sync_catalog_periodically())
+        ]
+    
+    async def stop(self):
+        """Остановка приема обновлений и фоновых задач с записью профилей пользователей"""
+        for task in self.background_tasks:
+            task.cancel()
+        async with async_session() as db:
+            await user_profile_queue.flush(db)
+        if self.webhook_server:
+            self.webhook_server.should_exit = True
+            await self.webhook_task
+        if self.application.updater.running:
+            await self.application.updater.stop()
+        await self.application.stop()
+        await self.application.shutdown()
+    
+    async def run(self):
+        """Запуск бота"""
+        await self.start()
+        
+        # Ожидание завершения
+        try:
+            await asyncio.Event().wait()
+        except KeyboardInterrupt:
+            logger.info("Получен сигнал завершения...")
+        finally:
+            await self.stop()
+
+if __name__ == "__main__":
+    bot = EquipmentBot()
+    asyncio.run(bot.run())
+
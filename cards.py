@@ -0,0 +1,160 @@
+"""
+Кэш готовых карточек оборудования для бота
+"""
+import json
+from typing import List, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.constants import ParseMode
+from cache import TTLCache
+
+Card = Tuple[str, InlineKeyboardMarkup]
+
+
+def render_equipment_card(equipment) -> Card:
+    """Текст и клавиатура детальной карточки оборудования"""
+    text = f"🔧 **{equipment.name}**\n\n"
+
+    price_text = f"{equipment.price:,.0f} {equipment.currency}"
+    text += f"💰 **Цена:** {price_text}\n"
+    text += f"📂 **Категория:** {equipment.category}\n"
+
+    if equipment.brand:
+        text += f"🏷️ **Бренд:** {equipment.brand}\n"
+    if equipment.model:
+        text += f"📱 **Модель:** {equipment.model}\n"
+
+    if equipment.description:
+        text += f"\n📝 **Описание:**\n{equipment.description}\n"
+
+    if equipment.specifications:
+        try:
+            specs = json.loads(equipment.specifications)
+            if specs:
+                text += "\n⚙️ **Характеристики:**\n"
+                for key, value in specs.items():
+                    text += f"• {key}: {value}\n"
+        except (ValueError, AttributeError):
+            pass
+
+    availability = "✅ В наличии" if equipment.availability else "❌ Нет в наличии"
+    text += f"\n📦 **Наличие:** {availability}"
+
+    keyboard = [
+        [InlineKeyboardButton("🔍 Поиск похожих", callback_data=f"similar_{equipment.id}")],
+        [InlineKeyboardButton("📈 История цены", callback_data=f"history_{equipment.id}")],
+        [InlineKeyboardButton("📂 Категория", callback_data=f"category_{equipment.category}")]
+    ]
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+def render_search_line(equipment) -> str:
+    """Строка оборудования в списке результатов поиска (без номера)"""
+    price_text = f"{equipment.price:,.0f} {equipment.currency}"
+    text = f"**{equipment.name}**\n"
+    text += f"   💰 {price_text}\n"
+    if equipment.brand:
+        text += f"   🏷️ {equipment.brand}"
+        if equipment.model:
+            text += f" {equipment.model}"
+        text += "\n"
+    text += f"   📂 {equipment.category}\n\n"
+    return text
+
+
+def render_price_history(equipment, points: List) -> str:
+    """История цены по месяцам из помесячных сводок"""
+    text = f"📈 **История цены: {equipment.name}**\n\n"
+    text += f"💰 **Сейчас:** {equipment.price:,.0f} {equipment.currency}\n\n"
+    if not points:
+        return text + "Изменений цены пока не было."
+
+    for point in points:
+        text += f"• {point.at:%m.%Y}: {point.close:,.0f} {point.currency}"
+        if point.min != point.max:
+            text += f" (от {point.min:,.0f} до {point.max:,.0f})"
+        text += "\n"
+    return text
+
+
+def render_inline_result(equipment) -> InlineQueryResultArticle:
+    """Результат inline-режима: краткое описание и карточка для отправки в чат"""
+    text, _ = render_equipment_card(equipment)
+    description = f"{equipment.price:,.0f} {equipment.currency}"
+    if equipment.brand:
+        description += f" · {equipment.brand}"
+        if equipment.model:
+            description += f" {equipment.model}"
+    description += f" · {equipment.category}"
+    return InlineQueryResultArticle(
+        id=str(equipment.id),
+        title=equipment.name,
+        description=description,
+        input_message_content=InputTextMessageContent(text, parse_mode=ParseMode.MARKDOWN)
+    )
+
+
+class CardCache:
+    """Готовые карточки, строки результатов и inline-результаты по ключу (id, updated_at).
+
+    Подключается к services.catalog_indexes, поэтому записи сбрасываются
+    при изменении оборудования, в том числе из админ-панели.
+    """
+
+    def __init__(self, maxsize: int):
+        self.ready = True
+        self._cards = TTLCache(maxsize)
+        self._lines = TTLCache(maxsize)
+        self._inline = TTLCache(maxsize)
+
+    def clear(self):
+        """Очистить кэш"""
+        self._cards.clear()
+        self._lines.clear()
+        self._inline.clear()
+
+    def add(self, equipment):
+        """Сбросить устаревшие записи измененного оборудования"""
+        for entries in (self._cards, self._lines, self._inline):
+            entry = entries.get(equipment.id)
+            if entry is not None and entry[0] != equipment.updated_at:
+                entries.pop(equipment.id)
+
+    def remove(self, equipment_id: int):
+        """Удалить записи оборудования"""
+        self._cards.pop(equipment_id)
+        self._lines.pop(equipment_id)
+        self._inline.pop(equipment_id)
+
+    def get(self, equipment_id: int) -> Optional[Card]:
+        """Готовая карточка без обращения к базе данных"""
+        entry = self._cards.get(equipment_id)
+        return entry[1] if entry is not None else None
+
+    def get_inline_result(self, equipment_id: int) -> Optional[InlineQueryResultArticle]:
+        """Готовый inline-результат без обращения к базе данных"""
+        entry = self._inline.get(equipment_id)
+        return entry[1] if entry is not None else None
+
+    def card(self, equipment) -> Card:
+        """Карточка оборудования, отрисованная при первом обращении"""
+        entry = self._cards.get(equipment.id)
+        if entry is None or entry[0] != equipment.updated_at:
+            entry = (equipment.updated_at, render_equipment_card(equipment))
+            self._cards.set(equipment.id, entry)
+        return entry[1]
+
+    def search_line(self, equipment) -> str:
+        """Строка результатов поиска, отрисованная при первом обращении"""
+        entry = self._lines.get(equipment.id)
+        if entry is None or entry[0] != equipment.updated_at:
+            entry = (equipment.updated_at, render_search_line(equipment))
+            self._lines.set(equipment.id, entry)
+        return entry[1]
+
+    def inline_result(self, equipment) -> InlineQueryResultArticle:
+        """Inline-результат, отрисованный при первом обращении"""
+        entry = self._inline.get(equipment.id)
+        if entry is None or entry[0] != equipment.updated_at:
+            entry = (equipment.updated_at, render_inline_result(equipment))
+            self._inline.set(equipment.id, entry)
+        return entry[1]
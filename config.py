@@ -1,29 +1,105 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-class Config:
-    # Telegram Bot Configuration
-    BOT_TOKEN = os.getenv("BOT_TOKEN", "")
-    ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID", "0"))
-    
-    # Database Configuration
-    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./equipment.db")
-    
-    # Web Admin Panel
-    ADMIN_PANEL_PORT = int(os.getenv("ADMIN_PANEL_PORT", "8000"))
-    ADMIN_PANEL_HOST = os.getenv("ADMIN_PANEL_HOST", "127.0.0.1")
-    
-    # Equipment Categories
-    EQUIPMENT_CATEGORIES = [
-        "Компьютеры и ноутбуки",
-        "Серверное оборудование", 
-        "Сетевое оборудование",
-        "Принтеры и МФУ",
-        "Мониторы и дисплеи",
-        "Комплектующие",
-        "Периферия",
-        "Другое"
-    ]
-
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class Config:
+    # Telegram Bot Configuration
+    BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+    ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID", "0"))
+    # Bot API server; the token is appended to this URL (a local Bot API server or a load-test stub)
+    BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot")
+    
+    # Update delivery: polling or webhook
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    # Public base URL registered with Telegram; leave empty to only serve the route locally
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    
+    # Update processing: concurrent handlers and updates accepted before backpressure
+    UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+    UPDATE_QUEUE_LIMIT = int(os.getenv("UPDATE_QUEUE_LIMIT", "256"))
+    
+    # Outgoing requests: messages per second overall and per private chat, per minute per group
+    OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+    OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+    OUTBOX_GROUP_RATE = float(os.getenv("OUTBOX_GROUP_RATE", "20"))
+    # Retries of a request answered with 429 Too Many Requests
+    OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "3"))
+    
+    # Database Configuration
+    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./equipment.db")
+    DATABASE_ECHO = os.getenv("DATABASE_ECHO", "false").lower() == "true"
+    # Read-only connections per process; writes always go through a single connection
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+    # Seconds a write waits for the writer connection held by another write, e.g. a long import
+    DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "5"))
+    
+    # SQLite profile applied to every connection
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Page cache in KiB
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", str(64 * 1024)))
+    # Milliseconds to wait for the other process's write lock
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+    
+    # Search Configuration
+    # sql - ILIKE scan, trigram - in-memory trigram index, fts - SQLite FTS5 with BM25 ranking
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "trigram")
+    # Typo correction of queries that found nothing
+    FUZZY_SEARCH = os.getenv("FUZZY_SEARCH", "true").lower() == "true"
+    
+    # Search result cache entries per process, 0 disables the cache
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    # Catalog change log entries kept for syncing in-process indexes between bot and admin panel (at least 1)
+    CATALOG_CHANGES_RETAIN = int(os.getenv("CATALOG_CHANGES_RETAIN", "100000"))
+    
+    # Rendered equipment cards kept by the bot
+    CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "5000"))
+    # Seconds between background syncs of bot indexes with changes made in the admin panel
+    CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "5"))
+    
+    # Inline mode: seconds Telegram may cache answers, pause before answering a keystroke
+    INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "60"))
+    INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.2"))
+    
+    # Similar items: feature vector size, price proximity weight (0 ignores prices), items shown
+    SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", "256"))
+    SIMILAR_PRICE_WEIGHT = float(os.getenv("SIMILAR_PRICE_WEIGHT", "0.3"))
+    SIMILAR_RESULTS = int(os.getenv("SIMILAR_RESULTS", "5"))
+    
+    # Price list rows written per import transaction
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    
+    # Initial rubles per unit of a currency, added only for currencies missing from exchange_rates
+    EXCHANGE_RATES = os.getenv("EXCHANGE_RATES", "USD=90,EUR=98")
+    
+    # Statistics Configuration
+    # Keep per-category/brand counts in the catalog_stats table instead of counting on every request
+    STATS_MATERIALIZED = os.getenv("STATS_MATERIALIZED", "true").lower() == "true"
+    
+    # User Cache Configuration
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+    # Seconds between batched writes of refreshed user profiles
+    USER_FLUSH_INTERVAL = int(os.getenv("USER_FLUSH_INTERVAL", "5"))
+    
+    # Web Admin Panel
+    ADMIN_PANEL_PORT = int(os.getenv("ADMIN_PANEL_PORT", "8000"))
+    ADMIN_PANEL_HOST = os.getenv("ADMIN_PANEL_HOST", "127.0.0.1")
+    
+    # Equipment Categories
+    EQUIPMENT_CATEGORIES = [
+        "Компьютеры и ноутбуки",
+        "Серверное оборудование", 
+        "Сетевое оборудование",
+        "Принтеры и МФУ",
+        "Мониторы и дисплеи",
+        "Комплектующие",
+        "Периферия",
+        "Другое"
+    ]
+
@@ -1,53 +1,369 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from datetime import datetime
-from config import Config
-
-Base = declarative_base()
-
-class Equipment(Base):
-    __tablename__ = "equipment"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False, index=True)
-    category = Column(String(100), nullable=False, index=True)
-    description = Column(Text)
-    price = Column(Float, nullable=False)
-    currency = Column(String(10), default="RUB")
-    brand = Column(String(100))
-    model = Column(String(100))
-    specifications = Column(Text)  # JSON string with specifications
-    availability = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    telegram_id = Column(Integer, unique=True, nullable=False, index=True)
-    username = Column(String(100))
-    first_name = Column(String(100))
-    last_name = Column(String(100))
-    is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-# Async database setup
-engine = create_async_engine(Config.DATABASE_URL, echo=True)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-async def init_db():
-    """Initialize database tables"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-async def get_db():
-    """Get database session"""
-    async with async_session() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
-
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, Date, DateTime, Boolean, Index, select, delete, insert, update, func, event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from datetime import datetime
+from config import Config
+from fts_search import create_fts
+from specs import spec_rows
+
+Base = declarative_base()
+
+class Equipment(Base):
+    __tablename__ = "equipment"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    category = Column(String(100), nullable=False)
+    description = Column(Text)
+    price = Column(Float, nullable=False)
+    currency = Column(String(10), default="RUB")
+    brand = Column(String(100))
+    model = Column(String(100))
+    specifications = Column(Text)  # JSON string with specifications
+    availability = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    price_rub = Column(Float)  # price converted with exchange_rates, NULL while the currency has no rate
+    
+    __table_args__ = (
+        # Keyset pagination order: created_at desc, id desc; price_rub lets price-range listings
+        # filter in that order from the index alone instead of sorting the range
+        Index("ix_equipment_created_at_id_price", "created_at", "id", "price_rub"),
+        # Category listings in keyset order without a sort step
+        Index("ix_equipment_category_created_at_id", "category", "created_at", "id"),
+        # The same for in-stock items only, the bot's most common refinement
+        Index(
+            "ix_equipment_available_category_created_at_id", "category", "created_at", "id",
+            sqlite_where=availability == True
+        ),
+        # Covers facet and statistics grouping: read in group order, no table lookups
+        Index("ix_equipment_category_brand_availability_price", "category", "brand", "availability", "price_rub"),
+        # Import upserts match price list rows by (brand, model); also DISTINCT brand
+        Index("ix_equipment_brand_model", "brand", "model"),
+        # Price range filters and price ordering with an id tie-breaker
+        Index("ix_equipment_price_rub_id", "price_rub", "id"),
+        # Rate changes recompute the items of one currency
+        Index("ix_equipment_currency", "currency"),
+    )
+
+class ExchangeRate(Base):
+    """Rubles per unit of a currency, used for Equipment.price_rub"""
+    __tablename__ = "exchange_rates"
+    
+    currency = Column(String(10), primary_key=True)
+    rate = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class EquipmentSpec(Base):
+    """Specification values of equipment items with parsed numbers and units"""
+    __tablename__ = "equipment_specs"
+    
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False, index=True)
+    key = Column(String(100), nullable=False)
+    key_norm = Column(String(100), nullable=False)  # case-folded key used for filtering
+    value = Column(Text)
+    value_num = Column(Float)
+    unit = Column(String(20))
+    
+    __table_args__ = (
+        Index("ix_equipment_specs_key_value", "key_norm", "value_num", "equipment_id"),
+        Index("ix_equipment_specs_unit_value", "unit", "value_num", "equipment_id"),
+    )
+
+class CatalogStats(Base):
+    """Materialized item counts per (category, brand, availability)"""
+    __tablename__ = "catalog_stats"
+    
+    category = Column(String(100), primary_key=True)
+    brand = Column(String(100), primary_key=True)  # "" for items without a brand
+    availability = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class CatalogChange(Base):
+    """Append-only log of equipment writes; the last id is the catalog version"""
+    __tablename__ = "catalog_changes"
+    
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class PriceHistory(Base):
+    """Append-only log of equipment price and availability changes"""
+    __tablename__ = "price_history"
+    
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+    currency = Column(String(10))
+    availability = Column(Boolean)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Time-range queries of one item
+        Index("ix_price_history_equipment_changed", "equipment_id", "changed_at"),
+    )
+
+class PriceRollup:
+    """Price range of an item over a period, maintained on every price_history write"""
+    
+    equipment_id = Column(Integer, primary_key=True)
+    period = Column(Date, primary_key=True)  # first day of the period
+    currency = Column(String(10))  # currency of the last change
+    open_price = Column(Float, nullable=False)
+    close_price = Column(Float, nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    changes = Column(Integer, nullable=False, default=1)
+
+class PriceDaily(PriceRollup, Base):
+    __tablename__ = "price_daily"
+
+class PriceMonthly(PriceRollup, Base):
+    __tablename__ = "price_monthly"
+
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(Integer, unique=True, nullable=False, index=True)
+    username = Column(String(100))
+    first_name = Column(String(100))
+    last_name = Column(String(100))
+    is_admin = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Async database setup
+IS_SQLITE = Config.DATABASE_URL.startswith("sqlite") and ":memory:" not in Config.DATABASE_URL
+
+def sqlite_pragmas(dbapi_connection, writer: bool):
+    """Apply the SQLite profile to a new connection"""
+    cursor = dbapi_connection.cursor()
+    if writer:
+        # WAL lets readers work while the other process writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT}")
+    if not writer:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+if IS_SQLITE:
+    # One writer connection: writes of this process queue for it instead of contending for the lock
+    engine = create_async_engine(
+        Config.DATABASE_URL, echo=Config.DATABASE_ECHO,
+        poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0, pool_timeout=Config.DB_WRITE_TIMEOUT
+    )
+    read_engine = create_async_engine(
+        Config.DATABASE_URL, echo=Config.DATABASE_ECHO,
+        poolclass=AsyncAdaptedQueuePool, pool_size=Config.DB_READ_POOL_SIZE, max_overflow=Config.DB_READ_POOL_SIZE
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect_writer(dbapi_connection, connection_record):
+        # Transactions are started by _begin_writer below
+        dbapi_connection.isolation_level = None
+        sqlite_pragmas(dbapi_connection, writer=True)
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin_writer(connection):
+        # Take the write lock up front, waiting up to busy_timeout for the other process
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def _connect_reader(dbapi_connection, connection_record):
+        sqlite_pragmas(dbapi_connection, writer=False)
+else:
+    engine = read_engine = create_async_engine(Config.DATABASE_URL, echo=Config.DATABASE_ECHO)
+
+class RoutingSession(Session):
+    """Session reading from the reader pool and writing through the writer connection.
+
+    Once a transaction has written, its later reads also go to the writer so
+    they see the uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("writing") or self._flushing or isinstance(clause, UpdateBase):
+            self.info["writing"] = True
+            return engine.sync_engine
+        return read_engine.sync_engine
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+def use_writer(session):
+    """Route the rest of the session's transaction to the writer, reads included.
+
+    For read-then-write flows: their reads run inside the writer's
+    BEGIN IMMEDIATE transaction, so no other write changes the rows in between.
+    """
+    session.info["writing"] = True
+
+async_session = async_sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
+)
+
+async def init_db():
+    """Initialize database tables"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(create_missing_indexes)
+        await conn.run_sync(seed_exchange_rates)
+        if Config.STATS_MATERIALIZED:
+            await conn.run_sync(rebuild_catalog_stats)
+        await conn.run_sync(prune_catalog_changes)
+        await conn.run_sync(backfill_equipment_specs)
+        await conn.run_sync(backfill_price_history)
+        if Config.SEARCH_BACKEND == "fts":
+            await conn.run_sync(create_fts)
+
+def add_missing_columns(connection):
+    """Add nullable columns added to models after their tables already existed"""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+def parse_exchange_rates(text: str):
+    """Parse rates written as USD=90,EUR=98"""
+    rates = {"RUB": 1.0}
+    for item in text.split(","):
+        currency, _, rate = item.partition("=")
+        if currency.strip() and rate.strip():
+            rates[currency.strip().upper()] = float(rate)
+    return rates
+
+def price_rub_value():
+    """SQL value of Equipment.price_rub from the current rate of the item's currency"""
+    rate = select(ExchangeRate.rate).where(ExchangeRate.currency == Equipment.currency).scalar_subquery()
+    return Equipment.price * rate
+
+def seed_exchange_rates(connection):
+    """Add configured rates of unknown currencies and convert prices still lacking price_rub"""
+    rates = parse_exchange_rates(Config.EXCHANGE_RATES)
+    connection.execute(
+        sqlite_insert(ExchangeRate).on_conflict_do_nothing(index_elements=["currency"]),
+        [{"currency": currency, "rate": rate, "updated_at": datetime.utcnow()} for currency, rate in rates.items()]
+    )
+    connection.execute(
+        update(Equipment).where(Equipment.price_rub.is_(None))
+        .values(price_rub=price_rub_value(), updated_at=Equipment.updated_at)
+    )
+
+# Single-column indexes superseded by the composite ones above
+OBSOLETE_INDEXES = (
+    "ix_equipment_id", "ix_equipment_name", "ix_equipment_category", "ix_equipment_created_at_id"
+)
+
+def create_missing_indexes(connection):
+    """Create indexes added to models after their tables already existed and drop superseded ones"""
+    for name in OBSOLETE_INDEXES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def rebuild_catalog_stats(connection):
+    """Recount catalog_stats from the equipment table"""
+    brand = func.coalesce(Equipment.brand, "")
+    connection.execute(delete(CatalogStats))
+    connection.execute(
+        insert(CatalogStats).from_select(
+            ["category", "brand", "availability", "count"],
+            select(Equipment.category, brand, Equipment.availability, func.count())
+            .group_by(Equipment.category, brand, Equipment.availability)
+        )
+    )
+
+def backfill_equipment_specs(connection):
+    """Fill equipment_specs for databases created before it existed"""
+    if connection.execute(select(EquipmentSpec.id).limit(1)).first():
+        return
+    result = connection.execute(
+        select(Equipment.id, Equipment.specifications).where(Equipment.specifications.isnot(None))
+    )
+    rows = [
+        dict(row, equipment_id=equipment_id)
+        for equipment_id, specifications in result
+        for row in spec_rows(specifications)
+    ]
+    if rows:
+        connection.execute(insert(EquipmentSpec), rows)
+
+def price_rollup_rows(rows):
+    """Daily and monthly rollup parameters of price_history rows"""
+    daily, monthly = [], []
+    for row in rows:
+        day = row["changed_at"].date()
+        values = {
+            "equipment_id": row["equipment_id"], "currency": row["currency"], "changes": 1,
+            "open_price": row["price"], "close_price": row["price"],
+            "min_price": row["price"], "max_price": row["price"],
+        }
+        daily.append(dict(values, period=day))
+        monthly.append(dict(values, period=day.replace(day=1)))
+    return daily, monthly
+
+def price_rollup_upsert(table):
+    """Insert of a rollup row that folds into an existing row of the same period"""
+    statement = sqlite_insert(table)
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=["equipment_id", "period"],
+        set_={
+            "currency": excluded.currency,
+            "close_price": excluded.close_price,
+            "min_price": func.min(table.min_price, excluded.min_price),
+            "max_price": func.max(table.max_price, excluded.max_price),
+            "changes": table.changes + excluded.changes,
+        }
+    )
+
+def backfill_price_history(connection):
+    """Start price history with the current prices of databases created before it existed"""
+    if connection.execute(select(PriceHistory.id).limit(1)).first():
+        return
+    result = connection.execute(select(
+        Equipment.id, Equipment.price, Equipment.currency, Equipment.availability,
+        func.coalesce(Equipment.updated_at, Equipment.created_at)
+    ))
+    rows = [
+        {"equipment_id": equipment_id, "price": price, "currency": currency,
+         "availability": availability, "changed_at": changed_at or datetime.utcnow()}
+        for equipment_id, price, currency, availability, changed_at in result
+    ]
+    if rows:
+        connection.execute(insert(PriceHistory), rows)
+        daily, monthly = price_rollup_rows(rows)
+        connection.execute(price_rollup_upsert(PriceDaily), daily)
+        connection.execute(price_rollup_upsert(PriceMonthly), monthly)
+
+def prune_catalog_changes(connection):
+    """Drop old change log entries; processes that fall behind reload their indexes"""
+    last_id = connection.execute(select(func.max(CatalogChange.id))).scalar()
+    if last_id:
+        # The latest entry always stays: max(id) is the catalog version, and new ids continue from it
+        retain = max(1, Config.CATALOG_CHANGES_RETAIN)
+        connection.execute(delete(CatalogChange).where(CatalogChange.id <= last_id - retain))
+
+async def get_db():
+    """Get database session"""
+    async with async_session() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
@@ -0,0 +1,81 @@
+"""
+SQLite FTS5 full-text search over the equipment table
+"""
+import json
+import re
+from sqlalchemy import select, func, literal_column, table, column
+
+FTS_TABLE = "equipment_fts"
+FTS_COLUMNS = ("name", "brand", "model", "description", "specifications")
+
+# BM25 weights in FTS_COLUMNS order: name and model matches outrank description
+FTS_WEIGHTS = (10.0, 6.0, 8.0, 1.0, 2.0)
+
+_columns = ", ".join(FTS_COLUMNS)
+_new_values = ", ".join(f"new.{name}" for name in FTS_COLUMNS)
+_old_values = ", ".join(f"old.{name}" for name in FTS_COLUMNS)
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns}, content='equipment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON equipment BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON equipment BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON equipment BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+_fts = table(FTS_TABLE, column("rowid"))
+_token_re = re.compile(r"\w+")
+
+
+def create_fts(connection):
+    """Create the FTS table and sync triggers, indexing existing rows on first run"""
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first()
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if exists:
+        return
+
+    # Older rows keep specifications with \u escapes, which FTS can't tokenize
+    rows = connection.exec_driver_sql(
+        "SELECT id, specifications FROM equipment WHERE specifications LIKE '%\\u%'"
+    ).fetchall()
+    for equipment_id, specifications in rows:
+        try:
+            unescaped = json.dumps(json.loads(specifications), ensure_ascii=False)
+        except ValueError:
+            continue
+        connection.exec_driver_sql(
+            "UPDATE equipment SET specifications = ? WHERE id = ?", (unescaped, equipment_id)
+        )
+    connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    tokens = _token_re.findall(query.casefold())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def ranked_matches(match: str):
+    """Subquery of matching equipment IDs with their BM25 rank (lower is better)"""
+    fts_table = literal_column(FTS_TABLE)
+    weights = [literal_column(repr(weight)) for weight in FTS_WEIGHTS]
+    return (
+        select(
+            _fts.c.rowid.label("id"),
+            func.bm25(fts_table, *weights).label("rank")
+        )
+        .where(fts_table.op("MATCH")(match))
+        .subquery()
+    )
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Потоковый импорт прайс-листов поставщиков (CSV, JSONL, XLSX)
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import init_db, async_session
+from services import EquipmentService, sync_catalog
+from models import EquipmentCreate, ImportResult
+from config import Config
+
+FORMATS = ("csv", "jsonl", "xlsx")
+
+# Сколько отклоненных строк попадает в отчет
+MAX_REPORTED_ERRORS = 50
+
+AVAILABILITY_VALUES = {
+    "да": True, "есть": True, "в наличии": True,
+    "нет": False, "нет в наличии": False, "под заказ": False,
+}
+
+Row = Tuple[int, Union[Dict[str, Any], ValueError]]
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    """Формат файла по расширению"""
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if extension == "json":
+        extension = "jsonl"
+    return extension if extension in FORMATS else None
+
+
+def read_csv(stream: BinaryIO) -> Iterator[Row]:
+    """Строки CSV; разделитель (, ; или табуляция) определяется по заголовку"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    header = text.readline()
+    delimiter = max((",", ";", "\t"), key=header.count)
+    reader = csv.DictReader(itertools.chain([header], text), delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream: BinaryIO) -> Iterator[Row]:
+    """Строки JSON Lines, по одному объекту на строку"""
+    for line_number, line in enumerate(codecs.iterdecode(stream, "utf-8-sig"), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError("некорректный JSON")
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("ожидается JSON-объект")
+
+
+def read_xlsx(stream: BinaryIO) -> Iterator[Row]:
+    """Строки первого листа XLSX; первая строка - заголовок"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Для импорта XLSX установите openpyxl: pip install openpyxl")
+
+    # read_only читает лист построчно, не загружая файл целиком
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        for line_number, values in enumerate(rows, 2):
+            if any(value is not None for value in values):
+                yield line_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+READERS: Dict[str, Callable[[BinaryIO], Iterator[Row]]] = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+    "xlsx": read_xlsx,
+}
+
+
+def to_equipment(raw: Dict[str, Any]) -> EquipmentCreate:
+    """Проверка строки прайс-листа моделью EquipmentCreate"""
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None:
+            row[str(key).strip().lower()] = value
+
+    if isinstance(row.get("specifications"), str):
+        try:
+            row["specifications"] = json.loads(row["specifications"])
+        except ValueError:
+            raise ValueError("specifications: некорректный JSON")
+    if isinstance(row.get("price"), str):
+        row["price"] = row["price"].replace("\xa0", "").replace(" ", "").replace(",", ".")
+    if isinstance(row.get("availability"), str):
+        row["availability"] = AVAILABILITY_VALUES.get(row["availability"].casefold(), row["availability"])
+
+    equipment = EquipmentCreate(**{key: value for key, value in row.items() if key in EquipmentCreate.model_fields})
+    if not equipment.brand or not equipment.model:
+        raise ValueError("brand, model: нужны для сопоставления с каталогом")
+    return equipment
+
+
+def _error_text(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+        )
+    return str(error)
+
+
+def _read_batch(rows: Iterator[Row], batch_size: int, result: ImportResult) -> Tuple[List[EquipmentCreate], bool]:
+    """Прочитать и проверить следующую пачку строк; возвращает пачку и признак конца файла.
+
+    Выполняется в потоке: разбор файла и проверка моделью не блокируют цикл событий.
+    """
+    batch = []
+    for line_number, raw in rows:
+        result.processed += 1
+        try:
+            if isinstance(raw, ValueError):
+                raise raw
+            batch.append(to_equipment(raw))
+        except ValueError as error:
+            result.rejected += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(f"Строка {line_number}: {_error_text(error)}")
+        if len(batch) >= batch_size:
+            return batch, False
+    return batch, True
+
+
+async def import_rows(
+    db: AsyncSession,
+    rows: Iterable[Row],
+    batch_size: int = Config.IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """Импорт строк пачками: каждая пачка - одна транзакция"""
+    equipment_service = EquipmentService(db)
+    result = ImportResult()
+    started = time.monotonic()
+    rows = iter(rows)
+
+    finished = False
+    while not finished:
+        batch, finished = await asyncio.to_thread(_read_batch, rows, batch_size, result)
+        if batch:
+            counts = await equipment_service.bulk_upsert(batch)
+            result.inserted += counts["inserted"]
+            result.updated += counts["updated"]
+            result.unchanged += counts["unchanged"]
+        result.elapsed = time.monotonic() - started
+        result.rows_per_second = result.processed / result.elapsed if result.elapsed else 0.0
+        if progress:
+            progress(result)
+
+    # Индексы этого процесса; остальные процессы подхватят изменения сами
+    await sync_catalog(db)
+    return result
+
+
+async def import_file(
+    db: AsyncSession,
+    stream: BinaryIO,
+    file_format: str,
+    batch_size: int = Config.IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """Импорт прайс-листа из бинарного потока"""
+    return await import_rows(db, READERS[file_format](stream), batch_size, progress)
+
+
+def print_progress(result: ImportResult):
+    """Вывод прогресса импорта в консоль"""
+    print(
+        f"Обработано {result.processed} строк: добавлено {result.inserted}, обновлено {result.updated}, "
+        f"без изменений {result.unchanged}, отклонено {result.rejected} ({result.rows_per_second:.0f} строк/с)",
+        flush=True
+    )
+
+
+async def main():
+    """Импорт прайс-листа из командной строки"""
+    parser = argparse.ArgumentParser(description="Импорт прайс-листа поставщика")
+    parser.add_argument("path", help="Файл CSV, JSONL или XLSX")
+    parser.add_argument("--format", choices=FORMATS, help="Формат файла, если его нельзя определить по расширению")
+    parser.add_argument("--batch-size", type=int, default=Config.IMPORT_BATCH_SIZE, help="Строк в одной транзакции")
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    if file_format is None:
+        parser.error("Не удалось определить формат файла, укажите --format")
+
+    await init_db()
+    with open(args.path, "rb") as stream:
+        async with async_session() as db:
+            result = await import_file(db, stream, file_format, args.batch_size, print_progress)
+
+    print(f"\n✅ Импорт завершен за {result.elapsed:.1f} с")
+    print_progress(result)
+    for error in result.errors:
+        print(f"❌ {error}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
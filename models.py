@@ -1,62 +1,110 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-
-class EquipmentBase(BaseModel):
-    name: str
-    category: str
-    description: Optional[str] = None
-    price: float
-    currency: str = "RUB"
-    brand: Optional[str] = None
-    model: Optional[str] = None
-    specifications: Optional[Dict[str, Any]] = None
-    availability: bool = True
-
-class EquipmentCreate(EquipmentBase):
-    pass
-
-class EquipmentUpdate(BaseModel):
-    name: Optional[str] = None
-    category: Optional[str] = None
-    description: Optional[str] = None
-    price: Optional[float] = None
-    currency: Optional[str] = None
-    brand: Optional[str] = None
-    model: Optional[str] = None
-    specifications: Optional[Dict[str, Any]] = None
-    availability: Optional[bool] = None
-
-class EquipmentResponse(EquipmentBase):
-    id: int
-    created_at: datetime
-    updated_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-class UserBase(BaseModel):
-    telegram_id: int
-    username: Optional[str] = None
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    is_admin: bool = False
-
-class UserCreate(UserBase):
-    pass
-
-class UserResponse(UserBase):
-    id: int
-    created_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-class SearchRequest(BaseModel):
-    query: Optional[str] = None
-    category: Optional[str] = None
-    min_price: Optional[float] = None
-    max_price: Optional[float] = None
-    brand: Optional[str] = None
-    availability: Optional[bool] = None
-
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
+from datetime import datetime
+
+class EquipmentBase(BaseModel):
+    name: str
+    category: str
+    description: Optional[str] = None
+    price: float
+    currency: str = "RUB"
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    specifications: Optional[Dict[str, Any]] = None
+    availability: bool = True
+
+class EquipmentCreate(EquipmentBase):
+    pass
+
+class EquipmentUpdate(BaseModel):
+    name: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    currency: Optional[str] = None
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    specifications: Optional[Dict[str, Any]] = None
+    availability: Optional[bool] = None
+
+class EquipmentResponse(EquipmentBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    price_rub: Optional[float] = None
+    
+    class Config:
+        from_attributes = True
+
+class UserBase(BaseModel):
+    telegram_id: int
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    is_admin: bool = False
+
+class UserCreate(UserBase):
+    pass
+
+class UserResponse(UserBase):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ImportResult(BaseModel):
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    # First rejected rows with the reason
+    errors: List[str] = []
+    elapsed: float = 0.0
+    rows_per_second: float = 0.0
+
+class PriceBucket(BaseModel):
+    # Price bounds in rubles, None for an open end
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int = 0
+    # Counts of matching items, most frequent first
+    categories: Dict[str, int] = {}
+    brands: Dict[str, int] = {}
+    # Items in currencies without an exchange rate fall into no bucket
+    price_buckets: List[PriceBucket] = []
+    available: int = 0
+    unavailable: int = 0
+
+class ExchangeRateUpdate(BaseModel):
+    # Rubles per unit of the currency
+    rate: float = Field(gt=0)
+
+class PricePoint(BaseModel):
+    # Moment of the change, or the first day of a daily/monthly period
+    at: datetime
+    currency: Optional[str] = None
+    open: float
+    close: float
+    min: float
+    max: float
+    changes: int = 1
+    # Only known for single changes
+    availability: Optional[bool] = None
+
+class SearchRequest(BaseModel):
+    query: Optional[str] = None
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    brand: Optional[str] = None
+    availability: Optional[bool] = None
+    # Specification filters, e.g. {"RAM": ">=16", "Экран": "27 дюймов", "*": "1..2TB"}
+    specs: Optional[Dict[str, str]] = None
+    # Order by price converted to rubles: "price" ascending, "-price" descending
+    sort: Optional[Literal["price", "-price"]] = None
+
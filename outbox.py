@@ -0,0 +1,273 @@
+"""
+Очередь исходящих запросов к Bot API с учетом лимитов Telegram
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Очередь общей корзины передается через rate_limit_args; по умолчанию - interactive
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до следующего токена"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Израсходовать токен"""
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Не выдавать токены указанное время (ответ 429)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        """Корзина полна и никого не ограничивает"""
+        return self.delay() == 0.0 and self.tokens >= self.capacity
+
+
+class OutboxMetrics:
+    """Счетчики очереди и время ожидания последних запросов"""
+
+    def __init__(self, samples: int = 1024):
+        self.sent = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.waits: deque = deque(maxlen=samples)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Сводка для логов и статистики администратора"""
+        waits = sorted(self.waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(len(waits) * p))]
+
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "wait_p50": percentile(0.5),
+            "wait_p95": percentile(0.95),
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+
+class _PendingEdit:
+    """Правка сообщения, ожидающая отправки; новые правки заменяют запрос"""
+
+    def __init__(self, request: Tuple[Callable, Any, Dict[str, Any]]):
+        self.request = request
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class OutboxRateLimiter(BaseRateLimiter[str]):
+    """Ограничитель исходящих запросов бота.
+
+    Запросы проходят через корзину токенов своего чата (личные чаты и группы
+    с разными лимитами) и общую корзину бота. Общая корзина выдает токены из
+    двух очередей: ответы пользователям (LANE_INTERACTIVE) обслуживаются
+    первыми, служебные и массовые сообщения (LANE_BULK) - когда ответов нет.
+    Повторные editMessageText одного сообщения, еще не отправленные,
+    склеиваются в последнюю правку. На 429 отправка приостанавливается на
+    retry_after, после чего запрос повторяется.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        group_rate: float,
+        max_retries: int,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.metrics = OutboxMetrics()
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._chat_locks: Dict[Union[int, str], asyncio.Lock] = {}
+        self._pending_edits: Dict[Tuple[Union[int, str], int], _PendingEdit] = {}
+        self._lanes: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._prune_at = 1000
+        self._has_waiters: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def initialize(self):
+        # ExtBot вызывает initialize при каждой своей инициализации: из Application и из Updater
+        if self._dispatcher is not None:
+            return
+        self._has_waiters = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for waiters in self._lanes.values():
+            for waiter in waiters:
+                waiter.cancel()
+            waiters.clear()
+        self._chat_buckets.clear()
+        self._chat_locks.clear()
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        """Корзина чата: группы и каналы ограничены сильнее личных чатов"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate / 60, self.group_rate)
+            else:
+                bucket = TokenBucket(self.chat_rate, max(1.0, self.chat_rate * 3))
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_chats(self):
+        """Удалить корзины чатов, которые никого не ограничивают"""
+        for chat_id in [
+            chat_id for chat_id, bucket in self._chat_buckets.items()
+            if bucket.idle and not self._chat_locks.get(chat_id, asyncio.Lock()).locked()
+        ]:
+            del self._chat_buckets[chat_id]
+            self._chat_locks.pop(chat_id, None)
+
+    async def _dispatch(self):
+        """Выдача токенов общей корзины: сначала очередь ответов, затем массовая"""
+        while True:
+            waiters = self._lanes[LANE_INTERACTIVE] or self._lanes[LANE_BULK]
+            if not waiters:
+                self._has_waiters.clear()
+                await self._has_waiters.wait()
+                continue
+            delay = self.global_bucket.delay()
+            if delay > 0:
+                # За время ожидания могли прийти ответы: очередь выбирается заново
+                await asyncio.sleep(delay)
+                continue
+            waiter = waiters.popleft()
+            if not waiter.done():
+                self.global_bucket.take()
+                waiter.set_result(None)
+
+    async def _acquire(self, chat_id: Optional[Union[int, str]], lane: str):
+        """Дождаться токенов чата и общей корзины"""
+        if chat_id is not None:
+            lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+            async with lock:
+                bucket = self._chat_bucket(chat_id)
+                while (delay := bucket.delay()) > 0:
+                    await asyncio.sleep(delay)
+                bucket.take()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append(waiter)
+        self._has_waiters.set()
+        await waiter
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[str],
+    ):
+        lane = rate_limit_args or LANE_INTERACTIVE
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown outbox lane: {lane}")
+        chat_id = data.get("chat_id")
+        edit_key = pending = None
+        if endpoint == "editMessageText" and chat_id is not None and data.get("message_id") is not None:
+            edit_key = (chat_id, data["message_id"])
+            pending = self._pending_edits.get(edit_key)
+            if pending is not None:
+                # Предыдущая правка еще ждет очереди: отправится только последняя
+                pending.request = (callback, args, kwargs)
+                self.metrics.coalesced += 1
+                return await asyncio.shield(pending.result)
+            pending = self._pending_edits[edit_key] = _PendingEdit((callback, args, kwargs))
+
+        try:
+            result = await self._send(callback, args, kwargs, chat_id, lane, edit_key, pending)
+        except BaseException as exc:
+            if pending is not None:
+                self._finish_edit(edit_key, pending, exc=exc)
+            raise
+        if pending is not None:
+            self._finish_edit(edit_key, pending, result=result)
+        return result
+
+    def _finish_edit(self, edit_key, pending: _PendingEdit, result: Any = None, exc: BaseException = None):
+        """Передать результат правки вызовам, склеенным с ней"""
+        if self._pending_edits.get(edit_key) is pending:
+            del self._pending_edits[edit_key]
+        if pending.result.done():
+            return
+        if isinstance(exc, asyncio.CancelledError):
+            pending.result.cancel()
+        elif exc is not None:
+            pending.result.set_exception(exc)
+            # Исключение уже получил исходный вызов
+            pending.result.exception()
+        else:
+            pending.result.set_result(result)
+
+    async def _send(self, callback, args, kwargs, chat_id, lane: str, edit_key, pending):
+        """Отправка запроса с повтором после 429"""
+        queued_at = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, lane)
+            if attempt == 0:
+                self.metrics.waits.append(time.monotonic() - queued_at)
+                if len(self._chat_buckets) > self._prune_at:
+                    self._prune_chats()
+                    self._prune_at = max(1000, 2 * len(self._chat_buckets))
+            if pending is not None:
+                if self._pending_edits.get(edit_key) is pending:
+                    # С этого момента новые правки встают в очередь заново
+                    del self._pending_edits[edit_key]
+                callback, args, kwargs = pending.request
+            try:
+                result = await callback(*args, **kwargs)
+                self.metrics.sent += 1
+                return result
+            except RetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                self.metrics.retries += 1
+                logger.warning(f"Лимит Telegram: пауза {exc.retry_after} с перед повтором запроса")
+                self.global_bucket.block(exc.retry_after + 0.1)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(exc.retry_after + 0.1)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Проверка планов запросов сервисов.
+
+Скрипт заполняет временную базу синтетическим каталогом, выполняет запросы
+сервисов и для каждого SQL-запроса получает EXPLAIN QUERY PLAN. Полный
+просмотр таблицы (SCAN), полный просмотр индекса (SCAN ... USING INDEX) и
+временное B-дерево для сортировки, группировки или DISTINCT (USE TEMP
+B-TREE) считаются регрессией, если они не разрешены для сценария явно.
+Просмотр индекса в порядке ORDER BY допустим, если в запросе есть LIMIT:
+он останавливает просмотр на первой странице. При регрессии скрипт
+завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import shutil
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, FrozenSet, List, Tuple
+
+# База задается до импорта database: движки создаются при импорте
+_workdir = tempfile.mkdtemp(prefix="query_plans_")
+DATABASE_PATH = os.path.join(_workdir, "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Base, init_db, async_session, engine, read_engine
+from services import (
+    EquipmentService, ExchangeRateService, StatsService, UserService, load_catalog_indexes, sync_catalog, LIST_FIELDS
+)
+from models import EquipmentCreate, EquipmentUpdate, SearchRequest
+from config import Config
+from benchmarks.catalog import catalog_item, generate_catalog
+
+TABLES = frozenset(Base.metadata.tables)
+
+# Нарушения, которые сценарий может разрешить
+FULL_SCAN = "full scan"
+INDEX_SCAN = "index scan"
+TEMP_BTREE = "temp b-tree"
+
+_scan_re = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?")
+_limited_order_re = re.compile(r"\bORDER BY\b.*\bLIMIT\b", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class Case:
+    """Сценарий: вызов сервиса и разрешенные для его запросов нарушения с причиной"""
+    name: str
+    run: Callable[[AsyncSession], Awaitable]
+    allow: FrozenSet[str] = frozenset()
+    reason: str = ""
+
+
+@dataclass
+class Report:
+    case: Case
+    statements: List[Tuple[str, List[str], List[str]]] = field(default_factory=list)
+
+    @property
+    def failed(self) -> bool:
+        return any(problems for _, _, problems in self.statements)
+
+
+class PlanRecorder:
+    """Запоминает SELECT, UPDATE и DELETE, выполненные сервисами, вместе с параметрами"""
+
+    def __init__(self):
+        self.active = False
+        self.statements: List[Tuple[str, tuple]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.active or executemany:
+            return
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH", "UPDATE", "DELETE"):
+            self.statements.append((statement, tuple(parameters or ())))
+
+
+def plan_problems(statement: str, plan: List[str]) -> List[str]:
+    """Нарушения в строках EXPLAIN QUERY PLAN запроса"""
+    # Индекс в порядке ORDER BY читается только до LIMIT, если сортировка не ушла во временное B-дерево
+    limited = bool(_limited_order_re.search(statement)) and not any(
+        "USE TEMP B-TREE FOR ORDER BY" in line for line in plan
+    )
+    problems = []
+    for line in plan:
+        match = _scan_re.match(line)
+        if match and match.group(1) in TABLES:
+            if "INDEX" not in line:
+                problems.append(FULL_SCAN)
+            elif not limited:
+                problems.append(INDEX_SCAN)
+        if "USE TEMP B-TREE" in line:
+            problems.append(TEMP_BTREE)
+    return problems
+
+
+def explain(connection: sqlite3.Connection, statement: str, parameters: tuple) -> List[str]:
+    """Строки плана запроса"""
+    rows = connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[3] for row in rows]
+
+
+async def seed(items: int):
+    """Синтетический каталог и пользователь"""
+    await generate_catalog(items)
+    async with async_session() as db:
+        await UserService(db).get_or_create_user(1001, username="plans")
+        # Текстовый поиск идет через триграммный индекс, как в боте
+        await load_catalog_indexes(db)
+
+
+def cases(items: int) -> List[Case]:
+    """Запросы сервисов, которые выполняются в работе бота и админ-панели"""
+    category = Config.EQUIPMENT_CATEGORIES[1]
+
+    async def next_page(db):
+        equipment_service = EquipmentService(db)
+        await equipment_service.get_all_equipment(limit=20, fields=LIST_FIELDS)
+        await equipment_service.get_all_equipment(limit=20, cursor=equipment_service.next_cursor, fields=LIST_FIELDS)
+
+    async def price_pages(db):
+        equipment_service = EquipmentService(db)
+        search_request = SearchRequest(sort="-price")
+        await equipment_service.search_equipment(search_request, limit=20)
+        await equipment_service.search_equipment(search_request, limit=20, cursor=equipment_service.next_cursor)
+
+    async def update_item(db):
+        await EquipmentService(db).update_equipment(7, EquipmentUpdate(price=12345, availability=False))
+
+    async def reimport(db):
+        await EquipmentService(db).bulk_upsert([
+            EquipmentCreate(**dict(catalog_item(number), price=1000 + number)) for number in range(100)
+        ])
+
+    async def import_new(db):
+        # Номера после каталога дают новые пары (brand, model): запросы вставки и поиска их id
+        await EquipmentService(db).bulk_upsert([
+            EquipmentCreate(**catalog_item(number)) for number in range(items, items + 100)
+        ])
+
+    def search(**filters):
+        return lambda db: EquipmentService(db).search_equipment(SearchRequest(**filters), limit=10, fields=LIST_FIELDS)
+
+    def facets(**filters):
+        return lambda db: EquipmentService(db).get_facets(SearchRequest(**filters))
+
+    def history(granularity):
+        return lambda db: EquipmentService(db).get_price_history(7, granularity=granularity)
+
+    return [
+        Case("get_all_equipment", next_page),
+        Case("get_equipment", lambda db: EquipmentService(db).get_equipment(7)),
+        Case("get_equipment_list", lambda db: EquipmentService(db).get_equipment_list([3, 1, 2], fields=LIST_FIELDS)),
+        Case("search: category", search(category=category)),
+        Case("search: category + availability", search(category=category, availability=True)),
+        Case("search: category + availability + price", search(
+            category=category, availability=True, min_price=10_000, max_price=100_000
+        )),
+        Case("search: price range", search(min_price=10_000, max_price=100_000)),
+        Case("search: sort by price", price_pages),
+        Case("search: text", search(query="ноутбук lenovo")),
+        Case("search: brand", search(brand="dell")),
+        Case("search: specs", search(specs={"RAM": ">=32"}),
+             allow=frozenset({TEMP_BTREE}),
+             reason="позиции берутся из индекса характеристик; при LIMIT сортировка хранит только одну страницу"),
+        Case("facets: category", facets(category=category)),
+        Case("facets: text", facets(query="ноутбук"),
+             allow=frozenset({TEMP_BTREE}),
+             reason="группируются только кандидаты триграммного индекса, найденные по первичному ключу"),
+        Case("get_categories", lambda db: EquipmentService(db).get_categories()),
+        Case("get_brands", lambda db: EquipmentService(db).get_brands()),
+        Case("get_spec_keys", lambda db: EquipmentService(db).get_spec_keys()),
+        Case("get_stats", lambda db: StatsService(db).get_stats(),
+             allow=frozenset({FULL_SCAN}),
+             reason="catalog_stats - по строке на категорию, бренд и наличие, читается целиком"),
+        Case("price history: changes", history("change")),
+        Case("price history: days", history("day")),
+        Case("price history: months", history("month")),
+        Case("update_equipment", update_item),
+        Case("bulk_upsert: existing items", reimport),
+        Case("bulk_upsert: new items", import_new),
+        Case("sync_catalog", sync_catalog,
+             allow=frozenset({TEMP_BTREE}),
+             reason="DISTINCT только по изменениям после последней синхронизации"),
+        Case("set_rate", lambda db: ExchangeRateService(db).set_rate("USD", 91)),
+        Case("get_user_by_telegram_id", lambda db: UserService(db).get_user_by_telegram_id(1001)),
+    ]
+
+
+async def check(items: int, verbose: bool) -> bool:
+    """Выполнить сценарии и вывести отчет; True, если регрессий нет"""
+    await seed(items)
+
+    recorder = PlanRecorder()
+    for sync_engine in {engine.sync_engine, read_engine.sync_engine}:
+        event.listen(sync_engine, "before_cursor_execute", recorder)
+
+    reports = []
+    connection = sqlite3.connect(DATABASE_PATH)
+    try:
+        for case in cases(items):
+            recorder.statements.clear()
+            recorder.active = True
+            try:
+                async with async_session() as db:
+                    await case.run(db)
+            finally:
+                recorder.active = False
+            report = Report(case)
+            for statement, parameters in recorder.statements:
+                plan = explain(connection, statement, parameters)
+                problems = sorted(set(plan_problems(statement, plan)) - case.allow)
+                report.statements.append((statement, plan, problems))
+            reports.append(report)
+    finally:
+        connection.close()
+
+    for report in reports:
+        status = "FAIL" if report.failed else "ok"
+        print(f"[{status:>4}] {report.case.name} ({len(report.statements)} запросов)")
+        if report.case.allow and verbose:
+            print(f"       разрешено: {', '.join(sorted(report.case.allow))} - {report.case.reason}")
+        for statement, plan, problems in report.statements:
+            if problems or verbose:
+                print("       " + " ".join(statement.split())[:300])
+                for line in plan:
+                    print(f"         {line}")
+                if problems:
+                    print(f"       ❌ {', '.join(problems)}")
+    failed = [report.case.name for report in reports if report.failed]
+    if failed:
+        print(f"\n❌ Регрессии планов: {', '.join(failed)}")
+    else:
+        print(f"\n✅ Все {len(reports)} сценариев используют индексы")
+    return not failed
+
+
+async def main():
+    """Проверка планов из командной строки"""
+    parser = argparse.ArgumentParser(description="Проверка планов запросов сервисов")
+    parser.add_argument("--items", type=int, default=20000, help="Размер синтетического каталога")
+    parser.add_argument("--verbose", action="store_true", help="Выводить планы всех запросов")
+    args = parser.parse_args()
+
+    try:
+        ok = await check(args.items, args.verbose)
+    finally:
+        await engine.dispose()
+        await read_engine.dispose()
+        shutil.rmtree(_workdir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
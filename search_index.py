@@ -0,0 +1,380 @@
+"""
+In-memory indexes for equipment text search
+"""
+import heapq
+import re
+import sys
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+SEARCH_FIELDS = ("name", "brand", "model", "description")
+
+# Fields completed by prefix search
+PREFIX_FIELDS = ("name", "brand", "model")
+
+_word_re = re.compile(r"\w+")
+
+# Number of the rarest trigrams intersected to build a candidate set
+CANDIDATE_TRIGRAMS = 3
+# Separates the normalized fields of a document; removed from the field texts themselves
+FIELD_SEPARATOR = "\x00"
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Shortest query word that selects a range of the prefix array; shorter words only filter
+MIN_PREFIX_LENGTH = 2
+# Pairs read from the selected range; a very common prefix is completed from its first terms
+PREFIX_SCAN_LIMIT = 5000
+# Pairs added to a ready prefix index kept in a separate sorted run before merging
+PREFIX_MERGE_SIZE = 4096
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Case-fold text and collapse whitespace"""
+    return " ".join(value.casefold().split()) if value else ""
+
+
+def trigrams(text: str) -> Set[str]:
+    """Get the set of trigrams of a normalized string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Trigram posting lists over name/brand/model/description.
+
+    Answers the same question as ``ILIKE '%query%'`` over the four text
+    columns: posting lists of the rarest query trigrams give a small candidate
+    set which is then verified against the stored normalized text.
+
+    Posting lists are append-only arrays; entries left behind by updates and
+    deletes are filtered out by verification and dropped on compaction.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        """Drop all indexed data"""
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in SEARCH_FIELDS}
+        # Normalized fields joined by FIELD_SEPARATOR, so one substring check covers all four
+        self._docs: Dict[int, str] = {}
+        self._id_limit = 1
+        self._entries = 0
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, equipment):
+        """Index a new or updated equipment item"""
+        texts = tuple(
+            normalize_text(getattr(equipment, field)).replace(FIELD_SEPARATOR, " ") for field in SEARCH_FIELDS
+        )
+        old_doc = self._docs.get(equipment.id)
+        old_texts = old_doc.split(FIELD_SEPARATOR) if old_doc is not None else None
+        self._docs[equipment.id] = FIELD_SEPARATOR.join(texts)
+        self._id_limit = max(self._id_limit, equipment.id + 1)
+
+        for position, field in enumerate(SEARCH_FIELDS):
+            grams = trigrams(texts[position])
+            if old_texts is not None:
+                old_grams = trigrams(old_texts[position])
+                self._stale += len(old_grams - grams)
+                grams -= old_grams
+            postings = self._postings[field]
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(equipment.id)
+            self._entries += len(grams)
+
+        self._maybe_compact()
+
+    def remove(self, equipment_id: int):
+        """Remove equipment item from the index"""
+        doc = self._docs.pop(equipment_id, None)
+        if doc is None:
+            return
+        self._stale += sum(len(trigrams(text)) for text in doc.split(FIELD_SEPARATOR))
+        self._maybe_compact()
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Sorted IDs of items having the rarest query trigrams in some field, not yet verified.
+
+        Returns ``None`` when the query is too short to be answered from
+        trigrams, so the caller has to fall back to a database scan.
+        """
+        grams = trigrams(normalize_text(query))
+        if not grams:
+            return None
+
+        # Bitmaps over the ID range: no sorting, and duplicate posting entries count once
+        found = np.zeros(self._id_limit, dtype=bool)
+        present = np.empty(self._id_limit, dtype=bool)
+        for field in SEARCH_FIELDS:
+            postings = self._postings[field]
+            lists = [postings.get(gram) for gram in grams]
+            if any(posting is None for posting in lists):
+                continue
+            lists.sort(key=len)
+            lists = lists[:CANDIDATE_TRIGRAMS]
+            hits = np.zeros(self._id_limit, dtype=np.uint8)
+            for posting in lists:
+                present.fill(False)
+                present[np.frombuffer(posting, dtype=np.intc)] = True
+                hits += present
+            found |= hits == len(lists)
+        return np.flatnonzero(found)
+
+    def matches(self, query: str, ordered_ids: np.ndarray, count: Optional[int] = None) -> List[int]:
+        """Verify candidates in the given order, stopping after count matches"""
+        needle = normalize_text(query)
+        docs = self._docs
+        found = []
+        for equipment_id in ordered_ids.tolist():
+            doc = docs.get(equipment_id)
+            if doc is not None and needle in doc:
+                found.append(equipment_id)
+                if len(found) == count:
+                    break
+        return found
+
+    def search(self, query: str) -> Optional[Set[int]]:
+        """Get IDs of items containing the query in any indexed field.
+
+        Returns ``None`` when the query is too short to be answered from
+        trigrams, so the caller has to fall back to a database scan.
+        """
+        candidates = self.candidates(query)
+        if candidates is None:
+            return None
+        return set(self.matches(query, candidates))
+
+    def _maybe_compact(self):
+        """Rebuild posting lists once a quarter of the entries are stale"""
+        if self._stale * 4 <= self._entries:
+            return
+        docs = self._docs
+        self._postings = {field: {} for field in SEARCH_FIELDS}
+        self._entries = 0
+        self._stale = 0
+        for equipment_id in sorted(docs):
+            texts = docs[equipment_id].split(FIELD_SEPARATOR)
+            for position, field in enumerate(SEARCH_FIELDS):
+                postings = self._postings[field]
+                grams = trigrams(texts[position])
+                for gram in grams:
+                    posting = postings.get(gram)
+                    if posting is None:
+                        posting = postings[gram] = array("i")
+                    posting.append(equipment_id)
+                self._entries += len(grams)
+
+
+class CatalogColumns:
+    """Filter and sort columns of every item in numpy arrays indexed by equipment ID.
+
+    Lets text search filter and order trigram candidates in memory, so only
+    the IDs of one page reach the database.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        """Drop all indexed data"""
+        self.alive = np.zeros(0, dtype=bool)
+        # created_at in microseconds since the epoch; price_rub is NaN for currencies without a rate
+        self.created = np.zeros(0, dtype=np.int64)
+        self.price = np.zeros(0, dtype=np.float64)
+        self.category = np.zeros(0, dtype=np.int32)
+        self.brand = np.zeros(0, dtype=np.int32)
+        self.availability = np.zeros(0, dtype=bool)
+        # Codes of category and brand values; code 0 is no value
+        self._codes: Dict[str, Dict[str, int]] = {"category": {}, "brand": {}}
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def add(self, equipment):
+        """Store columns of a new or updated equipment item"""
+        equipment_id = equipment.id
+        if equipment_id >= len(self.alive):
+            self._grow(equipment_id + 1)
+        self.alive[equipment_id] = True
+        self.created[equipment_id] = timestamp_us(equipment.created_at)
+        self.price[equipment_id] = equipment.price_rub if equipment.price_rub is not None else np.nan
+        self.category[equipment_id] = self.code("category", equipment.category)
+        self.brand[equipment_id] = self.code("brand", equipment.brand)
+        self.availability[equipment_id] = bool(equipment.availability)
+
+    def remove(self, equipment_id: int):
+        """Forget an equipment item"""
+        if equipment_id < len(self.alive):
+            self.alive[equipment_id] = False
+
+    def code(self, column: str, value: Optional[str]) -> int:
+        """Code of a column value, assigned on first use"""
+        if not value:
+            return 0
+        codes = self._codes[column]
+        return codes.setdefault(value, len(codes) + 1)
+
+    def find(self, column: str, value: str) -> int:
+        """Code of a known column value, -1 for a value no item has had"""
+        return self._codes[column].get(value, -1)
+
+    def codes_containing(self, column: str, text: str) -> np.ndarray:
+        """Codes of column values containing the text, ignoring case"""
+        needle = text.casefold()
+        return np.array(
+            [code for value, code in self._codes[column].items() if needle in value.casefold()], dtype=np.int32
+        )
+
+    def _grow(self, size: int):
+        size = max(size, 2 * len(self.alive), 1024)
+        for name in ("alive", "created", "price", "category", "brand", "availability"):
+            column = getattr(self, name)
+            grown = np.zeros(size, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+
+def timestamp_us(value: datetime) -> int:
+    """Naive UTC datetime as microseconds since the epoch"""
+    return (value - EPOCH) // MICROSECOND
+
+
+class PrefixIndex:
+    """Sorted array of (term, id) pairs for autocomplete over name/brand/model.
+
+    Every query word must be a prefix of some word of the item. The rarest
+    query word selects a contiguous range of the array by binary search, the
+    other words are checked against the item's own terms. Only terms and
+    titles are kept; callers render the returned IDs themselves.
+
+    Pairs added while the index is in use go to a small sorted run merged
+    into the array once it grows; pairs left behind by updates and deletes
+    are skipped by verification and dropped on compaction.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        """Drop all indexed data"""
+        self._pairs: List[Tuple[str, int]] = []
+        self._recent: List[Tuple[str, int]] = []
+        self._unsorted = False
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._titles: Dict[int, str] = {}
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, equipment):
+        """Index a new or updated equipment item"""
+        terms = set()
+        for field in PREFIX_FIELDS:
+            # Interned: every item repeats the same few thousand words
+            terms.update(map(sys.intern, _word_re.findall(normalize_text(getattr(equipment, field)))))
+        old_terms = self._doc_terms.get(equipment.id, ())
+        self._stale += len(set(old_terms) - terms)
+        pairs = [(term, equipment.id) for term in terms.difference(old_terms)]
+        if self.ready:
+            for pair in pairs:
+                insort(self._recent, pair)
+            if len(self._recent) > PREFIX_MERGE_SIZE:
+                self._merge()
+        else:
+            # Bulk load: sorted once before the first lookup
+            self._pairs.extend(pairs)
+            self._unsorted = True
+        self._doc_terms[equipment.id] = tuple(terms)
+        self._titles[equipment.id] = normalize_text(equipment.name)
+        self._maybe_compact()
+
+    def remove(self, equipment_id: int):
+        """Remove equipment item from the index"""
+        terms = self._doc_terms.pop(equipment_id, None)
+        if terms is None:
+            return
+        self._titles.pop(equipment_id, None)
+        self._stale += len(terms)
+        self._maybe_compact()
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """Get IDs of items matching every query word as a prefix.
+
+        Items whose name starts with the query come first, then by name.
+        """
+        needle = normalize_text(query)
+        words = set(_word_re.findall(needle))
+        selective = [word for word in words if len(word) >= MIN_PREFIX_LENGTH]
+        if not selective:
+            return []
+        self._sort()
+
+        ranges = []
+        for word in selective:
+            start = bisect_left(self._pairs, (word,))
+            end = bisect_left(self._pairs, (word + "\U0010ffff",), start)
+            ranges.append((end - start, word, start, end))
+        _, word, start, end = min(ranges)
+        others = words - {word}
+        recent_start = bisect_left(self._recent, (word,))
+        recent_end = bisect_left(self._recent, (word + "\U0010ffff",), recent_start)
+
+        matches = set()
+        doc_terms = self._doc_terms
+        candidates = self._pairs[start:min(end, start + PREFIX_SCAN_LIMIT)] + self._recent[recent_start:recent_end]
+        for term, equipment_id in candidates:
+            if equipment_id in matches:
+                continue
+            terms = doc_terms.get(equipment_id)
+            if terms is None or term not in terms:
+                continue
+            if all(any(item_term.startswith(other) for item_term in terms) for other in others):
+                matches.add(equipment_id)
+
+        titles = self._titles
+        return heapq.nsmallest(limit, matches, key=lambda equipment_id: (
+            not titles[equipment_id].startswith(needle), titles[equipment_id], equipment_id
+        ))
+
+    def _sort(self):
+        if self._unsorted:
+            self._pairs.sort()
+            self._unsorted = False
+
+    def _merge(self):
+        """Move the recent run into the main array; the sort merges two sorted runs"""
+        self._sort()
+        self._pairs += self._recent
+        self._pairs.sort()
+        self._recent = []
+
+    def _maybe_compact(self):
+        """Rebuild the array once a quarter of the pairs are stale"""
+        if self._stale * 4 <= len(self._pairs) + len(self._recent):
+            return
+        self._pairs = sorted(
+            (term, equipment_id) for equipment_id, terms in self._doc_terms.items() for term in terms
+        )
+        self._recent = []
+        self._unsorted = False
+        self._stale = 0
+
+
+trigram_index = TrigramIndex()
+catalog_columns = CatalogColumns()
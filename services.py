@@ -1,171 +1,1063 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import selectinload
-from typing import List, Optional, Dict, Any
-import json
-from database import Equipment, User
-from models import EquipmentCreate, EquipmentUpdate, UserCreate, SearchRequest
-
-class EquipmentService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
-    
-    async def create_equipment(self, equipment_data: EquipmentCreate) -> Equipment:
-        """Create new equipment item"""
-        db_equipment = Equipment(
-            name=equipment_data.name,
-            category=equipment_data.category,
-            description=equipment_data.description,
-            price=equipment_data.price,
-            currency=equipment_data.currency,
-            brand=equipment_data.brand,
-            model=equipment_data.model,
-            specifications=json.dumps(equipment_data.specifications) if equipment_data.specifications else None,
-            availability=equipment_data.availability
-        )
-        self.db.add(db_equipment)
-        await self.db.commit()
-        await self.db.refresh(db_equipment)
-        return db_equipment
-    
-    async def get_equipment(self, equipment_id: int) -> Optional[Equipment]:
-        """Get equipment by ID"""
-        result = await self.db.execute(select(Equipment).where(Equipment.id == equipment_id))
-        return result.scalar_one_or_none()
-    
-    async def get_all_equipment(self, skip: int = 0, limit: int = 100) -> List[Equipment]:
-        """Get all equipment with pagination"""
-        result = await self.db.execute(
-            select(Equipment).offset(skip).limit(limit).order_by(Equipment.created_at.desc())
-        )
-        return result.scalars().all()
-    
-    async def search_equipment(self, search_request: SearchRequest, skip: int = 0, limit: int = 50) -> List[Equipment]:
-        """Search equipment with filters"""
-        query = select(Equipment)
-        conditions = []
-        
-        if search_request.query:
-            search_term = f"%{search_request.query}%"
-            conditions.append(
-                or_(
-                    Equipment.name.ilike(search_term),
-                    Equipment.description.ilike(search_term),
-                    Equipment.brand.ilike(search_term),
-                    Equipment.model.ilike(search_term)
-                )
-            )
-        
-        if search_request.category:
-            conditions.append(Equipment.category == search_request.category)
-        
-        if search_request.min_price is not None:
-            conditions.append(Equipment.price >= search_request.min_price)
-        
-        if search_request.max_price is not None:
-            conditions.append(Equipment.price <= search_request.max_price)
-        
-        if search_request.brand:
-            conditions.append(Equipment.brand.ilike(f"%{search_request.brand}%"))
-        
-        if search_request.availability is not None:
-            conditions.append(Equipment.availability == search_request.availability)
-        
-        if conditions:
-            query = query.where(and_(*conditions))
-        
-        query = query.offset(skip).limit(limit).order_by(Equipment.created_at.desc())
-        result = await self.db.execute(query)
-        return result.scalars().all()
-    
-    async def update_equipment(self, equipment_id: int, equipment_data: EquipmentUpdate) -> Optional[Equipment]:
-        """Update equipment"""
-        db_equipment = await self.get_equipment(equipment_id)
-        if not db_equipment:
-            return None
-        
-        update_data = equipment_data.dict(exclude_unset=True)
-        if "specifications" in update_data and update_data["specifications"]:
-            update_data["specifications"] = json.dumps(update_data["specifications"])
-        
-        for field, value in update_data.items():
-            setattr(db_equipment, field, value)
-        
-        await self.db.commit()
-        await self.db.refresh(db_equipment)
-        return db_equipment
-    
-    async def delete_equipment(self, equipment_id: int) -> bool:
-        """Delete equipment"""
-        db_equipment = await self.get_equipment(equipment_id)
-        if not db_equipment:
-            return False
-        
-        await self.db.delete(db_equipment)
-        await self.db.commit()
-        return True
-    
-    async def get_categories(self) -> List[str]:
-        """Get all unique categories"""
-        result = await self.db.execute(select(Equipment.category).distinct())
-        return [row[0] for row in result.fetchall()]
-    
-    async def get_brands(self) -> List[str]:
-        """Get all unique brands"""
-        result = await self.db.execute(
-            select(Equipment.brand).where(Equipment.brand.isnot(None)).distinct()
-        )
-        return [row[0] for row in result.fetchall()]
-
-class UserService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
-    
-    async def create_user(self, user_data: UserCreate) -> User:
-        """Create new user"""
-        db_user = User(
-            telegram_id=user_data.telegram_id,
-            username=user_data.username,
-            first_name=user_data.first_name,
-            last_name=user_data.last_name,
-            is_admin=user_data.is_admin
-        )
-        self.db.add(db_user)
-        await self.db.commit()
-        await self.db.refresh(db_user)
-        return db_user
-    
-    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
-        """Get user by Telegram ID"""
-        result = await self.db.execute(select(User).where(User.telegram_id == telegram_id))
-        return result.scalar_one_or_none()
-    
-    async def get_or_create_user(self, telegram_id: int, username: str = None, 
-                                first_name: str = None, last_name: str = None) -> User:
-        """Get existing user or create new one"""
-        user = await self.get_user_by_telegram_id(telegram_id)
-        if user:
-            # Update user info if changed
-            if username and user.username != username:
-                user.username = username
-            if first_name and user.first_name != first_name:
-                user.first_name = first_name
-            if last_name and user.last_name != last_name:
-                user.last_name = last_name
-            await self.db.commit()
-            return user
-        
-        # Create new user
-        user_data = UserCreate(
-            telegram_id=telegram_id,
-            username=username,
-            first_name=first_name,
-            last_name=last_name
-        )
-        return await self.create_user(user_data)
-    
-    async def is_admin(self, telegram_id: int) -> bool:
-        """Check if user is admin"""
-        user = await self.get_user_by_telegram_id(telegram_id)
-        return user.is_admin if user else False
-
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, insert, and_, or_, bindparam, tuple_, func, case, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload, load_only
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+from typing import List, Optional, Dict, Any, AsyncIterator, Sequence, Tuple
+from datetime import datetime, time, timedelta
+from collections import Counter
+import asyncio
+import base64
+import json
+import numpy as np
+from database import (
+    Equipment, EquipmentSpec, User, CatalogStats, CatalogChange, PriceHistory, PriceDaily, PriceMonthly,
+    ExchangeRate, price_rollup_rows, price_rollup_upsert, price_rub_value, use_writer
+)
+from models import (
+    EquipmentCreate, EquipmentUpdate, UserCreate, SearchRequest, SearchFacets, PriceBucket, PricePoint
+)
+from search_index import catalog_columns, timestamp_us, trigram_index
+from fts_search import build_match_query, ranked_matches
+from spell import spell_dictionary
+from specs import ANY_KEY, normalize_key, parse_condition, parse_spec_filters, spec_rows
+from config import Config
+from cache import TTLCache, MISSING
+
+# In-process indexes kept in sync with the equipment table
+catalog_indexes = []
+if Config.SEARCH_BACKEND == "trigram":
+    catalog_indexes.append(trigram_index)
+    catalog_indexes.append(catalog_columns)
+if Config.FUZZY_SEARCH:
+    catalog_indexes.append(spell_dictionary)
+
+# IDs of found items keyed by catalog version and normalized request; instances belong to sessions
+search_cache = TTLCache(maxsize=Config.SEARCH_CACHE_SIZE)
+_inflight_searches: Dict[tuple, asyncio.Future] = {}
+
+# Known specification keys, used to parse filters out of free text
+spec_keys_cache = TTLCache(maxsize=1, ttl=300)
+
+# Last catalog_changes entry applied to in-process state
+_synced_version = 0
+
+# Changed items above which indexes are rebuilt instead of replaying the change log
+SYNC_RELOAD_THRESHOLD = 5000
+
+# Equipment columns that can be requested from list queries
+EQUIPMENT_FIELDS = tuple(column.name for column in Equipment.__table__.columns)
+# Columns of list views: everything except the large description and specifications texts
+LIST_FIELDS = ("id", "name", "category", "price", "currency", "brand", "model", "availability",
+               "created_at", "updated_at", "price_rub")
+
+# Equipment columns compared by bulk_upsert
+IMPORT_FIELDS = ("name", "category", "description", "price", "currency", "specifications", "availability")
+
+# Changes of these fields are appended to price_history
+PRICE_FIELDS = ("price", "currency", "availability")
+
+# Upper bounds in rubles of the price facet buckets; the last bucket is open
+PRICE_FACET_BOUNDS = (10_000, 50_000, 100_000, 500_000)
+
+# ID sets up to this size are bound as parameters, larger ones are joined through json_each
+ID_PARAMETERS_LIMIT = 500
+# Text candidates sorted at first for an in-memory search page
+CANDIDATE_WINDOW = 256
+
+# Price history granularities and the longest range served from each
+PRICE_GRANULARITIES = ("change", "day", "month")
+PRICE_CHANGE_SPAN = timedelta(days=7)
+PRICE_DAILY_SPAN = timedelta(days=186)
+
+async def get_catalog_version(db: AsyncSession) -> int:
+    """Get the catalog version, bumped by every equipment write in any process"""
+    return await db.scalar(select(func.max(CatalogChange.id))) or 0
+
+async def load_catalog_indexes(db: AsyncSession):
+    """Build in-process indexes from the equipment table"""
+    global _synced_version
+    # Taken before loading, so changes committed meanwhile are replayed by sync_catalog
+    _synced_version = await get_catalog_version(db)
+    search_cache.clear()
+    if not catalog_indexes:
+        return
+    for index in catalog_indexes:
+        index.ready = False
+        index.clear()
+    result = await db.stream_scalars(
+        select(Equipment).order_by(Equipment.id).execution_options(yield_per=1000)
+    )
+    async for equipment in result:
+        for index in catalog_indexes:
+            index.add(equipment)
+    for index in catalog_indexes:
+        index.ready = True
+
+async def sync_catalog(db: AsyncSession) -> int:
+    """Apply equipment writes made by other processes to in-process indexes and caches"""
+    global _synced_version
+    version = await get_catalog_version(db)
+    if version == _synced_version:
+        return version
+    
+    search_cache.clear()
+    ready_indexes = [index for index in catalog_indexes if index.ready]
+    if ready_indexes:
+        oldest = await db.scalar(select(func.min(CatalogChange.id)))
+        if oldest is not None and oldest > _synced_version + 1:
+            # The change log was pruned past our position
+            await load_catalog_indexes(db)
+            return version
+        
+        result = await db.execute(
+            select(CatalogChange.equipment_id)
+            .where(CatalogChange.id > _synced_version, CatalogChange.id <= version)
+            .distinct()
+        )
+        changed_ids = [row[0] for row in result]
+        if len(changed_ids) > SYNC_RELOAD_THRESHOLD:
+            # Bulk writes such as an import: a full rebuild is cheaper than replaying them
+            await load_catalog_indexes(db)
+            return version
+        result = await db.execute(select(Equipment).where(Equipment.id.in_(changed_ids)))
+        changed = {equipment.id: equipment for equipment in result.scalars()}
+        for equipment_id in changed_ids:
+            for index in ready_indexes:
+                if equipment_id in changed:
+                    index.add(changed[equipment_id])
+                else:
+                    index.remove(equipment_id)
+    
+    _synced_version = max(_synced_version, version)
+    return version
+
+def _select_equipment(fields: Optional[Sequence[str]] = None):
+    """Select equipment loading only the given columns; others raise instead of lazy loading"""
+    query = select(Equipment)
+    if fields is None:
+        return query
+    # Pagination always needs the keyset columns
+    columns = [
+        getattr(Equipment, field) for field in EQUIPMENT_FIELDS if field in {*fields, "id", "created_at", "price_rub"}
+    ]
+    return query.options(load_only(*columns, raiseload=True))
+
+def _brand_model_in(keys: Sequence[tuple]):
+    """Filter equipment by (brand, model) pairs through the (brand, model) index"""
+    # SQLite can't search an index by a row-value IN; separate lists narrow it to (brand, model) lookups
+    return and_(
+        Equipment.brand.in_({brand for brand, _ in keys}),
+        Equipment.model.in_({model for _, model in keys}),
+        tuple_(Equipment.brand, Equipment.model).in_(list(keys))
+    )
+
+def _distinct_values(column):
+    """Distinct non-null values of an indexed column, one index lookup per value instead of a full index scan"""
+    values = select(func.min(column).label("value")).cte("distinct_values", recursive=True)
+    following = select(select(func.min(column)).where(column > values.c.value).scalar_subquery())
+    values = values.union_all(following.where(values.c.value.isnot(None)))
+    return select(values.c.value).where(values.c.value.isnot(None))
+
+def _id_filter(equipment_ids: Sequence[int]):
+    """Condition on Equipment.id for a set of IDs of any size"""
+    equipment_ids = sorted(equipment_ids)
+    if len(equipment_ids) <= ID_PARAMETERS_LIMIT:
+        return Equipment.id.in_(equipment_ids)
+    # One JSON parameter joined through json_each instead of thousands of bound or inlined values
+    values = func.json_each(json.dumps(equipment_ids)).table_valued("value")
+    return Equipment.id.in_(select(values.c.value))
+
+def _unindexed(column):
+    """Column under a unary +, which keeps SQLite from choosing an index on it"""
+    return UnaryExpression(column, operator=custom_op("+"), type_=column.type)
+
+def _filter_candidates(equipment_ids: np.ndarray, search_request: SearchRequest,
+                       position: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Apply the request's column filters and page cursor to text candidates.
+
+    Returns the remaining IDs with their sort key and tie-breaker: page order is
+    ascending (key, tie), the same as the keyset order of _fetch_page.
+    """
+    columns = catalog_columns
+    equipment_ids = equipment_ids[equipment_ids < len(columns.alive)]
+    keep = columns.alive[equipment_ids]
+    price = columns.price[equipment_ids]
+    if search_request.category:
+        keep &= columns.category[equipment_ids] == columns.find("category", search_request.category)
+    if search_request.min_price is not None:
+        keep &= price >= search_request.min_price
+    if search_request.max_price is not None:
+        keep &= price <= search_request.max_price
+    if search_request.brand:
+        keep &= np.isin(columns.brand[equipment_ids], columns.codes_containing("brand", search_request.brand))
+    if search_request.availability is not None:
+        keep &= columns.availability[equipment_ids] == search_request.availability
+    
+    if search_request.sort:
+        descending = search_request.sort == "-price"
+        keep &= ~np.isnan(price)
+        equipment_ids, price = equipment_ids[keep], price[keep]
+        if "o" not in position:
+            if "p" not in position:
+                raise ValueError("Invalid pagination cursor")
+            at_price = (price == position["p"]) & (
+                equipment_ids < position["i"] if descending else equipment_ids > position["i"]
+            )
+            after = (price < position["p"] if descending else price > position["p"]) | at_price
+            equipment_ids, price = equipment_ids[after], price[after]
+        if descending:
+            return equipment_ids, -price, -equipment_ids
+        return equipment_ids, price, equipment_ids
+    
+    equipment_ids = equipment_ids[keep]
+    created = columns.created[equipment_ids]
+    if "o" not in position:
+        if "c" not in position:
+            raise ValueError("Invalid pagination cursor")
+        created_at = timestamp_us(position["c"])
+        before = (created < created_at) | ((created == created_at) & (equipment_ids < position["i"]))
+        equipment_ids, created = equipment_ids[before], created[before]
+    return equipment_ids, -created, -equipment_ids
+
+def _first_in_order(equipment_ids: np.ndarray, key: np.ndarray, tie: np.ndarray, count: int) -> np.ndarray:
+    """At least the first count IDs in (key, tie) order, sorting only what precedes the count-th key"""
+    if count < len(equipment_ids):
+        # Every ID with a key up to the count-th one, so ties at the boundary keep their exact order
+        selected = key <= np.partition(key, count - 1)[count - 1]
+        equipment_ids, key, tie = equipment_ids[selected], key[selected], tie[selected]
+    return equipment_ids[np.lexsort((tie, key))]
+
+def _search_cache_key(version: int, search_request: SearchRequest, skip: int, limit: int,
+                      cursor: Optional[str], fields: Optional[Sequence[str]] = None,
+                      facets: bool = False) -> tuple:
+    """Build a search cache key that ignores case and spacing of text filters"""
+    normalized = search_request.model_dump()
+    for field in ("query", "brand"):
+        if normalized[field]:
+            normalized[field] = " ".join(normalized[field].casefold().split())
+    return (version, Config.SEARCH_BACKEND, json.dumps(normalized, sort_keys=True, default=str),
+            skip, limit, cursor, tuple(sorted(fields)) if fields is not None else None, facets)
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Encode a pagination position as an opaque URL-safe token"""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a pagination token produced by encode_cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if "o" in payload:
+            return {"o": int(payload["o"])}
+        if "p" in payload:
+            return {"p": float(payload["p"]), "i": int(payload["i"])}
+        return {"c": datetime.fromisoformat(payload["c"]), "i": int(payload["i"])}
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid pagination cursor")
+
+class EquipmentService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        # Query actually used by the last search_equipment call after typo correction
+        self.corrected_query: Optional[str] = None
+        # Cursor of the page following the last listing, None on the last page
+        self.next_cursor: Optional[str] = None
+        # Facet counts of the last search_equipment call made with facets=True
+        self.facets: Optional[SearchFacets] = None
+    
+    async def create_equipment(self, equipment_data: EquipmentCreate) -> Equipment:
+        """Create new equipment item"""
+        db_equipment = Equipment(**self._column_values(equipment_data))
+        self.db.add(db_equipment)
+        await self.db.flush()
+        await self._replace_specs(db_equipment.id, equipment_data.specifications)
+        await self._normalize_prices([db_equipment.id])
+        self._record_change(db_equipment.id)
+        await self._record_prices([self._price_row(db_equipment.id, db_equipment)])
+        await self._adjust_stats(self._stats_key(db_equipment), 1)
+        await self.db.commit()
+        await self.db.refresh(db_equipment)
+        for index in catalog_indexes:
+            index.add(db_equipment)
+        return db_equipment
+    
+    async def bulk_upsert(self, items: List[EquipmentCreate]) -> Dict[str, int]:
+        """Insert or update items matched by (brand, model) in one transaction of batched statements"""
+        use_writer(self.db)
+        # The last occurrence of a (brand, model) in the batch wins
+        by_key = {(item.brand, item.model): item for item in items}
+        result = await self.db.execute(
+            select(Equipment.id, Equipment.brand, Equipment.model,
+                   *(getattr(Equipment, field) for field in IMPORT_FIELDS))
+            .where(_brand_model_in(list(by_key)))
+        )
+        # Duplicates already in the table resolve to the oldest row
+        existing = {}
+        for row in result:
+            key = (row.brand, row.model)
+            if key not in existing or row.id < existing[key].id:
+                existing[key] = row
+        
+        now = datetime.utcnow()
+        inserts, updates, spec_items, price_rows, converted_ids = [], [], {}, [], []
+        stats = Counter()
+        for key, item in by_key.items():
+            values = self._column_values(item)
+            current = existing.get(key)
+            if current is None:
+                inserts.append((dict(values, created_at=now, updated_at=now), item))
+                stats[(item.category, item.brand or "", item.availability)] += 1
+                continue
+            # Columns missing from the price list keep their current values
+            changed = {
+                field: values[field] for field in IMPORT_FIELDS
+                if field in item.model_fields_set and getattr(current, field) != values[field]
+            }
+            if not changed:
+                continue
+            updates.append(dict(changed, id=current.id, updated_at=now))
+            if changed.keys() & set(PRICE_FIELDS):
+                price_rows.append(self._price_row(current.id, current, changed, now))
+            if "price" in changed or "currency" in changed:
+                converted_ids.append(current.id)
+            if "specifications" in changed:
+                spec_items[current.id] = item.specifications
+            stats[(current.category, current.brand or "", current.availability)] -= 1
+            stats[(changed.get("category", current.category), current.brand or "",
+                   changed.get("availability", current.availability))] += 1
+        
+        if inserts:
+            # Plain executemany; RETURNING with parameter order would insert row by row
+            await self.db.execute(insert(Equipment), [values for values, _ in inserts])
+            new_items = {(item.brand, item.model): item for _, item in inserts}
+            result = await self.db.execute(
+                select(Equipment.id, Equipment.brand, Equipment.model)
+                .where(_brand_model_in(list(new_items)))
+            )
+            for equipment_id, brand, model in result:
+                spec_items[equipment_id] = new_items[(brand, model)].specifications
+                price_rows.append(self._price_row(equipment_id, new_items[(brand, model)], changed_at=now))
+                converted_ids.append(equipment_id)
+        if updates:
+            await self.db.execute(update(Equipment), updates)
+        
+        changed_ids = list(spec_items)
+        changed_ids += [row["id"] for row in updates if row["id"] not in spec_items]
+        await self._normalize_prices(converted_ids)
+        if spec_items:
+            await self.db.execute(delete(EquipmentSpec).where(EquipmentSpec.equipment_id.in_(list(spec_items))))
+            rows = [
+                dict(row, equipment_id=equipment_id)
+                for equipment_id, specifications in spec_items.items()
+                for row in spec_rows(specifications)
+            ]
+            if rows:
+                await self.db.execute(insert(EquipmentSpec), rows)
+        if changed_ids:
+            await self.db.execute(insert(CatalogChange), [{"equipment_id": equipment_id} for equipment_id in changed_ids])
+        await self._record_prices(price_rows)
+        for key, delta in stats.items():
+            if delta:
+                await self._adjust_stats(key, delta)
+        await self.db.commit()
+        
+        return {
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "unchanged": len(by_key) - len(inserts) - len(updates),
+        }
+    
+    async def get_equipment(self, equipment_id: int) -> Optional[Equipment]:
+        """Get equipment by ID"""
+        result = await self.db.execute(select(Equipment).where(Equipment.id == equipment_id))
+        return result.scalar_one_or_none()
+    
+    async def get_equipment_list(self, equipment_ids: Sequence[int],
+                                 fields: Optional[Sequence[str]] = None) -> List[Equipment]:
+        """Get equipment items by ID in the given order, skipping missing ones"""
+        if not equipment_ids:
+            return []
+        result = await self.db.execute(_select_equipment(fields).where(Equipment.id.in_(list(equipment_ids))))
+        found = {equipment.id: equipment for equipment in result.scalars()}
+        return [found[equipment_id] for equipment_id in equipment_ids if equipment_id in found]
+    
+    async def get_all_equipment(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                fields: Optional[Sequence[str]] = None) -> List[Equipment]:
+        """Get all equipment with offset or cursor pagination, optionally loading only some columns"""
+        return await self._fetch_page(_select_equipment(fields), skip, limit, cursor)
+    
+    async def search_equipment(self, search_request: SearchRequest, skip: int = 0, limit: int = 50,
+                               cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None,
+                               facets: bool = False) -> List[Equipment]:
+        """Search equipment with filters, retrying with a corrected query when nothing is found"""
+        version = await sync_catalog(self.db)
+        if not Config.SEARCH_CACHE_SIZE:
+            return await self._search_uncached(search_request, skip, limit, cursor, fields, facets)
+        
+        key = _search_cache_key(version, search_request, skip, limit, cursor, fields, facets)
+        cached = search_cache.get(key)
+        if cached is None:
+            inflight = _inflight_searches.get(key)
+            if inflight is not None:
+                # Identical query already running: share its result
+                cached = await asyncio.shield(inflight)
+            else:
+                inflight = _inflight_searches[key] = asyncio.get_running_loop().create_future()
+                try:
+                    results = await self._search_uncached(search_request, skip, limit, cursor, fields, facets)
+                    cached = ([equipment.id for equipment in results], self.corrected_query, self.next_cursor,
+                              self.facets)
+                    search_cache.set(key, cached)
+                    inflight.set_result(cached)
+                    return results
+                except asyncio.CancelledError:
+                    inflight.cancel()
+                    raise
+                except Exception as error:
+                    inflight.set_exception(error)
+                    # Followers get the error; mark it retrieved in case there are none
+                    inflight.exception()
+                    raise
+                finally:
+                    del _inflight_searches[key]
+        
+        equipment_ids, self.corrected_query, self.next_cursor, self.facets = cached
+        # The page is loaded into this session, so other sessions never share detached instances
+        return await self.get_equipment_list(equipment_ids, fields)
+    
+    async def _search_uncached(self, search_request: SearchRequest, skip: int, limit: int,
+                               cursor: Optional[str], fields: Optional[Sequence[str]] = None,
+                               facets: bool = False) -> List[Equipment]:
+        """Search equipment with typo correction, bypassing the result cache"""
+        self.corrected_query = None
+        self.next_cursor = None
+        self.facets = None
+        results = await self._search_equipment(search_request, skip, limit, cursor, fields)
+        corrected = None
+        if not results and search_request.query and spell_dictionary.ready:
+            corrected = spell_dictionary.correct(search_request.query)
+        if corrected is not None:
+            corrected_request = search_request.model_copy(update={"query": corrected})
+            results = await self._search_equipment(corrected_request, skip, limit, cursor, fields)
+            if results:
+                self.corrected_query = corrected
+                search_request = corrected_request
+        if facets and results:
+            self.facets = await self.get_facets(search_request)
+        return results
+    
+    async def _search_equipment(self, search_request: SearchRequest, skip: int, limit: int,
+                                cursor: Optional[str], fields: Optional[Sequence[str]] = None) -> List[Equipment]:
+        """Search equipment with filters"""
+        candidates = self._text_candidates(search_request)
+        if candidates is not None:
+            return await self._fetch_candidate_page(search_request, candidates, skip, limit, cursor, fields)
+        built = self._build_search_query(_select_equipment(fields), search_request)
+        if built is None:
+            return []
+        query, rank = built
+        return await self._fetch_page(query, skip, limit, cursor, rank, search_request.sort)
+    
+    async def get_facets(self, search_request: SearchRequest) -> SearchFacets:
+        """Count matches per category, brand, price bucket and availability in one grouped query"""
+        # Buckets are summed per group, so grouping follows the covering index order without a sort.
+        # Both bounds are inclusive like min_price/max_price, so a bucket counts what its filter returns
+        bounds = (None, *PRICE_FACET_BOUNDS, None)
+        price_buckets = [
+            func.sum(case((and_(
+                Equipment.price_rub >= low if low is not None else Equipment.price_rub.isnot(None),
+                Equipment.price_rub <= high if high is not None else true()
+            ), 1), else_=0))
+            for low, high in zip(bounds, bounds[1:])
+        ]
+        groups = (Equipment.category, Equipment.brand, Equipment.availability)
+        facets = SearchFacets()
+        built = self._build_search_query(select(*groups, func.count(), *price_buckets), search_request)
+        if built is None:
+            return facets
+        query, _ = built
+        result = await self.db.execute(query.group_by(*groups))
+        
+        categories, brands, buckets = Counter(), Counter(), Counter()
+        for category, brand, availability, count, *bucket_counts in result:
+            facets.total += count
+            categories[category] += count
+            if brand:
+                brands[brand] += count
+            for number, bucket_count in enumerate(bucket_counts):
+                buckets[number] += bucket_count
+            if availability:
+                facets.available += count
+            else:
+                facets.unavailable += count
+        
+        facets.categories = dict(categories.most_common())
+        facets.brands = dict(brands.most_common())
+        facets.price_buckets = [
+            PriceBucket(min_price=bounds[number], max_price=bounds[number + 1], count=buckets[number])
+            for number in range(len(PRICE_FACET_BOUNDS) + 1) if buckets[number]
+        ]
+        return facets
+    
+    async def stream_equipment(self, search_request: SearchRequest,
+                               batch_size: int = 1000) -> AsyncIterator[List[Any]]:
+        """Stream equipment rows matching the filters in batches, with bounded memory"""
+        await sync_catalog(self.db)
+        built = self._build_search_query(select(*Equipment.__table__.columns), search_request)
+        if built is None:
+            return
+        query, rank = built
+        query = query.order_by(rank, Equipment.id) if rank is not None else query.order_by(Equipment.id)
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+    
+    @staticmethod
+    def _text_candidates(search_request: SearchRequest) -> Optional[np.ndarray]:
+        """Unverified trigram candidates when the whole search can run in memory, otherwise None"""
+        if not search_request.query or search_request.specs or Config.SEARCH_BACKEND != "trigram":
+            return None
+        if not (trigram_index.ready and catalog_columns.ready):
+            return None
+        return trigram_index.candidates(search_request.query)
+    
+    async def _fetch_candidate_page(self, search_request: SearchRequest, candidates: np.ndarray, skip: int,
+                                    limit: int, cursor: Optional[str],
+                                    fields: Optional[Sequence[str]] = None) -> List[Equipment]:
+        """Filter, sort and verify text candidates in memory, then load one page by primary key"""
+        position = decode_cursor(cursor) if cursor else {"o": skip}
+        equipment_ids, key, tie = _filter_candidates(candidates, search_request, position)
+        offset = position.get("o", 0)
+        needed = offset + limit
+        # Candidates are verified in page order; the sorted window grows only if too many fail verification
+        window = max(CANDIDATE_WINDOW, 4 * needed)
+        while True:
+            ordered = _first_in_order(equipment_ids, key, tie, window)
+            page_ids = trigram_index.matches(search_request.query, ordered, needed)
+            if len(page_ids) == needed or len(ordered) == len(equipment_ids):
+                break
+            window *= 4
+        items = await self.get_equipment_list(page_ids[offset:], fields)
+        self._remember_next_cursor(items, limit, position, sort=search_request.sort)
+        return items
+    
+    @classmethod
+    def _build_search_query(cls, query, search_request: SearchRequest):
+        """Apply search filters to a query; returns (query, rank) or None if nothing can match"""
+        conditions = []
+        rank = None
+        
+        if search_request.query and Config.SEARCH_BACKEND == "fts":
+            match = build_match_query(search_request.query)
+            if not match:
+                return None
+            ranked = ranked_matches(match)
+            query = query.join(ranked, Equipment.id == ranked.c.id)
+            rank = ranked.c.rank
+        elif search_request.query:
+            candidate_ids = trigram_index.search(search_request.query) if trigram_index.ready else None
+            if candidate_ids is None:
+                search_term = f"%{search_request.query}%"
+                conditions.append(
+                    or_(
+                        Equipment.name.ilike(search_term),
+                        Equipment.description.ilike(search_term),
+                        Equipment.brand.ilike(search_term),
+                        Equipment.model.ilike(search_term)
+                    )
+                )
+            elif not candidate_ids:
+                return None
+            else:
+                conditions.append(_id_filter(candidate_ids))
+        
+        if search_request.category:
+            conditions.append(Equipment.category == search_request.category)
+        
+        # Price bounds are in rubles, compared with prices converted at current rates.
+        # Date-ordered pages check them in ix_equipment_created_at_id_price order: a range seek on the
+        # price index would sort the whole range, so the price index serves only price sorting
+        price_rub = Equipment.price_rub if search_request.sort else _unindexed(Equipment.price_rub)
+        if search_request.min_price is not None:
+            conditions.append(price_rub >= search_request.min_price)
+        
+        if search_request.max_price is not None:
+            conditions.append(price_rub <= search_request.max_price)
+        
+        if search_request.brand:
+            conditions.append(Equipment.brand.ilike(f"%{search_request.brand}%"))
+        
+        if search_request.availability is not None:
+            conditions.append(Equipment.availability == search_request.availability)
+        
+        for key, condition in (search_request.specs or {}).items():
+            conditions.append(Equipment.id.in_(cls._spec_filter(key, condition)))
+        
+        if conditions:
+            query = query.where(and_(*conditions))
+        
+        return query, rank
+    
+    async def _fetch_page(self, query, skip: int, limit: int, cursor: Optional[str],
+                          rank=None, sort: Optional[str] = None) -> List[Equipment]:
+        """Run a listing query for one page and remember the next page cursor"""
+        position = decode_cursor(cursor) if cursor else {"o": skip}
+        if sort:
+            # Keyset pagination over (price_rub, id); items in currencies without a rate have no price order
+            descending = sort == "-price"
+            query = query.where(Equipment.price_rub.isnot(None))
+            if "o" not in position:
+                if "p" not in position:
+                    raise ValueError("Invalid pagination cursor")
+                key, after = tuple_(Equipment.price_rub, Equipment.id), tuple_(position["p"], position["i"])
+                query = query.where(key < after if descending else key > after)
+            if descending:
+                query = query.order_by(Equipment.price_rub.desc(), Equipment.id.desc())
+            else:
+                query = query.order_by(Equipment.price_rub, Equipment.id)
+        elif rank is not None:
+            # Relevance order has no stable row key, so ranked pages are addressed by offset
+            if "o" not in position:
+                raise ValueError("Invalid pagination cursor")
+            query = query.order_by(rank, Equipment.created_at.desc(), Equipment.id.desc())
+        else:
+            # Keyset pagination over (created_at, id) costs the same on every page
+            if "o" not in position:
+                if "c" not in position:
+                    raise ValueError("Invalid pagination cursor")
+                query = query.where(
+                    tuple_(Equipment.created_at, Equipment.id) < tuple_(position["c"], position["i"])
+                )
+            query = query.order_by(Equipment.created_at.desc(), Equipment.id.desc())
+        if position.get("o"):
+            query = query.offset(position["o"])
+        
+        result = await self.db.execute(query.limit(limit))
+        items = result.scalars().all()
+        self._remember_next_cursor(items, limit, position, rank, sort)
+        return items
+    
+    def _remember_next_cursor(self, items: List[Equipment], limit: int, position: Dict[str, Any],
+                              rank=None, sort: Optional[str] = None):
+        """Store the cursor of the page after items, None on the last page"""
+        self.next_cursor = None
+        if limit and len(items) == limit:
+            if sort:
+                last = items[-1]
+                self.next_cursor = encode_cursor({"p": last.price_rub, "i": last.id})
+            elif rank is not None:
+                self.next_cursor = encode_cursor({"o": position["o"] + limit})
+            else:
+                last = items[-1]
+                self.next_cursor = encode_cursor({"c": last.created_at.isoformat(), "i": last.id})
+    
+    async def update_equipment(self, equipment_id: int, equipment_data: EquipmentUpdate) -> Optional[Equipment]:
+        """Update equipment"""
+        use_writer(self.db)
+        db_equipment = await self.get_equipment(equipment_id)
+        if not db_equipment:
+            return None
+        
+        update_data = equipment_data.dict(exclude_unset=True)
+        if "specifications" in update_data and update_data["specifications"]:
+            update_data["specifications"] = json.dumps(update_data["specifications"], ensure_ascii=False)
+        
+        old_stats_key = self._stats_key(db_equipment)
+        price_changed = any(
+            field in update_data and update_data[field] != getattr(db_equipment, field) for field in PRICE_FIELDS
+        )
+        for field, value in update_data.items():
+            setattr(db_equipment, field, value)
+        
+        if "specifications" in update_data:
+            await self._replace_specs(equipment_id, update_data["specifications"])
+        self._record_change(equipment_id)
+        if "price" in update_data or "currency" in update_data:
+            await self._normalize_prices([equipment_id])
+        if price_changed:
+            await self._record_prices([self._price_row(equipment_id, db_equipment)])
+        new_stats_key = self._stats_key(db_equipment)
+        if new_stats_key != old_stats_key:
+            await self._adjust_stats(old_stats_key, -1)
+            await self._adjust_stats(new_stats_key, 1)
+        await self.db.commit()
+        await self.db.refresh(db_equipment)
+        for index in catalog_indexes:
+            index.add(db_equipment)
+        return db_equipment
+    
+    async def delete_equipment(self, equipment_id: int) -> bool:
+        """Delete equipment"""
+        use_writer(self.db)
+        db_equipment = await self.get_equipment(equipment_id)
+        if not db_equipment:
+            return False
+        
+        await self._replace_specs(equipment_id, None)
+        self._record_change(equipment_id)
+        await self._adjust_stats(self._stats_key(db_equipment), -1)
+        await self.db.delete(db_equipment)
+        await self.db.commit()
+        for index in catalog_indexes:
+            index.remove(equipment_id)
+        return True
+    
+    async def get_price_history(self, equipment_id: int, start: Optional[datetime] = None,
+                                end: Optional[datetime] = None,
+                                granularity: Optional[str] = None) -> List[PricePoint]:
+        """Price points of an item in [start, end), read from the change log or a rollup by range length"""
+        if granularity is None:
+            span = (end or datetime.utcnow()) - start if start else None
+            if span is not None and span <= PRICE_CHANGE_SPAN:
+                granularity = "change"
+            elif span is not None and span <= PRICE_DAILY_SPAN:
+                granularity = "day"
+            else:
+                granularity = "month"
+        if granularity not in PRICE_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        
+        if granularity == "change":
+            query = select(PriceHistory).where(PriceHistory.equipment_id == equipment_id)
+            if start:
+                query = query.where(PriceHistory.changed_at >= start)
+            if end:
+                query = query.where(PriceHistory.changed_at < end)
+            result = await self.db.execute(query.order_by(PriceHistory.changed_at, PriceHistory.id))
+            return [
+                PricePoint(at=row.changed_at, currency=row.currency, open=row.price, close=row.price,
+                           min=row.price, max=row.price, availability=row.availability)
+                for row in result.scalars()
+            ]
+        
+        rollup = PriceDaily if granularity == "day" else PriceMonthly
+        query = select(rollup).where(rollup.equipment_id == equipment_id)
+        if start:
+            period = start.date() if granularity == "day" else start.date().replace(day=1)
+            query = query.where(rollup.period >= period)
+        if end:
+            # Periods starting before end, including the one end falls into
+            last_day = end.date() if end.time() else end.date() - timedelta(days=1)
+            query = query.where(rollup.period <= last_day)
+        result = await self.db.execute(query.order_by(rollup.period))
+        return [
+            PricePoint(at=datetime.combine(row.period, time()), currency=row.currency,
+                       open=row.open_price, close=row.close_price, min=row.min_price, max=row.max_price,
+                       changes=row.changes)
+            for row in result.scalars()
+        ]
+    
+    async def get_categories(self) -> List[str]:
+        """Get all unique categories"""
+        result = await self.db.execute(_distinct_values(Equipment.category))
+        return [row[0] for row in result.fetchall()]
+    
+    async def get_brands(self) -> List[str]:
+        """Get all unique brands"""
+        result = await self.db.execute(_distinct_values(Equipment.brand))
+        return [row[0] for row in result.fetchall()]
+    
+    async def get_spec_keys(self) -> List[str]:
+        """Get all case-folded specification keys"""
+        keys = spec_keys_cache.get("keys")
+        if keys is None:
+            result = await self.db.execute(_distinct_values(EquipmentSpec.key_norm))
+            keys = [row[0] for row in result]
+            spec_keys_cache.set("keys", keys)
+        return keys
+    
+    async def parse_search_query(self, text: str) -> SearchRequest:
+        """Build a search request from free text with specification filters such as RAM>=16 or экран 27 дюймов"""
+        query, specs = parse_spec_filters(text, await self.get_spec_keys())
+        return SearchRequest(query=query or None, specs=specs or None)
+    
+    @staticmethod
+    def _spec_filter(key: str, condition: str):
+        """Subquery of equipment IDs whose specification matches a filter"""
+        parsed = parse_condition(condition)
+        query = select(EquipmentSpec.equipment_id)
+        if key != ANY_KEY:
+            query = query.where(EquipmentSpec.key_norm == normalize_key(key))
+        if "text" in parsed:
+            return query.where(EquipmentSpec.value.ilike(f"%{parsed['text']}%"))
+        if parsed["unit"]:
+            query = query.where(EquipmentSpec.unit == parsed["unit"])
+        value, low = EquipmentSpec.value_num, parsed["low"]
+        if parsed["op"] == "between":
+            return query.where(value.between(low, parsed["high"]))
+        comparisons = {
+            ">=": value >= low, "<=": value <= low, ">": value > low, "<": value < low, "=": value == low
+        }
+        return query.where(comparisons[parsed["op"]])
+    
+    async def _replace_specs(self, equipment_id: int, specifications):
+        """Rewrite equipment_specs rows of an item within the current transaction"""
+        await self.db.execute(delete(EquipmentSpec).where(EquipmentSpec.equipment_id == equipment_id))
+        rows = spec_rows(specifications)
+        if rows:
+            await self.db.execute(insert(EquipmentSpec), [dict(row, equipment_id=equipment_id) for row in rows])
+    
+    @staticmethod
+    def _column_values(equipment_data: EquipmentCreate) -> Dict[str, Any]:
+        """Equipment column values of a validated item"""
+        specifications = equipment_data.specifications
+        return {
+            "name": equipment_data.name,
+            "category": equipment_data.category,
+            "description": equipment_data.description,
+            "price": equipment_data.price,
+            "currency": equipment_data.currency,
+            "brand": equipment_data.brand,
+            "model": equipment_data.model,
+            "specifications": json.dumps(specifications, ensure_ascii=False) if specifications else None,
+            "availability": equipment_data.availability,
+        }
+    
+    def _record_change(self, equipment_id: int):
+        """Bump the catalog version within the current transaction"""
+        self.db.add(CatalogChange(equipment_id=equipment_id))
+    
+    @staticmethod
+    def _price_row(equipment_id: int, current, changed: Optional[Dict[str, Any]] = None,
+                   changed_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """price_history row of an item with optional changed values applied"""
+        changed = changed or {}
+        row = {field: changed.get(field, getattr(current, field)) for field in PRICE_FIELDS}
+        return dict(row, equipment_id=equipment_id, changed_at=changed_at or datetime.utcnow())
+    
+    async def _normalize_prices(self, equipment_ids: List[int]):
+        """Recompute price_rub of items from the current exchange rates within the current transaction"""
+        if not equipment_ids:
+            return
+        await self.db.execute(
+            update(Equipment)
+            .where(Equipment.id.in_(
+                bindparam("price_ids", sorted(equipment_ids), expanding=True, literal_execute=True)
+            ))
+            .values(price_rub=price_rub_value(), updated_at=Equipment.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    
+    async def _record_prices(self, rows: List[Dict[str, Any]]):
+        """Append price_history rows and fold them into the daily and monthly rollups"""
+        if not rows:
+            return
+        await self.db.execute(insert(PriceHistory), rows)
+        daily, monthly = price_rollup_rows(rows)
+        await self.db.execute(price_rollup_upsert(PriceDaily), daily)
+        await self.db.execute(price_rollup_upsert(PriceMonthly), monthly)
+    
+    @staticmethod
+    def _stats_key(equipment: Equipment):
+        return (equipment.category, equipment.brand or "", equipment.availability)
+    
+    async def _adjust_stats(self, key, delta: int):
+        """Adjust the materialized catalog_stats counter within the current transaction"""
+        if not Config.STATS_MATERIALIZED:
+            return
+        category, brand, availability = key
+        statement = sqlite_insert(CatalogStats).values(
+            category=category, brand=brand, availability=availability, count=delta
+        )
+        await self.db.execute(statement.on_conflict_do_update(
+            index_elements=["category", "brand", "availability"],
+            set_={"count": CatalogStats.count + delta}
+        ))
+
+class StatsService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get total, available, per-category and per-brand counts in one query"""
+        if Config.STATS_MATERIALIZED:
+            query = select(
+                CatalogStats.category, CatalogStats.brand, CatalogStats.availability, CatalogStats.count
+            ).where(CatalogStats.count > 0)
+        else:
+            brand = func.coalesce(Equipment.brand, "")
+            query = select(
+                Equipment.category, brand, Equipment.availability, func.count()
+            ).group_by(Equipment.category, brand, Equipment.availability)
+        result = await self.db.execute(query)
+        
+        total = available = 0
+        categories: Dict[str, int] = {}
+        brands: Dict[str, int] = {}
+        for category, brand, availability, count in result:
+            total += count
+            if availability:
+                available += count
+            categories[category] = categories.get(category, 0) + count
+            if brand:
+                brands[brand] = brands.get(brand, 0) + count
+        
+        return {
+            "total_equipment": total,
+            "available_equipment": available,
+            "categories": dict(sorted(categories.items(), key=lambda item: -item[1])),
+            "brands": dict(sorted(brands.items(), key=lambda item: -item[1])),
+        }
+
+class ExchangeRateService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_rates(self) -> Dict[str, float]:
+        """Get rubles per unit of every known currency"""
+        result = await self.db.execute(select(ExchangeRate.currency, ExchangeRate.rate).order_by(ExchangeRate.currency))
+        return dict(result.all())
+    
+    async def set_rate(self, currency: str, rate: float) -> int:
+        """Store a rate and recompute price_rub of that currency's items; returns how many were recomputed"""
+        currency = currency.strip().upper()
+        if currency == "RUB" and rate != 1:
+            raise ValueError("The ruble rate is fixed at 1")
+        statement = sqlite_insert(ExchangeRate).values(currency=currency, rate=rate, updated_at=datetime.utcnow())
+        await self.db.execute(statement.on_conflict_do_update(
+            index_elements=["currency"],
+            set_={"rate": statement.excluded.rate, "updated_at": statement.excluded.updated_at}
+        ))
+        # One statement over the currency index; item update times stay as they were
+        result = await self.db.execute(
+            update(Equipment).where(Equipment.currency == currency)
+            .values(price_rub=Equipment.price * rate, updated_at=Equipment.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        # Log every repriced item: replaying them refreshes price_rub in the similarity index and
+        # search columns, and a large currency exceeds SYNC_RELOAD_THRESHOLD and reloads them instead
+        await self.db.execute(insert(CatalogChange).from_select(
+            ["equipment_id"], select(Equipment.id).where(Equipment.currency == currency)
+        ))
+        await self.db.commit()
+        return result.rowcount
+
+class UserService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_user(self, user_data: UserCreate) -> User:
+        """Create new user"""
+        db_user = User(
+            telegram_id=user_data.telegram_id,
+            username=user_data.username,
+            first_name=user_data.first_name,
+            last_name=user_data.last_name,
+            is_admin=user_data.is_admin
+        )
+        self.db.add(db_user)
+        await self.db.commit()
+        await self.db.refresh(db_user)
+        return db_user
+    
+    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+        """Get user by Telegram ID"""
+        result = await self.db.execute(select(User).where(User.telegram_id == telegram_id))
+        return result.scalar_one_or_none()
+    
+    async def get_or_create_user(self, telegram_id: int, username: str = None, 
+                                first_name: str = None, last_name: str = None) -> User:
+        """Get existing user or create new one"""
+        profile = {"username": username or None, "first_name": first_name or None, "last_name": last_name or None}
+        
+        user = user_cache.get(telegram_id)
+        if user is not None:
+            # Known user: profile refreshes are written by the write-behind queue
+            changes = _profile_changes(user, profile)
+            if changes:
+                for field, value in changes.items():
+                    setattr(user, field, value)
+                user_profile_queue.enqueue(user)
+            return user
+        
+        user = await self.get_user_by_telegram_id(telegram_id)
+        if user is None or _profile_changes(user, profile):
+            user = await self._upsert_user(telegram_id, profile)
+        user_cache.set(telegram_id, user)
+        return user
+    
+    async def is_admin(self, telegram_id: int) -> bool:
+        """Check if user is admin"""
+        user = user_cache.get(telegram_id, MISSING)
+        if user is MISSING:
+            user = await self.get_user_by_telegram_id(telegram_id)
+            user_cache.set(telegram_id, user)
+        return user.is_admin if user else False
+    
+    async def _upsert_user(self, telegram_id: int, profile: Dict[str, Optional[str]]) -> User:
+        """Insert a user or update changed profile fields in a single statement"""
+        statement = sqlite_insert(User).values(
+            telegram_id=telegram_id, is_admin=False, created_at=datetime.utcnow(), **profile
+        )
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=["telegram_id"],
+            set_={field: func.coalesce(excluded[field], getattr(User, field)) for field in profile},
+            where=or_(*[
+                and_(excluded[field].isnot(None), getattr(User, field).is_distinct_from(excluded[field]))
+                for field in profile
+            ])
+        )
+        await self.db.execute(statement)
+        await self.db.commit()
+        
+        result = await self.db.execute(
+            select(User).where(User.telegram_id == telegram_id).execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
+def _profile_changes(user: User, profile: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Get provided profile fields that differ from the stored ones"""
+    return {field: value for field, value in profile.items() if value and getattr(user, field) != value}
+
+class UserProfileQueue:
+    """Write-behind queue of profile refreshes for registered users"""
+    
+    def __init__(self):
+        self._pending: Dict[int, User] = {}
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def enqueue(self, user: User):
+        """Queue the current profile of a user, replacing an older queued one"""
+        self._pending[user.telegram_id] = user
+    
+    async def flush(self, db: AsyncSession) -> int:
+        """Write all queued profiles in one batched transaction"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        users = User.__table__
+        statement = (
+            update(users)
+            .where(users.c.telegram_id == bindparam("b_telegram_id"))
+            .values(
+                username=bindparam("b_username"),
+                first_name=bindparam("b_first_name"),
+                last_name=bindparam("b_last_name")
+            )
+        )
+        try:
+            await db.execute(statement, [
+                {
+                    "b_telegram_id": user.telegram_id,
+                    "b_username": user.username,
+                    "b_first_name": user.first_name,
+                    "b_last_name": user.last_name
+                }
+                for user in pending.values()
+            ])
+            await db.commit()
+        except Exception:
+            # Keep the profiles for the next flush unless newer ones were queued meanwhile
+            for telegram_id, user in pending.items():
+                self._pending.setdefault(telegram_id, user)
+            raise
+        return len(pending)
+
+# Known users of this process; None marks a Telegram ID without a users row
+user_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+user_profile_queue = UserProfileQueue()
@@ -0,0 +1,179 @@
+"""
+In-memory content similarity of equipment items
+"""
+import json
+import math
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from search_index import normalize_text
+
+# Feature weights of the fields an item is described by
+FIELD_WEIGHTS = {
+    "name": 1.0,
+    "brand": 2.0,
+    "model": 1.5,
+    "category": 1.0,
+    "specifications": 0.5,
+}
+
+# Rows allocated on the first add
+INITIAL_CAPACITY = 1024
+
+_word_re = re.compile(r"\w+")
+
+
+def item_features(equipment) -> Dict[str, float]:
+    """Weighted features of an item: words of text fields and key=value specification pairs"""
+    features: Dict[str, float] = {}
+
+    def add(feature: str, weight: float):
+        features[feature] = features.get(feature, 0.0) + weight
+
+    for field in ("name", "model"):
+        for word in _word_re.findall(normalize_text(getattr(equipment, field))):
+            add(f"{field[0]}:{word}", FIELD_WEIGHTS[field])
+            if field == "model":
+                # Model words also match the same words in names
+                add(f"n:{word}", FIELD_WEIGHTS[field])
+    for field in ("brand", "category"):
+        value = normalize_text(getattr(equipment, field))
+        if value:
+            add(f"{field[0]}:{value}", FIELD_WEIGHTS[field])
+
+    try:
+        specs = json.loads(equipment.specifications) if equipment.specifications else {}
+    except ValueError:
+        specs = {}
+    if isinstance(specs, dict):
+        for key, value in specs.items():
+            add(f"s:{normalize_text(str(key))}={normalize_text(str(value))}", FIELD_WEIGHTS["specifications"])
+    return features
+
+
+class SimilarityIndex:
+    """Hashed feature vectors of all items in one contiguous float32 matrix.
+
+    Features are hashed into ``dim`` signed buckets, weighted with sublinear
+    term frequency and L2-normalized, so a single matrix-vector product scores
+    every item against a query item. Document frequencies of the buckets are
+    kept up to date on every write and weight the query vector by inverse
+    document frequency, which keeps features shared by most of the catalog
+    (a common category, for example) from dominating.
+
+    Rows of removed items are zeroed and reused by later additions.
+    """
+
+    def __init__(self, dim: int = 256, price_weight: float = 0.0):
+        self.ready = False
+        self.dim = dim
+        # Penalty per unit of |log price ratio|; 0 ignores prices
+        self.price_weight = price_weight
+        self.clear()
+
+    def clear(self):
+        """Drop all indexed data"""
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._prices = np.zeros(0, dtype=np.float32)
+        self._df = np.zeros(self.dim, dtype=np.float32)
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def vector(self, equipment) -> np.ndarray:
+        """Normalized hashed feature vector of an item"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in item_features(equipment).items():
+            digest = zlib.crc32(feature.encode())
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            # Sublinear frequency: repeated words add less than their count
+            value = 1.0 + math.log(weight) if weight > 1 else weight
+            vector[digest % self.dim] += sign * value
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def add(self, equipment):
+        """Index a new or updated equipment item"""
+        vector = self.vector(equipment)
+        row = self._rows.get(equipment.id)
+        if row is None:
+            row = self._allocate()
+            self._rows[equipment.id] = row
+            self._ids[row] = equipment.id
+        else:
+            self._df -= self._matrix[row] != 0
+        self._matrix[row] = vector
+        self._df += vector != 0
+        price = getattr(equipment, "price_rub", None)
+        self._prices[row] = price if price and price > 0 else np.nan
+
+    def remove(self, equipment_id: int):
+        """Remove equipment item from the index"""
+        row = self._rows.pop(equipment_id, None)
+        if row is None:
+            return
+        self._df -= self._matrix[row] != 0
+        self._matrix[row] = 0
+        self._ids[row] = -1
+        self._prices[row] = np.nan
+        self._free.append(row)
+
+    def similar(self, equipment_id: int, limit: int = 5) -> List[int]:
+        """IDs of the items most similar to an indexed item, best first"""
+        row = self._rows.get(equipment_id)
+        if row is None:
+            return []
+        scores = self.scores(self._matrix[row], self._prices[row])
+        scores[row] = -np.inf
+        return [equipment_id for equipment_id, _ in self._top(scores, limit)]
+
+    def scores(self, vector: np.ndarray, price: float = np.nan) -> np.ndarray:
+        """Similarity of every row to a feature vector, optionally discounted by price distance"""
+        size = self._size
+        idf = np.log((1.0 + len(self._rows)) / (1.0 + self._df)) + 1.0
+        scores = self._matrix[:size] @ (vector * idf)
+        if self.price_weight and not np.isnan(price):
+            with np.errstate(invalid="ignore"):
+                distance = np.abs(np.log(self._prices[:size] / price))
+            # Items without a comparable price are neither favoured nor penalized
+            scores *= np.exp(-self.price_weight * np.nan_to_num(distance, nan=0.0))
+        scores[self._ids[:size] < 0] = -np.inf
+        return scores
+
+    def _top(self, scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """Best scoring positive rows"""
+        if limit <= 0 or not len(scores):
+            return []
+        if limit < len(scores):
+            candidates = np.argpartition(-scores, limit)[:limit]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(self._ids[row]), float(scores[row])) for row in candidates if scores[row] > 0]
+
+    def _allocate(self) -> int:
+        """Row for a new item, growing the matrix geometrically"""
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._matrix):
+            capacity = max(INITIAL_CAPACITY, 2 * len(self._matrix))
+            self._matrix = self._grow(self._matrix, capacity)
+            self._ids = self._grow(self._ids, capacity, fill=-1)
+            self._prices = self._grow(self._prices, capacity, fill=np.nan)
+        self._size += 1
+        return self._size - 1
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int, fill: float = 0) -> np.ndarray:
+        grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
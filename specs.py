@@ -0,0 +1,130 @@
+"""
+Parsing of equipment specifications into queryable values
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Unit spellings mapped to a canonical unit and a factor to it
+UNITS = {
+    "mb": ("gb", 1 / 1024), "мб": ("gb", 1 / 1024),
+    "gb": ("gb", 1), "гб": ("gb", 1),
+    "tb": ("gb", 1024), "тб": ("gb", 1024),
+    "дюйм": ("inch", 1), "дюйма": ("inch", 1), "дюймов": ("inch", 1),
+    "inch": ("inch", 1), '"': ("inch", 1),
+    "гц": ("hz", 1), "hz": ("hz", 1),
+    "мгц": ("mhz", 1), "mhz": ("mhz", 1),
+    "ггц": ("ghz", 1), "ghz": ("ghz", 1),
+    "вт": ("w", 1), "w": ("w", 1),
+    "кг": ("kg", 1), "kg": ("kg", 1),
+    "мм": ("mm", 1), "mm": ("mm", 1),
+    "мп": ("mp", 1), "mp": ("mp", 1),
+    "dpi": ("dpi", 1),
+    "gbps": ("gbps", 1),
+}
+
+ANY_KEY = "*"
+
+_number = r"(\d+(?:[.,]\d+)?)"
+_value_re = re.compile(_number + r"\s*([^\W\d_]+|\")?")
+_condition_re = re.compile(r"^\s*(>=|<=|>|<|=)?\s*" + _number + r"\s*(?:\.\.\s*" + _number + r")?\s*(\S+)?\s*$")
+_explicit_filter_re = re.compile(
+    r"([^\W\d][\w-]*)\s*(>=|<=|>|<|=)\s*" + _number + r"(?:(\s*)([^\W\d_]+|\")(?!\w))?"
+)
+_unit_value_re = re.compile(r"(?:([^\W\d][\w-]*)\s+)?" + _number + r"\s*([^\W\d_]+|\")(?!\w)")
+
+
+def normalize_key(key: str) -> str:
+    """Case-fold a specification key"""
+    return " ".join(key.casefold().split())
+
+
+def parse_value(value: Any) -> Tuple[Optional[float], Optional[str]]:
+    """Extract the numeric value and canonical unit of a specification value.
+
+    The first number followed by a known unit wins ("2x 480GB SSD" is 480 GB);
+    otherwise the first number is taken without a unit.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), None
+    first = None
+    for match in _value_re.finditer(str(value)):
+        number = float(match.group(1).replace(",", "."))
+        unit = UNITS.get((match.group(2) or "").casefold())
+        if unit is not None:
+            return number * unit[1], unit[0]
+        if first is None:
+            first = number
+    return first, None
+
+
+def spec_rows(specifications: Any) -> List[Dict[str, Any]]:
+    """Build equipment_specs rows from a specifications dict or its JSON text"""
+    if isinstance(specifications, str):
+        try:
+            specifications = json.loads(specifications)
+        except ValueError:
+            return []
+    if not isinstance(specifications, dict):
+        return []
+    rows = []
+    for key, value in specifications.items():
+        value_num, unit = parse_value(value)
+        rows.append({
+            "key": str(key)[:100],
+            "key_norm": normalize_key(str(key))[:100],
+            "value": str(value),
+            "value_num": value_num,
+            "unit": unit,
+        })
+    return rows
+
+
+def parse_condition(condition: str) -> Dict[str, Any]:
+    """Parse a filter like ">=16", "16..32GB", "=27 дюймов" or a plain text value"""
+    match = _condition_re.match(condition)
+    if not match:
+        return {"text": condition.strip()}
+    op, low, high, unit_text = match.groups()
+    unit, factor = None, 1
+    if unit_text:
+        unit, factor = UNITS.get(unit_text.casefold(), (None, 1))
+        if unit is None:
+            return {"text": condition.strip()}
+    low = float(low.replace(",", ".")) * factor
+    if high is not None:
+        return {"op": "between", "low": low, "high": float(high.replace(",", ".")) * factor, "unit": unit}
+    return {"op": op or "=", "low": low, "unit": unit}
+
+
+def parse_spec_filters(text: str, known_keys: Iterable[str]) -> Tuple[str, Dict[str, str]]:
+    """Split free text into the remaining query and specification filters.
+
+    Understands explicit comparisons ("RAM>=16", "экран=27", "RAM>=16GB") and
+    numbers with a known unit right after a known specification key
+    ("экран 27 дюймов"). A word after a number is taken as its unit only if it
+    is a known unit; anything else, including unit phrases without a key,
+    stays in the query.
+    """
+    known_keys = set(known_keys)
+    specs: Dict[str, str] = {}
+
+    def explicit(match):
+        key, op, number, space, unit_text = match.groups()
+        if unit_text is not None and unit_text.casefold() not in UNITS:
+            # The next word is not a unit, so it stays in the query
+            specs[normalize_key(key)] = f"{op}{number}"
+            return f" {space}{unit_text}"
+        specs[normalize_key(key)] = f"{op}{number}{unit_text or ''}"
+        return " "
+
+    def unit_value(match):
+        word, number, unit_text = match.groups()
+        if not word or normalize_key(word) not in known_keys or unit_text.casefold() not in UNITS:
+            return match.group(0)
+        specs[normalize_key(word)] = f"={number} {unit_text}"
+        return " "
+
+    text = _explicit_filter_re.sub(explicit, text)
+    text = _unit_value_re.sub(unit_value, text)
+    return " ".join(text.split()), specs
@@ -0,0 +1,151 @@
+"""
+Typo correction for search queries with a SymSpell-style deletion dictionary
+"""
+import re
+from typing import Dict, Iterable, Optional, Set
+
+SPELL_FIELDS = ("name", "brand", "model")
+
+MAX_EDIT_DISTANCE = 2
+
+# Deletes are generated from the word prefix only, which bounds the dictionary size
+PREFIX_LENGTH = 7
+
+_token_re = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    """Get the set of case-folded word tokens of a string"""
+    return set(_token_re.findall(text.casefold())) if text else set()
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """Get all strings obtained by deleting up to max_distance characters"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            variant[:i] + variant[i + 1:]
+            for variant in frontier if len(variant) > 1
+            for i in range(len(variant))
+        }
+        result |= frontier
+    return result
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """Optimal string alignment distance, or max_distance + 1 if it is larger"""
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    row = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        before_previous, previous_row = previous_row, row
+        row = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if (i > 1 and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                row[j] = min(row[j], before_previous[j - 2] + 1)
+        if min(row) > max_distance:
+            return max_distance + 1
+    return row[-1]
+
+
+class SpellDictionary:
+    """Catalog vocabulary with precomputed deletes for constant-time lookups.
+
+    Every term from name/brand/model is stored with the number of items using
+    it, and every delete of its prefix points back to the term. A misspelled
+    word is corrected by looking up its own deletes, so the cost does not
+    depend on the catalog size.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        """Drop all dictionary data"""
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._frequency: Dict[str, int] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+
+    def add(self, equipment):
+        """Add terms of a new or updated equipment item"""
+        terms = set()
+        for field in SPELL_FIELDS:
+            terms |= tokenize(getattr(equipment, field))
+        old_terms = self._doc_terms.get(equipment.id, set())
+        self._doc_terms[equipment.id] = terms
+        self._add_terms(terms - old_terms)
+        self._remove_terms(old_terms - terms)
+
+    def remove(self, equipment_id: int):
+        """Remove terms of a deleted equipment item"""
+        self._remove_terms(self._doc_terms.pop(equipment_id, set()))
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Get the closest known term, preferring the most frequent one"""
+        word = word.casefold()
+        if word in self._frequency:
+            return word
+        max_distance = 1 if len(word) <= 4 else MAX_EDIT_DISTANCE
+        candidates = set()
+        for variant in deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates |= self._deletes.get(variant, set())
+
+        best, best_key = None, None
+        for term in candidates:
+            distance = edit_distance(word, term, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self._frequency[term])
+            if best_key is None or key < best_key:
+                best, best_key = term, key
+        return best
+
+    def correct(self, query: str) -> Optional[str]:
+        """Get the query with unknown words corrected, or None if nothing changed"""
+        changed = False
+
+        def replace(match):
+            nonlocal changed
+            word = match.group(0)
+            if len(word) < 3 or word.isdigit():
+                return word
+            term = self.lookup(word)
+            if term is None or term == word.casefold():
+                return word
+            changed = True
+            return term
+
+        corrected = _token_re.sub(replace, query)
+        return corrected if changed else None
+
+    def _add_terms(self, terms: Iterable[str]):
+        for term in terms:
+            count = self._frequency.get(term, 0)
+            self._frequency[term] = count + 1
+            if count:
+                continue
+            for variant in deletes(term[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                self._deletes.setdefault(variant, set()).add(term)
+
+    def _remove_terms(self, terms: Iterable[str]):
+        for term in terms:
+            count = self._frequency.get(term, 0) - 1
+            if count > 0:
+                self._frequency[term] = count
+                continue
+            self._frequency.pop(term, None)
+            for variant in deletes(term[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                bucket = self._deletes.get(variant)
+                if bucket is not None:
+                    bucket.discard(term)
+                    if not bucket:
+                        del self._deletes[variant]
+
+
+spell_dictionary = SpellDictionary()
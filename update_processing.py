@@ -0,0 +1,98 @@
+"""
+Параллельная обработка обновлений с сохранением порядка внутри чата
+"""
+import asyncio
+import inspect
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """Очередь обновлений, put() которой ждет, пока в работе слишком много обновлений.
+
+    Обновление считается в работе с момента постановки в очередь до вызова
+    task_done(), который Application делает после обработки. Polling перестает
+    запрашивать новые обновления, а webhook отвечает 503, и Telegram
+    доставляет их позже.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.in_flight = 0
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+
+    @property
+    def saturated(self) -> bool:
+        """Достигнут ли лимит обновлений в работе"""
+        return self.in_flight >= self.limit
+
+    async def put(self, item: Any):
+        while self.saturated:
+            self._has_room.clear()
+            await self._has_room.wait()
+        self.put_nowait(item)
+
+    def put_nowait(self, item: Any):
+        super().put_nowait(item)
+        self.in_flight += 1
+
+    def task_done(self):
+        super().task_done()
+        self.in_flight -= 1
+        if not self.saturated:
+            self._has_room.set()
+
+
+def _chat_key(update: object) -> Optional[int]:
+    """Чат, внутри которого нужно сохранять порядок обработки"""
+    if isinstance(update, Update) and update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает обновления разных чатов параллельно, а одного чата строго по очереди.
+
+    Число одновременно работающих обработчиков ограничено workers. Обновление
+    чата ждет завершения предыдущего обновления того же чата, не занимая
+    рабочий слот.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        # Семафор базового класса ограничивает число ожидающих обновлений
+        super().__init__(max_concurrent_updates=max_pending)
+        self.workers = workers
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        self._chat_tails: Dict[int, asyncio.Future] = {}
+
+    async def initialize(self):
+        self._worker_slots = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self):
+        self._chat_tails.clear()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        chat_id = _chat_key(update)
+        previous = done = None
+        if chat_id is not None:
+            # Очередь чата выстраивается синхронно, в порядке поступления обновлений
+            previous = self._chat_tails.get(chat_id)
+            done = self._chat_tails[chat_id] = asyncio.get_running_loop().create_future()
+
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            async with self._worker_slots:
+                await coroutine
+        finally:
+            if inspect.iscoroutine(coroutine) and inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                # Обновление отменено до запуска обработчика
+                coroutine.close()
+            if done is not None:
+                if not done.done():
+                    done.set_result(None)
+                if self._chat_tails.get(chat_id) is done:
+                    del self._chat_tails[chat_id]
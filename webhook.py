@@ -0,0 +1,41 @@
+"""
+ASGI-приложение для приема обновлений Telegram через webhook
+"""
+import hmac
+import logging
+from fastapi import FastAPI, Request, Response
+from telegram import Update
+from telegram.ext import Application
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(application: Application) -> FastAPI:
+    """Создание приложения, передающего обновления в application.update_queue"""
+    app = FastAPI(title="Equipment Bot Webhook", docs_url=None, redoc_url=None, openapi_url=None)
+
+    @app.post(Config.WEBHOOK_PATH)
+    async def telegram_webhook(request: Request):
+        """Прием обновления: проверка секрета и немедленный ответ 200"""
+        secret = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret.encode(), Config.WEBHOOK_SECRET.encode()):
+            return Response(status_code=403)
+
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Получено некорректное обновление через webhook")
+            return Response(status_code=400)
+
+        if getattr(application.update_queue, "saturated", False):
+            # Обработчики не успевают: Telegram повторит доставку позже
+            return Response(status_code=503)
+
+        # Обработка идет в фоне, Telegram получает ответ сразу
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    return app